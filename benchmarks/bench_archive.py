@@ -0,0 +1,100 @@
+"""
+Memory held by the history of one room against the number of messages
+in it, and latency of reading N messages from its start.
+
+`in memory` keeps every message in the room log, `archived` keeps the
+newest HOT_TAIL and appends the older ones to segment files, read back
+through mmap.
+
+    python -m benchmarks.bench_archive
+"""
+import asyncio
+import dataclasses
+import tempfile
+import time
+import tracemalloc
+import uuid
+
+from chat.server.state.archive import Archives
+from chat.server.state.history import RoomLog
+from chat.server.state.message import (
+    get_message_notification,
+    load_room_action,
+)
+
+SIZES = (10_000, 100_000, 1_000_000)
+HOT_TAIL = 1_000
+N = 20
+ROUNDS = 50
+
+
+def fill(log: RoomLog, size: int) -> float:
+    """
+    Appends `size` messages; returns MiB allocated meanwhile and kept.
+    """
+    tracemalloc.start()
+
+    for i in range(size):
+        log.append(get_message_notification(
+            room_name="room",
+            user_name="user",
+            success=True,
+            reason="",
+            private=False,
+            to="/all",
+            message=f"message number {i}",
+        ))
+
+    used, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return used / 2**20
+
+
+async def oldest(log: RoomLog) -> float:
+    """
+    Microseconds to read the first N messages of the room.
+    """
+    start = time.perf_counter()
+    for _ in range(ROUNDS):
+        page = await log.after(0, N)
+    assert [m.seq for m in page] == list(range(1, N + 1))
+
+    return (time.perf_counter() - start) / ROUNDS * 1e6
+
+
+def main():
+    print(
+        f"{'messages':>10} {'in memory MiB':>14} {'archived MiB':>13} "
+        f"{f'oldest {N} in memory us':>24} {f'oldest {N} archived us':>23}"
+    )
+
+    for size in SIZES:
+        if size <= 100_000:
+            everything = RoomLog(capacity=size)
+            memory = fill(everything, size)
+            memory_read = f"{asyncio.run(oldest(everything)):>24.1f}"
+            del everything
+        else:
+            memory, memory_read = float("nan"), f"{'-':>24}"
+
+        with tempfile.TemporaryDirectory(dir=".") as data_dir:
+            Archives().open(data_dir)
+            archived = RoomLog(
+                capacity=HOT_TAIL,
+                archive=Archives().room(
+                    uuid.uuid4(), dataclasses.asdict, load_room_action
+                ),
+            )
+            tail = fill(archived, size)
+            archived_read = asyncio.run(oldest(archived))
+            Archives().close()
+
+        print(
+            f"{size:>10} {memory:>14.1f} {tail:>13.1f} "
+            f"{memory_read} {archived_read:>23.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""
+Cost of pushing one room message to 1, 100 and 10,000 sessions.
+
+`per recipient` encodes and frames the notification for every session
+(send_json in a loop, the first fan-out implementation), `encode once`
+is DeliveryEngine.deliver. Sessions write into a null transport, timings
+include draining all outbound queues.
+
+    python -m benchmarks.bench_broadcast
+"""
+import asyncio
+import time
+
+from chat.utils.my_response import WSResponse, Framing
+from chat.utils.codecs import available_codecs
+from chat.utils.compression import Deflate
+from chat.utils.outbound import Priority
+from chat.server.state.delivery import DeliveryEngine
+from chat.server.state.room import RoomStore
+from chat.server.state.session import SessionRegistry
+from benchmarks.bench_compression import history_reply
+
+RECIPIENTS = (1, 100, 10_000)
+MESSAGE_SIZES = (100, 2000)
+ROUNDS = 5
+
+
+class NullTransport:
+    def set_write_buffer_limits(self, high=None, low=None):
+        pass
+
+    def get_write_buffer_size(self) -> int:
+        return 0
+
+    def is_closing(self) -> bool:
+        return False
+
+    def abort(self):
+        pass
+
+
+class NullWriter:
+    transport = NullTransport()
+
+    def writelines(self, data):
+        pass
+
+
+def session() -> WSResponse:
+    ws = WSResponse(reader=None, writer=NullWriter())
+    ws.framing = Framing.length_prefixed
+    ws.codec = available_codecs()[0]
+    ws.compression = Deflate()
+    return ws
+
+
+def notification(size: int) -> dict:
+    message = history_reply(1)["payload"]["history"][0]
+    message["payload"]["message"] = "x" * size
+    return message
+
+
+async def flush(sessions: list[WSResponse]) -> None:
+    for ws in sessions:
+        await ws.outbound.flush()
+
+
+async def per_recipient(sessions: list[WSResponse], message: dict) -> None:
+    for ws in sessions:
+        await ws.send_json(message, priority=Priority.low)
+
+
+async def timed(send, sessions: list[WSResponse], *args) -> float:
+    start = time.perf_counter()
+    for _ in range(ROUNDS):
+        await send(*args)
+        await flush(sessions)
+    return (time.perf_counter() - start) / ROUNDS * 1e3
+
+
+async def main():
+    room = RoomStore().default_room()
+
+    print(
+        f"{'recipients':>10} {'message B':>9} {'per recipient ms':>17} "
+        f"{'encode once ms':>15}"
+    )
+
+    for count in RECIPIENTS:
+        engine = DeliveryEngine()
+        SessionRegistry().sessions.clear()
+        sessions = [session() for _ in range(count)]
+
+        for i, ws in enumerate(sessions):
+            SessionRegistry().add(f"user{i}", ws)
+
+        for size in MESSAGE_SIZES:
+            message = notification(size)
+
+            before = await timed(per_recipient, sessions, sessions, message)
+            after = await timed(engine.deliver, sessions, room, message)
+
+            print(f"{count:>10} {size:>9} {before:>17.2f} {after:>15.2f}")
+
+        for ws in sessions:
+            ws.outbound.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
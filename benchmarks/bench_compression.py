@@ -0,0 +1,94 @@
+"""
+Bytes on the wire and CPU cost of per-frame deflate on history replies.
+
+    python -m benchmarks.bench_compression
+"""
+import random
+import time
+from datetime import datetime, timedelta
+
+from chat.command_types import CommandType
+from chat.utils.codecs import available_codecs
+from chat.utils.compression import Deflate
+
+HISTORY_SIZES = (20, 100, 500)
+LEVELS = (1, 6, 9)
+ROUNDS = 200
+
+WORDS = (
+    "hello world room message file chat user join leave send history "
+    "привет как дела сегодня завтра встреча сервер клиент"
+).split()
+USERS = [f"user{i}" for i in range(30)]
+
+
+def history_reply(size: int) -> dict:
+    random.seed(size)
+    start = datetime(2023, 1, 1)
+
+    history = [
+        {
+            "action": CommandType.send,
+            "success": True,
+            "reason": "",
+            "datetime": str(start + timedelta(seconds=i * 7.3)),
+            "user": random.choice(USERS),
+            "room_name": "Global",
+            "payload": {
+                "private": False,
+                "to": "/all",
+                "message": " ".join(
+                    random.choices(WORDS, k=random.randint(3, 25))
+                ),
+            },
+        }
+        for i in range(size)
+    ]
+
+    return {
+        "action": CommandType.history,
+        "success": True,
+        "reason": "",
+        "datetime": str(start),
+        "user": "user0",
+        "payload": {"history": history},
+    }
+
+
+def timed(func, *args) -> float:
+    start = time.perf_counter()
+    for _ in range(ROUNDS):
+        func(*args)
+    return (time.perf_counter() - start) / ROUNDS * 1e6
+
+
+def main():
+    codec = available_codecs()[0]
+    print(f"codec: {codec.name} ({type(codec).__name__})")
+    print(
+        f"{'messages':>8} {'level':>5} {'raw B':>8} {'wire B':>8} "
+        f"{'ratio':>6} {'encode us':>10} {'deflate us':>11} "
+        f"{'inflate us':>11}"
+    )
+
+    for size in HISTORY_SIZES:
+        reply = history_reply(size)
+        raw = codec.encode(reply)
+        encode_us = timed(codec.encode, reply)
+
+        for level in LEVELS:
+            deflate = Deflate(level=level, threshold=0)
+            compressed = deflate.compress(raw)
+
+            deflate_us = timed(deflate.compress, raw)
+            inflate_us = timed(deflate.decompress, compressed, len(raw))
+
+            print(
+                f"{size:>8} {level:>5} {len(raw):>8} {len(compressed):>8} "
+                f"{len(raw) / len(compressed):>6.1f} {encode_us:>10.0f} "
+                f"{deflate_us:>11.0f} {inflate_us:>11.0f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
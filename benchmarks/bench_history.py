@@ -0,0 +1,99 @@
+"""
+Latency of `/history` (last 20 messages) against the number of messages
+in the room.
+
+`full list` is the original lookup (every stored message turned into a
+notification, then sliced), `ring buffer` is HistoryAction on top of
+RoomLog; both include encoding the reply.
+
+    python -m benchmarks.bench_history
+"""
+import asyncio
+import time
+
+from chat.command_types import CommandType
+from chat.utils.codecs import DEFAULT_CODEC
+from chat.utils.outbound import Priority
+from chat.server.message_actions import HistoryAction
+from chat.server.state.history import RoomLog
+from chat.server.state.meta import Meta
+from chat.server.state.room import RoomStore, DEFAULT_ROOM
+from chat.server.state.message import (
+    NotificationStore,
+    get_message_notification,
+    get_history_notification,
+)
+
+ROOM_SIZES = (1_000, 10_000, 100_000)
+N = 20
+ROUNDS = 50
+
+
+class NullSession:
+    codec = DEFAULT_CODEC
+
+    async def send_json(
+        self, data: dict, priority: Priority = Priority.normal
+    ) -> bool:
+        self.codec.encode(data)
+        return True
+
+
+def fill(size: int) -> RoomLog:
+    log = RoomLog(capacity=size)
+
+    for i in range(size):
+        log.append(get_message_notification(
+            room_name=DEFAULT_ROOM,
+            user_name=f"user{i % 30}",
+            success=True,
+            reason="",
+            private=False,
+            to="/all",
+            message=f"message number {i}",
+        ))
+
+    return log
+
+
+async def full_list(log: RoomLog, ws: NullSession) -> None:
+    history = [m.get_notification() for m in log][-N:]
+
+    await ws.send_json(get_history_notification(
+        user_name="user0", success=True, reason="", payload=history
+    ).get_notification())
+
+
+async def ring_buffer(log: RoomLog, ws: NullSession) -> None:
+    await HistoryAction.run(
+        ws_response=ws,
+        meta=Meta(user_name="user0", loggedin=True),
+        command=CommandType.history,
+        message_json={"room": DEFAULT_ROOM, "notification_count": N},
+    )
+
+
+async def timed(history, log: RoomLog, ws: NullSession) -> float:
+    start = time.perf_counter()
+    for _ in range(ROUNDS):
+        await history(log, ws)
+    return (time.perf_counter() - start) / ROUNDS * 1e3
+
+
+async def main():
+    ws = NullSession()
+    room = RoomStore().default_room()
+
+    print(f"{'messages':>10} {'full list ms':>13} {'ring buffer ms':>15}")
+
+    for size in ROOM_SIZES:
+        log = NotificationStore().store["rooms"][room.key] = fill(size)
+
+        before = await timed(full_list, log, ws)
+        after = await timed(ring_buffer, log, ws)
+
+        print(f"{size:>10} {before:>13.3f} {after:>15.3f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
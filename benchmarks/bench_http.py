@@ -0,0 +1,61 @@
+"""
+Requests/sec of the HTTP front end on localhost, `GET /status` over
+keep-alive connections, one request at a time and pipelined in batches.
+A run with wrk against `python -m chat.server` gives comparable numbers:
+
+    wrk -c 8 -d 10 -H "X-Session: <token>" http://127.0.0.1:8080/status
+
+    python -m benchmarks.bench_http
+"""
+import asyncio
+import time
+
+from chat.server.http_server import handle_http
+from chat.server.state.http_session import HTTPSessionStore
+
+CONNECTIONS = 8
+REQUESTS = 2000
+PIPELINE_DEPTHS = (1, 16)
+
+
+async def client(port: int, token: str, depth: int) -> None:
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    request = (
+        f"GET /status HTTP/1.1\r\nHost: bench\r\nX-Session: {token}\r\n\r\n"
+    ).encode()
+
+    for _ in range(REQUESTS // depth):
+        writer.write(request * depth)
+
+        for _ in range(depth):
+            head = await reader.readuntil(b"\r\n\r\n")
+            length = int(head.split(b"Content-Length: ")[1].split(b"\r\n")[0])
+            await reader.readexactly(length)
+
+    writer.close()
+    await writer.wait_closed()
+
+
+async def main():
+    server = await asyncio.start_server(handle_http, "127.0.0.1", 0)
+    port = server.sockets[0].getsockname()[1]
+    token, _ = HTTPSessionStore().open()
+
+    print(f"{'pipeline':>8} {'requests':>8} {'req/s':>8}")
+
+    for depth in PIPELINE_DEPTHS:
+        start = time.perf_counter()
+        await asyncio.gather(
+            *(client(port, token, depth) for _ in range(CONNECTIONS))
+        )
+        elapsed = time.perf_counter() - start
+
+        total = CONNECTIONS * REQUESTS
+        print(f"{depth:>8} {total:>8} {total / elapsed:>8.0f}")
+
+    server.close()
+    await server.wait_closed()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,103 @@
+"""
+Notifications/sec built by the server for `/send`.
+
+`validated` builds the RoomAction through its pydantic constructor,
+`trusted` the way get_message_notification does; `/send` runs the whole
+SendAction (request checks, notification, room log, delivery to the
+sender) against a session that only encodes what it is sent.
+
+    python -m benchmarks.bench_notifications
+"""
+import asyncio
+from datetime import datetime
+import time
+
+from chat.command_types import CommandType
+from chat.singleton import singleton
+from chat.utils.codecs import DEFAULT_CODEC
+from chat.utils.outbound import Priority
+from chat.server.message_actions import SendAction
+from chat.server.state.meta import Meta
+from chat.server.state.message import RoomAction, get_message_notification
+from chat.server.state.room import DEFAULT_ROOM
+from chat.server.state.user import UserStore
+
+N = 100_000
+
+
+class NullSession:
+    codec = DEFAULT_CODEC
+
+    async def send_json(
+        self, data: dict, priority: Priority = Priority.normal
+    ) -> bool:
+        self.codec.encode(data)
+        return True
+
+
+def validated(i: int) -> RoomAction:
+    return RoomAction(
+        action=CommandType.send,
+        datetime=str(datetime.now()),
+        success=True,
+        reason="",
+        room_name=DEFAULT_ROOM,
+        user_name="user",
+        payload={"private": False, "to": "/all", "message": f"message {i}"},
+    )
+
+
+def trusted(i: int) -> RoomAction:
+    return get_message_notification(
+        room_name=DEFAULT_ROOM,
+        user_name="user",
+        success=True,
+        reason="",
+        private=False,
+        to="/all",
+        message=f"message {i}",
+    )
+
+
+def build(make) -> float:
+    start = time.perf_counter()
+    for i in range(N):
+        make(i)
+
+    return N / (time.perf_counter() - start)
+
+
+async def send() -> float:
+    singleton.instances = {}
+    UserStore().register(username="user", password="123")
+    meta = Meta(user_name="user", loggedin=True)
+    ws = NullSession()
+
+    start = time.perf_counter()
+    for i in range(N):
+        await SendAction.run(
+            ws_response=ws,
+            meta=meta,
+            command=CommandType.send,
+            message_json={
+                "command": CommandType.send,
+                "message": f"message {i}",
+                "room": DEFAULT_ROOM,
+                "private": False,
+                "to_user": "/all",
+            },
+        )
+
+    return N / (time.perf_counter() - start)
+
+
+def main():
+    print(f"{'validated/s':>12} {'trusted/s':>12} {'/send/s':>12}")
+    print(
+        f"{build(validated):>12.0f} {build(trusted):>12.0f} "
+        f"{asyncio.run(send()):>12.0f}"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Memory per stored room message: the RoomAction the room logs used to
+keep against the MessageRecord they keep now, and the time to turn the
+newest N of them into notifications.
+
+Messages come from USERS users in one room, with a short text each; the
+text itself is counted in both.
+
+    python -m benchmarks.bench_record
+"""
+from datetime import datetime, timedelta
+import time
+import tracemalloc
+
+from chat.command_types import CommandType
+from chat.server.state.message import RoomAction
+from chat.server.state.record import MessageRecord
+
+SIZE = 1_000_000
+USERS = 1_000
+N = 20
+ROUNDS = 1_000
+
+START = datetime(2024, 1, 1)
+
+
+def action(i: int) -> RoomAction:
+    # as get_message_notification makes them, names are fresh strings
+    return RoomAction(
+        action=CommandType.send,
+        datetime=str(START + timedelta(seconds=i, microseconds=i)),
+        success=True,
+        reason="",
+        payload={"private": False, "to": "/all", "message": f"message {i}"},
+        room_name="".join(["Glo", "bal"]),
+        user_name=f"user{i % USERS}",
+        seq=i + 1,
+    )
+
+
+def measure(make) -> tuple[float, list]:
+    """
+    Bytes per message kept by SIZE messages made by `make`.
+    """
+    tracemalloc.start()
+    messages = [make(i) for i in range(SIZE)]
+    used, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return used / SIZE, messages
+
+
+def notify(messages: list) -> float:
+    """
+    Microseconds to build the notifications of the last N messages.
+    """
+    start = time.perf_counter()
+    for _ in range(ROUNDS):
+        [m.get_notification() for m in messages[-N:]]
+
+    return (time.perf_counter() - start) / ROUNDS * 1e6
+
+
+def main():
+    print(f"{SIZE} messages")
+    print(f"{'':>14} {'bytes/message':>14} {f'last {N} us':>11}")
+
+    for name, make in (
+        ("RoomAction", action),
+        ("MessageRecord", lambda i: MessageRecord.from_action(action(i))),
+    ):
+        per_message, messages = measure(make)
+        print(f"{name:>14} {per_message:>14.0f} {notify(messages):>11.1f}")
+        del messages
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+Memory held by the search index against the number of messages indexed,
+and latency of queries taking the first page of hits of a room.
+
+Messages are WORDS words each, drawn from a vocabulary of VOCABULARY
+with Zipf-like frequencies, over ROOMS rooms; `rare` and `common` are a
+word from the tail and the head of the vocabulary, `and` two common
+words, `phrase` two common words next to each other, checked on the
+text of the messages found.
+
+    python -m benchmarks.bench_search
+"""
+from itertools import islice
+import random
+import time
+import tracemalloc
+
+from chat.server.state.search import (
+    SearchIndex,
+    has_phrase,
+    parse_query,
+    tokenize,
+)
+
+SIZES = (10_000, 100_000, 1_000_000)
+ROOMS = 10
+VOCABULARY = 50_000
+WORDS = 8
+PAGE = 20
+ROUNDS = 200
+
+VOCABULARY_WORDS = [f"w{i}" for i in range(VOCABULARY)]
+WEIGHTS = [1 / (i + 1) for i in range(VOCABULARY)]
+QUERIES = {
+    "rare": "w40000",
+    "common": "w3",
+    "and": "w1 w2",
+    "phrase": '"w1 w2"',
+}
+
+
+def fill(index: SearchIndex, texts: dict, size: int) -> float:
+    """
+    Indexes `size` messages; returns MiB allocated meanwhile and kept by
+    the index.
+    """
+    rng = random.Random(1)
+    words = rng.choices(VOCABULARY_WORDS, WEIGHTS, k=size * WORDS)
+    messages = [
+        " ".join(words[i * WORDS:(i + 1) * WORDS]) for i in range(size)
+    ]
+
+    tracemalloc.start()
+    for i, text in enumerate(messages):
+        index.add(i % ROOMS, i // ROOMS + 1, text)
+    used, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    for i, text in enumerate(messages):
+        texts[i % ROOMS, i // ROOMS + 1] = text
+
+    return used / 2**20
+
+
+def page(index: SearchIndex, texts: dict, query: str) -> list[int]:
+    words, phrases = parse_query(query)
+    hits = (
+        seq for seq in index.find(0, words)
+        if all(has_phrase(tokenize(texts[0, seq]), p) for p in phrases)
+    )
+    return list(islice(hits, PAGE))
+
+
+def latency(index: SearchIndex, texts: dict, query: str) -> float:
+    """
+    Microseconds to find the first page of hits in one room.
+    """
+    start = time.perf_counter()
+    for _ in range(ROUNDS):
+        page(index, texts, query)
+
+    return (time.perf_counter() - start) / ROUNDS * 1e6
+
+
+def main():
+    print(
+        f"{'messages':>10} {'terms':>7} {'index MiB':>10} "
+        + " ".join(f"{name + ' us':>10}" for name in QUERIES)
+    )
+
+    for size in SIZES:
+        index, texts = SearchIndex(), {}
+        memory = fill(index, texts, size)
+
+        print(
+            f"{size:>10} {len(index):>7} {memory:>10.1f} "
+            + " ".join(
+                f"{latency(index, texts, query):>10.1f}"
+                for query in QUERIES.values()
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
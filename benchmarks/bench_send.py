@@ -0,0 +1,87 @@
+"""
+Frames/sec of WSResponse.send_bytes over a local socket pair.
+
+`chunked` replays the original send path (1 KB slices, a drain per slice
+and a separate END_SIGNAL write), `coalesced` is the current one; both
+use sentinel framing so only the send path differs. The last column is
+the coalesced path with length-prefixed framing on both ends.
+
+    python -m benchmarks.bench_send
+"""
+import asyncio
+import socket
+import time
+
+from chat.utils.my_response import WSResponse, Framing
+
+FRAMES = 2000
+PAYLOAD_SIZES = (256, 4 * 1024, 64 * 1024)
+LEGACY_CHUNK_SIZE = 1024
+
+
+async def chunked_send(ws: WSResponse, data: bytes) -> None:
+    for i in range(0, int(len(data) / LEGACY_CHUNK_SIZE) + 1):
+        ws.writer.write(
+            data[i * LEGACY_CHUNK_SIZE: (i + 1) * LEGACY_CHUNK_SIZE]
+        )
+        await ws.writer.drain()
+
+    ws.writer.write(ws.end_signal)
+    await ws.writer.drain()
+
+
+async def coalesced_send(ws: WSResponse, data: bytes) -> None:
+    await ws.send_bytes(data)
+
+
+async def open_pair(framing: Framing) -> tuple[WSResponse, WSResponse]:
+    left, right = socket.socketpair()
+
+    reader, writer = await asyncio.open_connection(sock=left)
+    sender = WSResponse(reader=reader, writer=writer)
+
+    reader, writer = await asyncio.open_connection(sock=right)
+    receiver = WSResponse(reader=reader, writer=writer)
+
+    sender.framing = receiver.framing = framing
+    return sender, receiver
+
+
+async def run(send, framing: Framing, size: int) -> float:
+    sender, receiver = await open_pair(framing)
+    payload = b"x" * size
+
+    async def consume():
+        for _ in range(FRAMES):
+            await receiver.receive_bytes()
+
+    consumer = asyncio.ensure_future(consume())
+
+    start = time.perf_counter()
+    for _ in range(FRAMES):
+        await send(sender, payload)
+    await consumer
+    elapsed = time.perf_counter() - start
+
+    await sender.close()
+    await receiver.close()
+
+    return FRAMES / elapsed
+
+
+async def main():
+    print(
+        f"{'payload':>10} {'chunked f/s':>14} {'coalesced f/s':>14} "
+        f"{'+ v2 framing':>14}"
+    )
+
+    for size in PAYLOAD_SIZES:
+        before = await run(chunked_send, Framing.sentinel, size)
+        after = await run(coalesced_send, Framing.sentinel, size)
+        framed = await run(coalesced_send, Framing.length_prefixed, size)
+
+        print(f"{size:>10} {before:>14.0f} {after:>14.0f} {framed:>14.0f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
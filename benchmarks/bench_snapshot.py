@@ -0,0 +1,127 @@
+"""
+Time of a snapshot against the size of the state: `full` writes every
+segment (what a dump of the whole stores costs), `incremental` the ones
+changed by CHURN messages and read cursor moves in a few rooms since the
+previous one.
+
+    python -m benchmarks.bench_snapshot
+"""
+import asyncio
+import tempfile
+import time
+
+from chat.utils.codecs import DEFAULT_CODEC
+from chat.utils.outbound import Priority
+from chat.server.state.cursor import ReadCursorStore
+from chat.server.state.message import (
+    NotificationStore,
+    get_message_notification,
+)
+from chat.server.state.room import Room, RoomStore, RoomType
+from chat.server.state.snapshot import Snapshots, STORES
+from chat.server.state.user import UserStore
+from chat.singleton import singleton
+
+# messages, 1000 per room, 10 per user; every user writes to one room
+SIZES = (10_000, 100_000)
+# messages and cursor moves by the users of the first CHURN_ROOMS rooms
+CHURN = 100
+CHURN_ROOMS = 10
+# argon2 hashes are slow to make, users get this one
+HASHED_PASSWORD = "$argon2id$v=19$m=65536,t=2,p=1$c2FsdHNhbHQ$aGFzaGhhc2g"
+
+
+class NullSession:
+    codec = DEFAULT_CODEC
+
+    async def send_json(
+        self, data: dict, priority: Priority = Priority.normal
+    ) -> bool:
+        self.codec.encode(data)
+        return True
+
+
+async def send(ws: NullSession, user_name: str, room: Room, i: int):
+    await NotificationStore().process(
+        ws=ws,
+        notification=get_message_notification(
+            room_name=room.name,
+            user_name=user_name,
+            success=True,
+            reason="",
+            private=False,
+            to="/all",
+            message=f"message number {i}",
+        ),
+    )
+
+
+def home(rooms: list[Room], u: int) -> Room:
+    return rooms[u % len(rooms)]
+
+
+async def fill(size: int, ws: NullSession) -> list[Room]:
+    rooms = [
+        RoomStore().add_room(Room(
+            key=None,
+            name=f"room{r}",
+            room_type=RoomType.open,
+            admins=[],
+            allowed=[],
+            deleted=False,
+        ))
+        for r in range(size // 1000)
+    ]
+
+    users = size // 10
+    for u in range(users):
+        UserStore().redo("register", [f"user{u}", HASHED_PASSWORD])
+        RoomStore().join(UserStore().get_user(f"user{u}"), home(rooms, u))
+
+    for i in range(size):
+        await send(ws, f"user{i % users}", home(rooms, i % users), i)
+
+    return rooms
+
+
+async def timed_snapshot() -> tuple[float, int]:
+    start = time.perf_counter()
+    stats = await Snapshots().snapshot()
+    return (time.perf_counter() - start) * 1e3, stats["bytes"]
+
+
+async def main():
+    ws = NullSession()
+
+    print(
+        f"{'messages':>10} {'full ms':>9} {'full KiB':>9} "
+        f"{'incremental ms':>15} {'incremental KiB':>16}"
+    )
+
+    for size in SIZES:
+        singleton.instances = {}
+
+        with tempfile.TemporaryDirectory(dir=".") as data_dir:
+            Snapshots().dir = data_dir
+            rooms = await fill(size, ws)
+
+            await Snapshots().snapshot()
+            for store in STORES.values():
+                store().touch_all()
+            full, full_bytes = await timed_snapshot()
+
+            for i in range(CHURN):
+                u = i % CHURN_ROOMS
+                room = home(rooms, u)
+                await send(ws, f"user{u}", room, i)
+                ReadCursorStore().advance(f"user{u}", room.key, i + 1)
+            incremental, incremental_bytes = await timed_snapshot()
+
+        print(
+            f"{size:>10} {full:>9.1f} {full_bytes / 1024:>9.0f} "
+            f"{incremental:>15.1f} {incremental_bytes / 1024:>16.0f}"
+        )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,125 @@
+"""
+Startup time against the size of the message history: `recover` is what
+the server does before it accepts connections (read the snapshot, replay
+the log), `first read` the first `/history` of a room, which restores the
+room's messages, and `all rooms` every room read once, what recovery used
+to cost up front.
+
+ROOMS rooms with USERS members each; the history grows by room.
+
+    python -m benchmarks.bench_startup
+"""
+import asyncio
+import tempfile
+import time
+
+from chat.utils.codecs import DEFAULT_CODEC
+from chat.utils.outbound import Priority
+from chat.server.state.archive import Archives
+from chat.server.state.message import (
+    NotificationStore,
+    get_message_notification,
+)
+from chat.server.state.room import Room, RoomStore, RoomType
+from chat.server.state.snapshot import Snapshots
+from chat.server.state.user import UserStore
+from chat.singleton import singleton
+
+# messages per room
+PER_ROOM = (100, 1_000, 5_000)
+ROOMS = 100
+USERS = 10
+# argon2 hashes are slow to make, users get this one
+HASHED_PASSWORD = "$argon2id$v=19$m=65536,t=2,p=1$c2FsdHNhbHQ$aGFzaGhhc2g"
+
+
+class NullSession:
+    codec = DEFAULT_CODEC
+
+    async def send_json(
+        self, data: dict, priority: Priority = Priority.normal
+    ) -> bool:
+        return True
+
+
+async def fill(per_room: int) -> None:
+    ws = NullSession()
+    rooms = [
+        RoomStore().add_room(Room(
+            key=None,
+            name=f"room{r}",
+            room_type=RoomType.open,
+            admins=[],
+            allowed=[],
+            deleted=False,
+        ))
+        for r in range(ROOMS)
+    ]
+
+    for u in range(USERS):
+        UserStore().redo("register", [f"user{u}", HASHED_PASSWORD])
+        for room in rooms:
+            RoomStore().join(UserStore().get_user(f"user{u}"), room)
+
+    for i in range(per_room * ROOMS):
+        await NotificationStore().process(
+            ws=ws,
+            notification=get_message_notification(
+                room_name=rooms[i % ROOMS].name,
+                user_name=f"user{i % USERS}",
+                success=True,
+                reason="",
+                private=False,
+                to="/all",
+                message=f"message number {i}",
+            ),
+        )
+
+
+async def restart(data_dir: str) -> float:
+    Archives().close()
+    singleton.instances = {}
+    Snapshots().dir = data_dir
+
+    start = time.perf_counter()
+    await Snapshots().recover()
+    return (time.perf_counter() - start) * 1e3
+
+
+async def read(rooms: list[Room]) -> float:
+    start = time.perf_counter()
+    for room in rooms:
+        await NotificationStore().get_n_messages(room, 20)
+    return (time.perf_counter() - start) * 1e3
+
+
+async def main():
+    print(
+        f"{'messages':>10} {'recover ms':>11} {'first read ms':>14} "
+        f"{'all rooms ms':>13}"
+    )
+
+    for per_room in PER_ROOM:
+        singleton.instances = {}
+
+        with tempfile.TemporaryDirectory(dir=".") as data_dir:
+            Snapshots().dir = data_dir
+            await fill(per_room)
+            await Snapshots().snapshot()
+
+            recover = await restart(data_dir)
+            rooms = [
+                RoomStore().get_room_by_name(f"room{r}") for r in range(ROOMS)
+            ]
+            first = await read(rooms[:1])
+            everything = first + await read(rooms[1:])
+            Archives().close()
+
+        print(
+            f"{per_room * ROOMS:>10} {recover:>11.1f} {first:>14.1f} "
+            f"{everything:>13.1f}"
+        )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,95 @@
+"""
+Throughput of room messages stored through NotificationStore with the
+write-ahead log off, fsynced once a second, and in durable mode (every
+reply waits for its record to be fsynced), against the number of senders
+sending at once. Concurrent senders share fsyncs (group commit).
+
+    python -m benchmarks.bench_wal
+"""
+import asyncio
+import os
+import tempfile
+import time
+from typing import Optional
+
+from chat.utils.codecs import DEFAULT_CODEC
+from chat.utils.outbound import Priority
+from chat.server.state.room import DEFAULT_ROOM
+from chat.server.state.message import (
+    NotificationStore,
+    get_message_notification,
+)
+from chat.server.state.wal import WriteAheadLog, FILENAME
+from chat.singleton import singleton
+
+SENDERS = (1, 16, 256)
+MESSAGES = 4096
+# None -- no log
+MODES = {"in memory": None, "fsync 1s": 1.0, "durable": 0.0}
+
+
+class NullSession:
+    codec = DEFAULT_CODEC
+
+    async def send_json(
+        self, data: dict, priority: Priority = Priority.normal
+    ) -> bool:
+        self.codec.encode(data)
+        return True
+
+
+async def sender(n: int, messages: int, ws: NullSession) -> None:
+    for i in range(messages):
+        await NotificationStore().process(
+            ws=ws,
+            notification=get_message_notification(
+                room_name=DEFAULT_ROOM,
+                user_name=f"user{n}",
+                success=True,
+                reason="",
+                private=False,
+                to="/all",
+                message=f"message number {i}",
+            ),
+        )
+
+
+async def throughput(
+    senders: int, fsync_interval: Optional[float], data_dir: str
+) -> float:
+    singleton.instances = {}
+    wal = WriteAheadLog()
+
+    if fsync_interval is not None:
+        wal.path = os.path.join(data_dir, FILENAME)
+        wal.fsync_interval = fsync_interval
+        wal.discard()
+        wal.open()
+
+    ws = NullSession()
+    start = time.perf_counter()
+
+    await asyncio.gather(*(
+        sender(n, MESSAGES // senders, ws) for n in range(senders)
+    ))
+    await wal.close()
+
+    return MESSAGES / (time.perf_counter() - start)
+
+
+async def main():
+    print(f"{'senders':>8}" + "".join(f"{mode:>14}" for mode in MODES))
+
+    with tempfile.TemporaryDirectory(dir=".") as data_dir:
+        for senders in SENDERS:
+            results = [
+                await throughput(senders, interval, data_dir)
+                for interval in MODES.values()
+            ]
+            print(f"{senders:>8}" + "".join(f"{r:>14.0f}" for r in results))
+
+    print("messages per second")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,125 @@
+"""
+WebSocket masking cost and throughput against the custom framing.
+
+The first table times XOR masking strategies (µs per payload): a byte by
+byte loop, the whole payload as one big integer, and bytes.translate over
+the four byte lanes; apply_mask switches between the last two at
+MASK_TRANSLATE_FROM. The second one is frames/sec from a masking client
+to the server over a local socket pair, WebSocket vs length-prefixed
+framing.
+
+    python -m benchmarks.bench_websocket
+"""
+import asyncio
+import os
+import socket
+import time
+
+from chat.utils.my_response import WSResponse, Framing
+from chat.utils.websocket import WebSocketResponse, apply_mask, XOR_TABLES
+
+MASK_SIZES = (16, 256, 4 * 1024, 64 * 1024, 1024 * 1024)
+PAYLOAD_SIZES = (256, 4 * 1024, 64 * 1024)
+FRAMES = 2000
+ROUNDS = 200
+
+
+def mask_loop(data: bytes, mask: bytes) -> bytes:
+    return bytes(b ^ mask[i % 4] for i, b in enumerate(data))
+
+
+def mask_int(data: bytes, mask: bytes) -> bytes:
+    length = len(data)
+    key = mask * (length // 4) + mask[:length % 4]
+    return (
+        int.from_bytes(data, "big") ^ int.from_bytes(key, "big")
+    ).to_bytes(length, "big")
+
+
+def mask_translate(data: bytes, mask: bytes) -> bytes:
+    result = bytearray(data)
+    for lane in range(4):
+        result[lane::4] = result[lane::4].translate(XOR_TABLES[mask[lane]])
+    return bytes(result)
+
+
+def timed(func, *args, rounds: int = ROUNDS) -> float:
+    start = time.perf_counter()
+    for _ in range(rounds):
+        func(*args)
+    return (time.perf_counter() - start) / rounds * 1e6
+
+
+async def open_pair(websocket: bool) -> tuple[WSResponse, WSResponse]:
+    left, right = socket.socketpair()
+
+    if websocket:
+        reader, writer = await asyncio.open_connection(sock=left)
+        sender = WebSocketResponse(reader=reader, writer=writer, client=True)
+        reader, writer = await asyncio.open_connection(sock=right)
+        receiver = WebSocketResponse(
+            reader=reader, writer=writer, ping_interval=0
+        )
+        return sender, receiver
+
+    reader, writer = await asyncio.open_connection(sock=left)
+    sender = WSResponse(reader=reader, writer=writer)
+    reader, writer = await asyncio.open_connection(sock=right)
+    receiver = WSResponse(reader=reader, writer=writer)
+
+    sender.framing = receiver.framing = Framing.length_prefixed
+    return sender, receiver
+
+
+async def run(websocket: bool, size: int) -> float:
+    sender, receiver = await open_pair(websocket)
+    payload = os.urandom(size)
+
+    async def consume():
+        for _ in range(FRAMES):
+            await receiver.receive_bytes()
+
+    consumer = asyncio.ensure_future(consume())
+
+    start = time.perf_counter()
+    for _ in range(FRAMES):
+        await sender.send_bytes(payload)
+    await consumer
+    elapsed = time.perf_counter() - start
+
+    await sender.close()
+    await receiver.close()
+
+    return FRAMES / elapsed
+
+
+async def main():
+    mask = os.urandom(4)
+
+    print(
+        f"{'payload':>10} {'loop us':>10} {'int us':>10} "
+        f"{'translate us':>13} {'apply_mask us':>14}"
+    )
+    for size in MASK_SIZES:
+        data = os.urandom(size)
+        # too slow to be worth waiting for on the largest payload
+        loop = "-"
+        if size <= 64 * 1024:
+            loop = f"{timed(mask_loop, data, mask, rounds=3):.1f}"
+
+        print(
+            f"{size:>10} {loop:>10} {timed(mask_int, data, mask):>10.1f} "
+            f"{timed(mask_translate, data, mask):>13.1f} "
+            f"{timed(apply_mask, data, mask):>14.1f}"
+        )
+
+    print(f"\n{'payload':>10} {'v2 f/s':>10} {'websocket f/s':>14}")
+    for size in PAYLOAD_SIZES:
+        framed = await run(False, size)
+        websocket = await run(True, size)
+
+        print(f"{size:>10} {framed:>10.0f} {websocket:>14.0f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
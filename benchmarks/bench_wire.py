@@ -0,0 +1,126 @@
+"""
+`/history` replies joined from the cached encodings of the messages
+against encoding every message of the page on each read, per codec, and
+the memory the cache takes per message.
+
+`encoded` runs HistoryAction with the cache off (CHAT_WIRE_CACHE_SIZE=0),
+`cached` with every message of the room encoded once already; `bytes` is
+what the cache holds per message, encoding and references included.
+
+    python -m benchmarks.bench_wire
+"""
+import asyncio
+import time
+import tracemalloc
+
+from chat import settings
+from chat.command_types import CommandType
+from chat.singleton import singleton
+from chat.utils.codecs import Codec, available_codecs
+from chat.utils.my_response import WSResponse
+from chat.utils.outbound import Priority
+from chat.server.message_actions import HistoryAction
+from chat.server.state.history import RoomLog
+from chat.server.state.meta import Meta
+from chat.server.state.record import MessageRecord, WireCache
+from chat.server.state.room import RoomStore, DEFAULT_ROOM
+from chat.server.state.message import (
+    NotificationStore,
+    get_message_notification,
+)
+
+SIZE = 10_000
+PAGES = (20, 100)
+ROUNDS = 500
+
+
+class NullSession(WSResponse):
+    def __init__(self, codec: Codec) -> None:
+        self.codec = codec
+
+    async def send_encoded(
+        self, body: bytes, frame=None, priority: Priority = Priority.normal
+    ) -> bool:
+        return True
+
+
+def fill() -> RoomLog:
+    log = RoomLog(capacity=SIZE)
+
+    for i in range(SIZE):
+        action = get_message_notification(
+            room_name=DEFAULT_ROOM,
+            user_name=f"user{i % 30}",
+            success=True,
+            reason="",
+            private=False,
+            to="/all",
+            message=f"message number {i}",
+        )
+        action.seq = i + 1
+        log.append(MessageRecord.from_action(action))
+
+    return log
+
+
+async def timed(ws: NullSession, n: int) -> float:
+    """
+    Microseconds per `/history` of the last n messages.
+    """
+    meta = Meta(user_name="user0", loggedin=True)
+    start = time.perf_counter()
+    for _ in range(ROUNDS):
+        await HistoryAction.run(
+            ws_response=ws,
+            meta=meta,
+            command=CommandType.history,
+            message_json={"room": DEFAULT_ROOM, "limit": n},
+        )
+    return (time.perf_counter() - start) / ROUNDS * 1e6
+
+
+def warm(log: RoomLog, codec: Codec) -> float:
+    """
+    Encodes every message of the room into the cache; returns the bytes
+    allocated per message.
+    """
+    cache = WireCache()
+    tracemalloc.start()
+    for record in log:
+        cache.encode(record, codec)
+    used, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return used / SIZE
+
+
+async def main():
+    print(f"{SIZE} messages")
+    print(
+        f"{'codec':>10} {'n':>5} {'encoded us':>11} {'cached us':>10} "
+        f"{'bytes':>7}"
+    )
+
+    for codec in available_codecs():
+        ws = NullSession(codec)
+
+        for n in PAGES:
+            singleton.instances = {}
+            room = RoomStore().default_room()
+            log = NotificationStore().store["rooms"][room.key] = fill()
+
+            WireCache().limit = 0
+            encoded = await timed(ws, n)
+
+            WireCache().limit = settings.WIRE_CACHE_SIZE
+            per_message = warm(log, codec)
+            cached = await timed(ws, n)
+
+            print(
+                f"{codec.name:>10} {n:>5} {encoded:>11.1f} {cached:>10.1f} "
+                f"{per_message:>7.0f}"
+            )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,17 +1,28 @@
 import asyncio
+from collections import deque
+from dataclasses import dataclass
 import logging
+from typing import Optional
 
-from chat.utils.my_response import WSResponse
+from chat import settings
+from chat.utils.my_response import WSResponse, FrameType
+from chat.utils.websocket import WebSocketResponse
+from chat.utils.codecs import available_codecs
 from chat.client.client_commands import (
     CommandArgError,
     EmptyCommand,
 )
 from chat.command_types import CommandType
-from chat.manage_files import receive_file
+from chat.manage_files import save_file
 from chat.client.get_commands import init_commands
 from chat.client.console import console_input, console_output
-from chat.client.command_models import QuitModel
-from chat.exceptions import CloseSession
+from chat.client.command_models import (
+    QuitModel,
+    ResumeModel,
+    ReceivedModel,
+    UnreadModel,
+)
+from chat.exceptions import CloseSession, ProtocolError
 
 logging.basicConfig(
     level=logging.INFO,
@@ -21,31 +32,103 @@ logger = logging.getLogger("client")
 DOWNLOADS_FOLDER = "./client_data/downloads"
 
 
-async def subscribe_to_messages(websocket: WSResponse) -> None:
-    while True:
-        data = await websocket.receive_json()
-        await console_output(data)
+@dataclass
+class ClientSession:
+    """
+    Client side of a resumable session; received notifications are counted
+    the way the server numbers them.
+    """
+    ws: WSResponse
+    token: Optional[str] = None
+    seq: int = 0
+    acked: int = 0
+    # set while the session is being resumed over a new connection
+    resuming: bool = False
+    # notifications left to be replayed after a resume
+    replayed: int = 0
 
-        try:
-            if data["action"] == CommandType.quit:
-                raise CloseSession
 
-            if data["action"] == CommandType.load_file and data["success"]:
-                await receive_file(
-                    ws=websocket,
-                    dir=DOWNLOADS_FOLDER,
-                    filename=data["payload"]["filename"],
-                )
+async def on_connected(session: ClientSession, data: dict) -> None:
+    if session.resuming:
+        await session.ws.send_json(
+            ResumeModel(session=session.token, seq=session.seq).model_dump()
+        )
+        return
+
+    session.token = data["payload"]["session"]
+    session.seq = session.acked = 0
+
+
+async def on_resumed(session: ClientSession, data: dict) -> None:
+    payload = data["payload"]
+
+    session.resuming = False
+    session.token = payload["session"]
+    session.seq = session.acked = payload["seq"]
+    session.replayed = payload["replayed"]
+
+    if data["success"] and not payload["complete"]:
+        logger.info("Some notifications were lost, fetching unread ones.")
+
+        for room in payload.get("unread", {}):
+            await session.ws.send_json(UnreadModel(room=room).model_dump())
+
+
+async def on_notification(
+    session: ClientSession, data: dict, downloads: deque[str]
+) -> None:
+    if data["action"] == CommandType.quit:
+        raise CloseSession
+
+    # these two are not numbered
+    if data["action"] == CommandType.connected:
+        await on_connected(session, data)
+        return
+
+    if data["action"] == CommandType.resume:
+        await on_resumed(session, data)
+        return
+
+    session.seq += 1
+
+    # a replayed reply is not followed by the file again
+    if session.replayed:
+        session.replayed -= 1
+    elif data["action"] == CommandType.load_file and data["success"]:
+        downloads.append(data["payload"]["filename"])
+
+    if session.seq - session.acked >= settings.DELIVERY_ACK_INTERVAL:
+        await session.ws.send_json(ReceivedModel(seq=session.seq).model_dump())
+        session.acked = session.seq
 
-                logger.info("Loaded.")
 
+async def subscribe_to_messages(session: ClientSession) -> None:
+    websocket = session.ws
+    # filenames of /load_file replies waiting for their binary frame
+    downloads: deque[str] = deque()
+
+    while True:
+        frame_type, frame = await websocket.receive_frame()
+
+        # with sentinel framing every frame is reported as binary, the one
+        # right after a /load_file reply is the file then
+        if downloads and frame_type == FrameType.binary:
+            await save_file(
+                dir=DOWNLOADS_FOLDER, filename=downloads.popleft(), data=frame
+            )
+            logger.info("Loaded.")
+            continue
+
+        data = websocket.codec.decode(frame)
+        await console_output(data)
+
+        try:
+            await on_notification(session, data, downloads)
         except KeyError as ex:
             logger.error(ex)
-        except (ConnectionResetError):
-            raise CloseSession
 
 
-async def handle_input(websocket: WSResponse) -> None:
+async def handle_input(session: ClientSession) -> None:
     commands = init_commands()
 
     while True:
@@ -53,20 +136,47 @@ async def handle_input(websocket: WSResponse) -> None:
 
         try:
             await commands[CommandType(command)].run(
-                ws=websocket, command=command, content=content
+                ws=session.ws, command=command, content=content
             )
         except CommandArgError as ex:
             logger.error(ex)
         except EmptyCommand:
             logger.error("Command is empty!")
-        except ValueError:
+        except (ValueError, KeyError):
             logger.info("Wrong command! Look for /help!")
+        except ConnectionResetError:
+            logger.error("Not connected, try again later.")
 
 
 async def init_connection():
-    reader, writer = await asyncio.open_connection("127.0.0.1", 8000)
+    if settings.WEBSOCKET:
+        reader, writer = await asyncio.open_connection(
+            "127.0.0.1", settings.HTTP_PORT
+        )
+        websocket = WebSocketResponse(reader=reader, writer=writer)
+    else:
+        reader, writer = await asyncio.open_connection("127.0.0.1", 8000)
+        websocket = WSResponse(reader=reader, writer=writer)
+
+    await websocket.handshake(codecs=available_codecs())
+    logger.info(
+        f"Connected: framing {websocket.framing.name}, "
+        f"codec {websocket.codec.name}."
+    )
 
-    return WSResponse(reader=reader, writer=writer)
+    return websocket
+
+
+async def reconnect() -> WSResponse:
+    for _ in range(settings.RECONNECT_ATTEMPTS):
+        await asyncio.sleep(settings.RECONNECT_DELAY)
+
+        try:
+            return await init_connection()
+        except (OSError, ProtocolError):
+            pass
+
+    raise ConnectionResetError
 
 
 async def close_session(ws: WSResponse):
@@ -75,20 +185,28 @@ async def close_session(ws: WSResponse):
 
 
 async def main():
-    ws = await init_connection()
+    session = ClientSession(ws=await init_connection())
+    input_task = asyncio.ensure_future(handle_input(session))
 
-    tasks = [
-        subscribe_to_messages(websocket=ws),
-        handle_input(websocket=ws),
-    ]
     try:
-        await asyncio.gather(*tasks)
+        while True:
+            try:
+                await subscribe_to_messages(session)
+            except ConnectionResetError:
+                print('Connection with server lost, reconnecting...')
+                await session.ws.close()
+
+                session.ws = await reconnect()
+                session.resuming = session.token is not None
+
     except (asyncio.CancelledError):
-        await close_session(ws=ws)
-        pass
+        await close_session(ws=session.ws)
     except (ConnectionResetError, CloseSession):
         print('Connection with server lost.')
-        await ws.close()
+        await session.ws.close()
+    finally:
+        input_task.cancel()
+
 
 if __name__ == "__main__":
     try:
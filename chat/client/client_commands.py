@@ -8,6 +8,9 @@ from chat.utils.my_response import WSResponse
 from chat.client.command_models import (
     SendModel,
     HistoryModel,
+    UnreadModel,
+    AckModel,
+    SearchModel,
     CreateRoomModel,
     JoinRoomModel,
     AddUserModel,
@@ -16,6 +19,7 @@ from chat.client.command_models import (
     RegisterModel,
     LoginModel,
     LogoutModel,
+    StatusModel,
     DeleteRoomModel,
     OpenDialogueModel,
     DeleteDialogueModel,
@@ -31,8 +35,10 @@ logger = logging.getLogger()
 
 SEND_PARSE_ERR = "/send <room_name> <message>"
 SEND_PRIVATE_PARSE_ERR = "/send_private <to_username> <message>"
-HISTORY_PARSE_ERR = "/history [n] [room_name] "
-CREATE_ROOM_PARSE_ERR = "/create_room <room_name> <room_type>"
+HISTORY_PARSE_ERR = "/history [n] [room_name] [before|after <id>]"
+ACK_PARSE_ERR = "/ack <room_name> <seq>"
+SEARCH_PARSE_ERR = "/search <room_name|*> <query>"
+CREATE_ROOM_PARSE_ERR = "/create_room <room_name> <room_type> [ttl]"
 ADD_USER_PARSE_ERR = "/add_user <room_name> <user_name>"
 REMOVE_USER_PARSE_ERR = "/remove_user <room_name> <remove_user>"
 LEAVE_ROOM_PARSE_ERR = "/leave_room <room_name>"
@@ -121,9 +127,21 @@ class HistoryCommand(Command):
 
         notification_count = 20
         room = ""
+        cursor = {}
         if not content:
             content = ""
 
+        # a page before or after a message id: `... before 120`
+        *rest, direction, message_id = ["", ""] + content.split(" ")
+        if direction in ("before", "after"):
+            try:
+                cursor = {f"{direction}_id": int(message_id)}
+            except ValueError:
+                logger.info(HISTORY_PARSE_ERR)
+                return
+
+            content = " ".join(rest).strip()
+
         try:
             n_str, room = content.split(" ", 1)
             notification_count = int(n_str)
@@ -133,7 +151,70 @@ class HistoryCommand(Command):
             except ValueError:
                 room = content.replace(" ", "")
 
-        model = HistoryModel(room=room, notification_count=notification_count)
+        model = HistoryModel(
+            room=room, notification_count=notification_count, **cursor
+        )
+
+        await ws.send_json(model.model_dump())
+
+
+class UnreadCommand(Command):
+    @classmethod
+    async def run(cls, ws: WSResponse, command: str, content: str = None):
+        super().run(ws, command)
+
+        if not command == CommandType.unread:
+            raise UnsuitableCommand
+
+        notification_count = 20
+        room = ""
+        if not content:
+            content = ""
+
+        try:
+            room, n_str = content.split(" ", 1)
+            notification_count = int(n_str)
+        except (ValueError, AttributeError):
+            room = content.replace(" ", "")
+
+        model = UnreadModel(room=room, notification_count=notification_count)
+
+        await ws.send_json(model.model_dump())
+
+
+class SearchCommand(Command):
+    @classmethod
+    async def run(cls, ws: WSResponse, command: str, content: str = None):
+        super().run(ws, command)
+
+        if not command == CommandType.search:
+            raise UnsuitableCommand
+
+        try:
+            room, query = content.split(" ", 1)
+        except (ValueError, AttributeError):
+            logger.info(SEARCH_PARSE_ERR)
+            return
+
+        model = SearchModel(room=room, query=query)
+
+        await ws.send_json(model.model_dump())
+
+
+class AckCommand(Command):
+    @classmethod
+    async def run(cls, ws: WSResponse, command: str, content: str = None):
+        super().run(ws, command)
+
+        if not command == CommandType.ack:
+            raise UnsuitableCommand
+
+        try:
+            room, seq = content.split(" ", 1)
+            model = AckModel(room=room, seq=int(seq))
+        except (ValueError, AttributeError):
+            logger.info(ACK_PARSE_ERR)
+            return
 
         await ws.send_json(model.model_dump())
 
@@ -147,13 +228,16 @@ class CreateRoomCommand(Command):
             raise UnsuitableCommand
 
         try:
-            room_name, room_type = content.split(" ", 1)
+            room_name, room_type, *ttl = content.split(" ")
+            ttl = float(ttl[0]) if ttl else None
 
         except (ValueError, AttributeError):
-            logger.info(HISTORY_PARSE_ERR)
+            logger.info(CREATE_ROOM_PARSE_ERR)
             return
 
-        model = CreateRoomModel(room_name=room_name, room_type=room_type)
+        model = CreateRoomModel(
+            room_name=room_name, room_type=room_type, ttl=ttl
+        )
 
         await ws.send_json(model.model_dump())
 
@@ -277,6 +361,17 @@ class LogoutCommand(Command):
         await ws.send_json(LogoutModel().model_dump())
 
 
+class StatusCommand(Command):
+    @classmethod
+    async def run(cls, ws: WSResponse, command: str, content: str = None):
+        super().run(ws, command)
+
+        if not command == CommandType.status:
+            raise UnsuitableCommand
+
+        await ws.send_json(StatusModel().model_dump())
+
+
 class QuitCommand(Command):
     @classmethod
     async def run(cls, ws: WSResponse, command: str, content: str = None):
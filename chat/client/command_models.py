@@ -1,12 +1,25 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import Optional
+import uuid
 
 from chat.command_types import CommandType
 from chat.subjects import Subjects
 from chat.server.state.room import RoomType
 
 
-class SendModel(BaseModel):
+def new_request_id() -> str:
+    return uuid.uuid4().hex
+
+
+class RequestModel(BaseModel):
+    """
+    Every request carries a client generated id, echoed by the server in
+    each response to it.
+    """
+    request_id: str = Field(default_factory=new_request_id)
+
+
+class SendModel(RequestModel):
     command: CommandType = CommandType.send
     message: str
     room: Optional[str] = ""
@@ -14,80 +27,119 @@ class SendModel(BaseModel):
     to_user: Optional[str] = Subjects.all
 
 
-class HistoryModel(BaseModel):
+class HistoryModel(RequestModel):
     command: CommandType = CommandType.history
     room: Optional[str] = ""
     notification_count: Optional[int] = 20
+    before_id: Optional[int] = None
+    after_id: Optional[int] = None
+
+
+class UnreadModel(RequestModel):
+    command: CommandType = CommandType.unread
+    room: Optional[str] = ""
+    notification_count: Optional[int] = 20
+    after: Optional[int] = None
+
 
+class SearchModel(RequestModel):
+    command: CommandType = CommandType.search
+    room: str
+    query: str
+    limit: Optional[int] = 20
+    cursor: Optional[list[int]] = None
 
-class CreateRoomModel(BaseModel):
+
+class AckModel(RequestModel):
+    command: CommandType = CommandType.ack
+    room: str
+    seq: int
+
+
+class CreateRoomModel(RequestModel):
     command: CommandType = CommandType.create_room
     room_name: str
     room_type: RoomType
+    ttl: Optional[float] = None
 
 
-class JoinRoomModel(BaseModel):
+class JoinRoomModel(RequestModel):
     command: CommandType = CommandType.join_room
     room_name: str
 
 
-class AddUserModel(BaseModel):
+class AddUserModel(RequestModel):
     command: CommandType = CommandType.add_user
     room_name: str
     new_user: str
 
 
-class RemoveUserModel(BaseModel):
+class RemoveUserModel(RequestModel):
     command: CommandType = CommandType.remove_user
     room_name: str
     remove_user: str
 
 
-class LeaveRoomModel(BaseModel):
+class LeaveRoomModel(RequestModel):
     command: CommandType = CommandType.leave_room
     room_name: str
 
 
-class RegisterModel(BaseModel):
+class RegisterModel(RequestModel):
     command: CommandType = CommandType.register
     username: str
     password: str
 
 
-class LoginModel(BaseModel):
+class LoginModel(RequestModel):
     command: CommandType = CommandType.login
     username: str
     password: str
 
 
-class LogoutModel(BaseModel):
+class LogoutModel(RequestModel):
     command: CommandType = CommandType.logout
 
 
-class DeleteRoomModel(BaseModel):
+class StatusModel(RequestModel):
+    command: CommandType = CommandType.status
+
+
+class DeleteRoomModel(RequestModel):
     command: CommandType = CommandType.delete_room
     room_name: str
 
 
-class OpenDialogueModel(BaseModel):
+class OpenDialogueModel(RequestModel):
     command: CommandType = CommandType.open_dialogue
     with_user: str
 
 
-class DeleteDialogueModel(BaseModel):
+class DeleteDialogueModel(RequestModel):
     command: CommandType = CommandType.delete_dialogue
     with_user: str
 
 
-class PublishFileModel(BaseModel):
+class PublishFileModel(RequestModel):
     command: CommandType = CommandType.publish_file
     filename: str
 
 
-class LoadFileModel(BaseModel):
+class LoadFileModel(RequestModel):
     command: CommandType = CommandType.load_file
     key: str
 
 
-class QuitModel(BaseModel):
+class ResumeModel(RequestModel):
+    command: CommandType = CommandType.resume
+    session: str
+    seq: int
+
+
+class ReceivedModel(RequestModel):
+    command: CommandType = CommandType.received
+    seq: int
+
+
+class QuitModel(RequestModel):
     command: CommandType = CommandType.quit
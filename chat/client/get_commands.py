@@ -2,6 +2,9 @@ from chat.client.client_commands import (
     Command,
     SendCommand,
     HistoryCommand,
+    UnreadCommand,
+    AckCommand,
+    SearchCommand,
     LoginCommand,
     LogoutCommand,
     RegisterCommand,
@@ -17,6 +20,7 @@ from chat.client.client_commands import (
     DeleteDialogueCommand,
     SendPrivateCommand,
     HelpCommand,
+    StatusCommand,
     QuitCommand,
 )
 from chat.command_types import CommandType
@@ -30,6 +34,10 @@ def init_commands() -> dict[CommandType, type[Command]]:
     commands[CommandType.send] = SendCommand
     commands[CommandType.send_private] = SendPrivateCommand
     commands[CommandType.history] = HistoryCommand
+    commands[CommandType.unread] = UnreadCommand
+    commands[CommandType.ack] = AckCommand
+    commands[CommandType.search] = SearchCommand
+    commands[CommandType.status] = StatusCommand
 
     commands[CommandType.login] = LoginCommand
     commands[CommandType.logout] = LogoutCommand
@@ -9,9 +9,17 @@ DOC = """
 
     `/send_private <username> <message>`: sends a private message to a specified username; need to /open_dialogue before using this;
 
-    `/history [n] [room_name]` : returns last n messages available inside of current room; n = 20 by default; if no room_name passed -- returns user's action history if loggedin.
+    `/status` : returns current user name and rooms the user is in;
 
-    `/create_room <room_name> <room_type := (/open or /restricted)>` : creates a room with current user as admin (need to be logged in);
+    `/history [n] [room_name] [before|after <id>]` : returns last n messages available inside of current room, or n messages before/after the message with that id (its seq); n = 20 by default; the reply's next_cursor is the id to ask the next page with; if no room_name passed -- returns user's action history if loggedin.
+
+    `/unread [room_name] [n]` : returns up to n (20 by default) messages of the room you have not acknowledged yet; without room_name -- unread counts of your rooms;
+
+    `/ack <room_name> <seq>` : marks messages of the room up to seq as read;
+
+    `/search <room_name|*> <query>` : finds messages having all the words of the query, "quoted phrases" as written, in the room or (*) in all your rooms; newest first, 20 per page;
+
+    `/create_room <room_name> <room_type := (/open or /restricted)> [ttl]` : creates a room with current user as admin (need to be logged in); its messages expire after ttl seconds;
 
     `/delete_room <room_name>` : deletes the room if current user is admin;
 
@@ -50,6 +58,10 @@ class CommandType(str, Enum):
     send_private = "/send_private"
 
     history = "/history"
+    status = "/status"
+    unread = "/unread"
+    ack = "/ack"
+    search = "/search"
 
     create_room = "/create_room"
     delete_room = "/delete_room"
@@ -72,7 +84,10 @@ class CommandType(str, Enum):
 
     help = "/help"
 
+    handshake = "/handshake"
     connected = "/connected"
+    resume = "/resume"
+    received = "/received"
     error = "/error"
 
     quit = "/quit"
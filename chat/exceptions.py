@@ -56,3 +56,13 @@ class NoRoomFound(Exception):
 
 class CloseSession(Exception):
     pass
+
+
+class ProtocolError(Exception):
+    pass
+
+
+class HTTPError(Exception):
+    def __init__(self, status: int = 400) -> None:
+        super().__init__(status)
+        self.status = status
@@ -1,3 +1,5 @@
+import asyncio
+import os
 from pathlib import Path
 import aiofiles
 from aiofiles.os import makedirs
@@ -26,6 +28,28 @@ async def write_file(filepath: str, data: str):
         await f.write(data)
 
 
+async def sync_file(filepath: str):
+    def fsync():
+        fd = os.open(filepath, os.O_RDONLY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+    await asyncio.to_thread(fsync)
+
+
+async def replace_file(filepath: str, data: str):
+    """
+    Writes the new version aside and swaps it in, so a crash leaves either
+    the old or the new file whole.
+    """
+    tmp = filepath + ".tmp"
+    await write_file(tmp, data)
+    await sync_file(tmp)
+    await aiofiles.os.replace(tmp, filepath)
+
+
 async def read_file(filepath) -> dict:
     async with aiofiles.open(file=filepath, mode="r") as f:
         data = await f.read()
@@ -33,6 +57,15 @@ async def read_file(filepath) -> dict:
     return json.loads(data)
 
 
+def read_file_sync(filepath) -> dict:
+    """
+    For files read where nothing can be awaited, in a thread if they are
+    large (chunks of room logs) or at startup.
+    """
+    with open(filepath, "rb") as f:
+        return json.loads(f.read())
+
+
 def to_dict(data: dict[str, dataclasses.dataclass]):
     out = dict()
     for key, value in data.items():
@@ -43,16 +76,24 @@ def to_dict(data: dict[str, dataclasses.dataclass]):
     return out
 
 
-async def receive_file(ws: WSResponse, dir: str, filename: str):
+async def save_file(dir: str, filename: str, data: bytes):
     await aiofiles.os.makedirs(dir, exist_ok=True)
     async with aiofiles.open(dir + "/" + filename, "wb") as f:
-        chunk = await ws.receive_bytes()
-        await f.write(chunk)
+        await f.write(data)
 
         return True
 
 
-async def send_file(ws: WSResponse, path: str):
+async def receive_file(ws: WSResponse, dir: str, filename: str):
+    return await save_file(
+        dir=dir, filename=filename, data=await ws.receive_bytes()
+    )
+
+
+async def read_bytes(path: str, size: int = -1) -> bytes:
     async with aiofiles.open(path, "rb") as f:
-        chunk = await f.read(2**16)
-        await ws.send_bytes(chunk)
+        return await f.read(size)
+
+
+async def send_file(ws: WSResponse, path: str):
+    await ws.send_bytes(await read_bytes(path))
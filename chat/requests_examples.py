@@ -1,5 +1,6 @@
 from datetime import datetime
 from enum import Enum
+from unittest.mock import ANY
 
 from chat.command_types import CommandType
 
@@ -16,6 +17,7 @@ class SendRequests(Enum):
         "room": "Global",
         "private": False,
         "to_user": "/all",
+        "request_id": ANY,
     }
     SEND_JSON_RESP = {
         "action": CommandType.send,
@@ -24,6 +26,7 @@ class SendRequests(Enum):
         "datetime": test_dt,
         "user": "andre",
         "room_name": "Global",
+        "seq": 1,
         "payload": {"private": False, "to": "/all", "message": "hello"},
     }
 
@@ -34,13 +37,19 @@ class SendRequests(Enum):
         "room": "",
         "private": True,
         "to_user": "user2",
+        "request_id": ANY,
     }
 
 
 class HistoryRequests(Enum):
     COMMAND = "1 Global"
     JSON_REQ = {
-        "command": "/history", "room": "Global", "notification_count": 1
+        "command": "/history",
+        "room": "Global",
+        "notification_count": 1,
+        "before_id": None,
+        "after_id": None,
+        "request_id": ANY,
     }
     JSON_RESP = {
         "action": CommandType.history,
@@ -48,18 +57,29 @@ class HistoryRequests(Enum):
         "reason": "",
         "datetime": test_dt,
         "user": "andre",
-        "payload": {"history": [SendRequests.SEND_JSON_RESP.value]},
+        "payload": {
+            "history": [SendRequests.SEND_JSON_RESP.value],
+            "next_cursor": None,
+        },
     }
 
     USER_COMMAND = "10"
     USER_DEFAULT_COMMAND = " "
     USER_JSON_REQ = {
-        "command": "/history", "room": "", "notification_count": 10
+        "command": "/history",
+        "room": "",
+        "notification_count": 10,
+        "before_id": None,
+        "after_id": None,
+        "request_id": ANY,
     }
     USER_DEFAULT_JSON_REQ = {
         "command": "/history",
         "room": "",
         "notification_count": 20,
+        "before_id": None,
+        "after_id": None,
+        "request_id": ANY,
     }
 
     HISTORY_USER_DEFAULT_USER_JSON_RESP = {
@@ -78,14 +98,47 @@ class HistoryRequests(Enum):
                     "user": "andre",
                     "payload": {"room_name": "open_room"},
                 }
-            ]
+            ],
+            "next_cursor": None,
         },
     }
 
 
+class UnreadRequests(Enum):
+    COMMAND = "Global 2"
+    JSON_REQ = {
+        "command": "/unread",
+        "room": "Global",
+        "notification_count": 2,
+        "after": None,
+        "request_id": ANY,
+    }
+    ROOMS_COMMAND = ""
+    ROOMS_JSON_REQ = {
+        "command": "/unread",
+        "room": "",
+        "notification_count": 20,
+        "after": None,
+        "request_id": ANY,
+    }
+
+    ACK_COMMAND = "Global 2"
+    ACK_JSON_REQ = {
+        "command": "/ack",
+        "room": "Global",
+        "seq": 2,
+        "request_id": ANY,
+    }
+
+
 class RegisterRequests(Enum):
     COMMAND = "user1 123"
-    JSON_REQ = {"command": "/register", "username": "user1", "password": "123"}
+    JSON_REQ = {
+        "command": "/register",
+        "username": "user1",
+        "password": "123",
+        "request_id": ANY,
+    }
     JSON_RESP = {
         "action": CommandType.register,
         "datetime": test_dt,
@@ -97,9 +150,17 @@ class RegisterRequests(Enum):
 
 class LoginRequests(Enum):
     COMMAND = "user1 123"
-    JSON_REQ = {"command": "/login", "username": "user1", "password": "123"}
+    JSON_REQ = {
+        "command": "/login",
+        "username": "user1",
+        "password": "123",
+        "request_id": ANY,
+    }
     JSON_REQ_BAD = {
-        "command": "/login", "username": "user1", "password": "1234"
+        "command": "/login",
+        "username": "user1",
+        "password": "1234",
+        "request_id": ANY,
     }
     JSON_RESP = {
         "action": CommandType.login,
@@ -129,7 +190,7 @@ class LoginRequests(Enum):
 
 class LogoutRequests(Enum):
     LOGOUT_COMMAND = ""
-    LOGOUT_JSON_REQ = {"command": "/logout"}
+    LOGOUT_JSON_REQ = {"command": "/logout", "request_id": ANY}
     LOGOUT_JSON_RESP = {
         "action": "/logout",
         "success": True,
@@ -145,6 +206,8 @@ class CreateOpenRoomRequests(Enum):
         "command": CommandType.create_room,
         "room_name": "open_room",
         "room_type": "/open",
+        "ttl": None,
+        "request_id": ANY,
     }
     CREATE_JSON_RESP_ANON = {
         "action": CommandType.create_room,
@@ -165,7 +228,9 @@ class CreateOpenRoomRequests(Enum):
 
     DELETE_COMMAND = "open_room"
     DELETE_JSON_REQ = {
-        "command": CommandType.delete_room, "room_name": "open_room"
+        "command": CommandType.delete_room,
+        "room_name": "open_room",
+        "request_id": ANY,
     }
     DELETE_JSON_RESP_ANON = {
         "action": CommandType.delete_room,
@@ -187,7 +252,11 @@ class CreateOpenRoomRequests(Enum):
 
 class JoinOpenRequests(Enum):
     COMMAND = "open_room"
-    REQ = {"command": CommandType.join_room, "room_name": "open_room"}
+    REQ = {
+        "command": CommandType.join_room,
+        "room_name": "open_room",
+        "request_id": ANY,
+    }
     RESP_ANON = {
         "action": CommandType.join_room,
         "success": False,
@@ -216,22 +285,29 @@ class RestrictedRoomRequests(Enum):
         "command": CommandType.create_room,
         "room_name": "restricted_room",
         "room_type": "/restricted",
+        "request_id": ANY,
     }
     ADD_USER_REQ = {
         "command": CommandType.add_user,
         "room_name": "restricted_room",
         "new_user": "user2",
+        "request_id": ANY,
     }
     JOIN_REQ = {
-        "command": CommandType.join_room, "room_name": "restricted_room"
+        "command": CommandType.join_room,
+        "room_name": "restricted_room",
+        "request_id": ANY,
     }
     REMOVE_USER_REQ = {
         "command": CommandType.remove_user,
         "room_name": "restricted_room",
         "remove_user": "user2",
+        "request_id": ANY,
     }
     LEAVE_REQ = {
-        "command": CommandType.leave_room, "room_name": "restricted_room"
+        "command": CommandType.leave_room,
+        "room_name": "restricted_room",
+        "request_id": ANY,
     }
 
     CREATE_ROOM_RESP_SUCCESS = {
@@ -311,7 +387,9 @@ class RestrictedRoomRequests(Enum):
 class OpenDialogueRequests(Enum):
     OPEN_COMMAND = "user1"
     OPEN_JSON_REQ = {
-        "command": CommandType.open_dialogue, "with_user": "user1"
+        "command": CommandType.open_dialogue,
+        "with_user": "user1",
+        "request_id": ANY,
     }
     OPEN_JSON_RESP_SUCCESS = {
         "action": CommandType.open_dialogue,
@@ -324,7 +402,9 @@ class OpenDialogueRequests(Enum):
 
     DELETE_COMMAND = "user2"
     DELETE_JSON_REQ = {
-        "command": CommandType.delete_dialogue, "with_user": "user2"
+        "command": CommandType.delete_dialogue,
+        "with_user": "user2",
+        "request_id": ANY,
     }
     DELETE_JSON_RESP_ERR = {
         "action": CommandType.delete_dialogue,
@@ -3,22 +3,14 @@ import logging
 import asyncio
 from asyncio import StreamReader, StreamWriter
 
+from chat import settings
 from chat.utils.my_response import WSResponse
-from chat.server.get_commands import init_commands
-from chat.server.state.meta import Meta
-from chat.server.state.user import UserStore
-from chat.server.state.message import (
-    NotificationStore,
-    get_connected_notification,
-    get_error_message,
-)
-from chat.server.state.room import RoomStore
-from chat.exceptions import (
-    BadRequest,
-    NoRegistredUserFound,
-    CloseSession
-)
-from chat.server.user_actions import LogoutAction
+from chat.server.http_server import handle_http
+from chat.server.session import serve, sockets
+from chat.server.state.message import NotificationStore
+from chat.server.state.snapshot import MemoryBackend
+from chat.server.state.sqlite import SqliteBackend
+from chat.server.state.storage import Storage
 from chat.command_types import CommandType
 
 logging.basicConfig(
@@ -29,95 +21,63 @@ logging.basicConfig(
 )
 logger = logging.getLogger("server")
 
-NO_REGISTRED_FOUND = "Cannot apply this operation to anonymus user."
-BAD_REQUEST = "Bad request."
-
 HOST, PORT = "", 8000
 
-sockets: list[WSResponse] = []
-
-
-def log_requests(request: dict, username: str) -> None:
-    exclude = ['password']
-
-    logger.info(
-        f'{username}: %s',
-        {x: request[x] for x in request if x not in exclude}
-    )
-
-
-async def close_session(ws: WSResponse, user_name: str):
-    try:
-        sockets.remove(ws)
-        await NotificationStore().process(
-            ws=ws,
-            notification=LogoutAction.get_logout(
-                success=True,
-                reason='',
-                user_name=user_name
-            )
-        )
-        logger.info(f'Closing session with username:{user_name}')
-        await ws.close()
-    except ConnectionResetError:
-        pass
+# by settings.STORAGE
+BACKENDS = {
+    "memory": MemoryBackend,
+    "sqlite": SqliteBackend,
+}
 
 
 async def handle_client(reader: StreamReader, writer: StreamWriter):
-    user_name = UserStore().get_anonymus_name()
-    logger.info(f'Opening session with username:{user_name}')
-    meta = Meta(user_name, False)
-
-    websocket = WSResponse(reader=reader, writer=writer)
-
-    sockets.append(websocket)
+    await serve(WSResponse(reader=reader, writer=writer))
 
-    await NotificationStore().process(
-        ws=websocket, notification=get_connected_notification(
-            meta.user_name
-        ))
-
-    commads = init_commands()
 
+async def log_queue_stats(interval: float):
+    """
+    Periodically logs outbound queue depth and drop counters.
+    """
     while True:
-        message = await websocket.receive_json()
-        log_requests(message, meta.user_name)
-
-        command_str = message.get("command")
-
-        try:
-
-            meta = await commads[command_str].run(
-                ws_response=websocket,
-                meta=meta,
-                command=command_str,
-                message_json=message,
-            )
-
-        except BadRequest:
-            await NotificationStore().process(
-                ws=websocket, notification=get_error_message(
-                    reason=BAD_REQUEST
-                ))
-        except NoRegistredUserFound:
-            await NotificationStore().process(
-                ws=websocket, notification=get_error_message(
-                    reason=NO_REGISTRED_FOUND
-                ))
-        except (CloseSession, ConnectionResetError):
-            await close_session(ws=websocket, user_name=meta.user_name)
-            return
+        await asyncio.sleep(interval)
+
+        stats = [ws.stats for ws in sockets]
+        logger.info(
+            "Outbound queues: connections=%s depth=%s max_depth=%s "
+            "dropped=%s congested=%s",
+            len(stats),
+            sum(s.depth for s in stats),
+            max((s.max_depth for s in stats), default=0),
+            sum(s.dropped for s in stats),
+            sum(s.congested for s in stats),
+        )
 
 
 async def init_app(host, port):
 
-    await UserStore().load()
-    await RoomStore().load()
-    await NotificationStore().load()
+    Storage().backend = BACKENDS[settings.STORAGE]()
+    restored = await Storage().backend.open()
+    logger.info(f"Restored {settings.STORAGE} storage, {restored} records.")
 
     logger.info("Server started. Ctrl+C to shutdown (to save state).")
     server = await asyncio.start_server(handle_client, host, port)
 
+    http_server = None
+    if settings.HTTP_PORT:
+        http_server = await asyncio.start_server(
+            handle_http,
+            host,
+            settings.HTTP_PORT,
+            limit=settings.HTTP_MAX_HEADER_SIZE,
+        )
+
+    asyncio.ensure_future(
+        NotificationStore().run_expiry(settings.EXPIRY_BUCKET)
+    )
+
+    if settings.QUEUE_STATS_INTERVAL > 0:
+        asyncio.ensure_future(log_queue_stats(settings.QUEUE_STATS_INTERVAL))
+
     async with server:
         try:
             await server.serve_forever()
@@ -128,6 +88,9 @@ async def init_app(host, port):
             [await ws.close() for ws in sockets]
 
             server.close()
+            if http_server is not None:
+                http_server.close()
+
             await shutdown()
 
 
@@ -140,11 +103,9 @@ async def shutdown():
     tasks = asyncio.all_tasks()
     tasks.remove(asyncio.current_task())
     [task.cancel() for task in tasks]
-    [await task for task in tasks]
+    await asyncio.gather(*tasks, return_exceptions=True)
 
-    await UserStore().dump()
-    await RoomStore().dump()
-    await NotificationStore().dump()
+    await Storage().backend.close()
 
 
 if __name__ == "__main__":
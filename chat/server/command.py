@@ -1,12 +1,47 @@
 import logging
 
 from .state.meta import Meta
+from ..exceptions import BadRequest
 from ..utils.my_response import WSResponse
 
 logger = logging.getLogger()
 
+# request fields the notifications and the stores are built of; they are
+# checked as requests come in, notifications are not validated again
+STRING_FIELDS = frozenset((
+    "filename",
+    "key",
+    "message",
+    "new_user",
+    "password",
+    "query",
+    "remove_user",
+    "room",
+    "room_name",
+    "room_type",
+    "session",
+    "to_user",
+    "username",
+    "with_user",
+))
+
+
+def validate_request(message: dict) -> None:
+    """
+    Raises BadRequest if a string field of the request has another type;
+    numbers are converted where they are read.
+    """
+    for name in STRING_FIELDS.intersection(message):
+        if not isinstance(message[name], (str, type(None))):
+            raise BadRequest
+
 
 class Command:
+    # waits for all other commands of the connection, e.g. changes meta
+    exclusive: bool = False
+    # the command is followed by a binary frame, passed as "attachment"
+    attachment: bool = False
+
     @classmethod
     async def run(
         cls,
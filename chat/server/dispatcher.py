@@ -0,0 +1,162 @@
+import asyncio
+import logging
+from typing import Optional
+
+from chat import settings
+from chat.utils.my_response import WSResponse
+from chat.command_types import CommandType
+from chat.exceptions import (
+    BadRequest,
+    NoRegistredUserFound,
+    CloseSession,
+    ProtocolError,
+)
+from chat.server.command import Command, validate_request
+from chat.server.state.meta import Meta, request_id
+from chat.server.state.session import SessionRegistry
+from chat.server.state.message import NotificationStore, get_error_message
+
+logger = logging.getLogger("server")
+
+NO_REGISTRED_FOUND = "Cannot apply this operation to anonymus user."
+BAD_REQUEST = "Bad request."
+
+
+def get_lane(message: dict) -> Optional[str]:
+    """
+    Commands sharing a lane (room, dialogue) are executed in arrival order.
+    """
+    if message.get("private"):
+        return "@" + str(message.get("to_user"))
+
+    if message.get("with_user"):
+        return "@" + str(message["with_user"])
+
+    return message.get("room") or message.get("room_name") or None
+
+
+class Dispatcher:
+    """
+    Runs commands received over one connection. Independent commands run
+    concurrently (up to `limit` at once), commands of one lane keep their
+    order, `Command.exclusive` ones wait for everything else to finish.
+    """
+
+    def __init__(
+        self,
+        ws: WSResponse,
+        meta: Meta,
+        commands: dict[CommandType, type[Command]],
+        limit: int = settings.MAX_INFLIGHT_COMMANDS,
+    ) -> None:
+        self.ws = ws
+        self.meta = meta
+        self.commands = commands
+
+        self.__slots = asyncio.Semaphore(limit)
+        self.__lanes: dict[str, asyncio.Lock] = {}
+        self.__lane_users: dict[str, int] = {}
+        self.__tasks: set[asyncio.Task] = set()
+        self.__failure: Optional[BaseException] = None
+
+    async def submit(self, message: dict) -> None:
+        """
+        Returns as soon as the command is scheduled; raises if the session
+        has to be closed.
+        """
+        if self.__failure is not None:
+            raise self.__failure
+
+        command = self.commands.get(message.get("command"))
+
+        try:
+            if command is None:
+                raise BadRequest
+            validate_request(message)
+        except BadRequest:
+            await self.__reply_error(message, BAD_REQUEST)
+            return
+
+        if command.attachment:
+            message["attachment"] = await self.ws.receive_bytes()
+
+        if command.exclusive:
+            await self.drain()
+            await self.__run(command, message)
+            return
+
+        await self.__slots.acquire()
+
+        task = asyncio.ensure_future(self.__run_in_lane(command, message))
+        self.__tasks.add(task)
+        task.add_done_callback(self.__tasks.discard)
+
+    async def drain(self) -> None:
+        if self.__tasks:
+            await asyncio.gather(*self.__tasks, return_exceptions=True)
+
+    def cancel(self) -> None:
+        for task in self.__tasks:
+            task.cancel()
+
+    async def __run_in_lane(self, command: type[Command], message: dict):
+        try:
+            lane = get_lane(message)
+
+            if lane is None:
+                await self.__run(command, message)
+                return
+
+            lock = self.__lanes.setdefault(lane, asyncio.Lock())
+            self.__lane_users[lane] = self.__lane_users.get(lane, 0) + 1
+
+            try:
+                async with lock:
+                    await self.__run(command, message)
+            finally:
+                self.__lane_users[lane] -= 1
+
+                if not self.__lane_users[lane]:
+                    del self.__lane_users[lane]
+                    del self.__lanes[lane]
+
+        except (CloseSession, ProtocolError, ConnectionResetError) as ex:
+            self.__failure = ex
+        except Exception:
+            logger.exception(f"Command failed: {message.get('command')}")
+        finally:
+            self.__slots.release()
+
+    async def __run(self, command: type[Command], message: dict) -> None:
+        token = request_id.set(message.get("request_id"))
+        user_name = self.meta.user_name
+
+        try:
+            self.meta = await command.run(
+                ws_response=self.ws,
+                meta=self.meta,
+                command=message.get("command"),
+                message_json=message,
+            )
+        except BadRequest:
+            await self.__reply_error(message, BAD_REQUEST)
+        except NoRegistredUserFound:
+            await self.__reply_error(message, NO_REGISTRED_FOUND)
+        finally:
+            request_id.reset(token)
+
+            # logged in or out
+            if self.meta.user_name != user_name:
+                SessionRegistry().rename(
+                    old=user_name, new=self.meta.user_name, ws=self.ws
+                )
+
+    async def __reply_error(self, message: dict, reason: str) -> None:
+        token = request_id.set(message.get("request_id"))
+
+        try:
+            await NotificationStore().process(
+                ws=self.ws, notification=get_error_message(reason=reason)
+            )
+        finally:
+            request_id.reset(token)
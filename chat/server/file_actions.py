@@ -11,7 +11,7 @@ from chat.server.state.meta import Meta
 from chat.server.state.message import NotificationStore, UserAction
 from chat.server.state.file import FileStore
 from chat.server.command import Command
-from chat.manage_files import send_file
+from chat.manage_files import read_bytes
 
 logger = logging.getLogger()
 
@@ -21,10 +21,9 @@ class LoadFileAction(Command):
     def get_load_file_notification(
         user_name: str, filename: str, success: str, reason: str
     ):
-        return UserAction(
+        return UserAction.construct(
             action=CommandType.load_file,
             datetime=str(datetime.now()),
-            expired=False,
             success=success,
             reason=reason,
             payload={"filename": filename},
@@ -47,6 +46,10 @@ class LoadFileAction(Command):
         file = FileStore().get_file(key=key)
 
         if file:
+            # read before notifying, so the file frame follows the
+            # notification without other responses in between
+            data = await read_bytes(file.path)
+
             await NotificationStore().process(
                 ws=ws_response,
                 notification=LoadFileAction.get_load_file_notification(
@@ -57,7 +60,7 @@ class LoadFileAction(Command):
                 ),
             )
 
-            await send_file(ws=ws_response, path=file.path)
+            await ws_response.send_bytes(data)
 
             return meta
 
@@ -74,14 +77,15 @@ class LoadFileAction(Command):
 
 
 class PublishFileAction(Command):
+    attachment = True
+
     @staticmethod
     def get_publish_file_notification(
         user_name: str, filename: str, key: str, success: str, reason: str
     ):
-        return UserAction(
+        return UserAction.construct(
             action=CommandType.publish_file,
             datetime=str(datetime.now()),
-            expired=False,
             success=success,
             reason=reason,
             payload={"filename": filename, "key": key},
@@ -101,12 +105,11 @@ class PublishFileAction(Command):
 
         try:
             filename = message_json["filename"]
+            data = message_json["attachment"]
         except KeyError:
             raise BadRequest
 
-        file = await FileStore().publish_file(
-            filename=filename, ws_response=ws_response
-        )
+        file = await FileStore().publish_file(filename=filename, data=data)
 
         if file is not None:
             await NotificationStore().process(
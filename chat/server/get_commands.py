@@ -2,12 +2,18 @@ from chat.command_types import CommandType
 from chat.server.command import Command
 from chat.server.message_actions import (
     SendAction,
-    HistoryAction
+    HistoryAction,
+    UnreadAction,
+    SearchAction,
+    AckAction,
 )
 from chat.server.user_actions import (
     LoginAction,
     LogoutAction,
     RegisterAction,
+    StatusAction,
+    ResumeAction,
+    ReceivedAction,
     QuitAction
 )
 from chat.server.room_actions import (
@@ -31,10 +37,16 @@ def init_commands() -> dict[CommandType, type[Command]]:
 
     commands[CommandType.send] = SendAction
     commands[CommandType.history] = HistoryAction
+    commands[CommandType.unread] = UnreadAction
+    commands[CommandType.ack] = AckAction
+    commands[CommandType.search] = SearchAction
 
     commands[CommandType.login] = LoginAction
     commands[CommandType.logout] = LogoutAction
     commands[CommandType.register] = RegisterAction
+    commands[CommandType.status] = StatusAction
+    commands[CommandType.resume] = ResumeAction
+    commands[CommandType.received] = ReceivedAction
 
     commands[CommandType.open_dialogue] = OpenDialogueAction
     commands[CommandType.delete_dialogue] = DeleteDialogueAction
@@ -0,0 +1,273 @@
+"""
+HTTP front end: `POST /<command>` runs the same Command classes as the
+stream protocol, the request body is the command's JSON without the
+"command" key. `GET` is accepted for read-only commands, with arguments
+in the query string.
+
+`POST /connect` opens a session and returns its token in the X-Session
+header; every other request carries it in the same header.
+
+A WebSocket upgrade request to WS_PATH hands the connection over to the
+regular session loop.
+"""
+import logging
+from asyncio import StreamReader, StreamWriter
+from http import HTTPStatus
+from typing import Optional
+from urllib.parse import quote
+
+from chat import settings
+from chat.command_types import CommandType
+from chat.exceptions import (
+    BadRequest,
+    CloseSession,
+    HTTPError,
+    NoRegistredUserFound,
+)
+from chat.utils.codecs import DEFAULT_CODEC, choose_codec
+from chat.utils.my_response import FrameType
+from chat.utils.outbound import Priority
+from chat.utils.http_protocol import HTTPConnection, HTTPRequest, HTTPResponse
+from chat.utils.websocket import WebSocketResponse
+from chat.server.command import Command, STRING_FIELDS, validate_request
+from chat.server.dispatcher import BAD_REQUEST, NO_REGISTRED_FOUND
+from chat.server.get_commands import init_commands
+from chat.server.session import serve
+from chat.server.state.http_session import HTTPSessionStore
+from chat.server.state.meta import request_id
+from chat.server.state.message import (
+    NotificationStore,
+    get_connected_notification,
+    get_error_message,
+)
+
+logger = logging.getLogger("server")
+
+CONNECT = "/connect"
+READ_ONLY = (
+    CommandType.status,
+    CommandType.history,
+    CommandType.unread,
+    CommandType.search,
+)
+
+NO_SESSION = "No session, POST /connect first."
+NOT_FOUND = "Not found."
+
+CODEC = choose_codec(["json"]) or DEFAULT_CODEC
+
+
+class HTTPExchange:
+    """
+    Passed to commands in place of WSResponse: collects what the command
+    sends, rendered as one response afterwards.
+    """
+
+    def __init__(self, request: HTTPRequest) -> None:
+        self.request = request
+        self.status = HTTPStatus.OK
+        self.headers: dict[bytes, bytes] = {}
+        self.notifications: list[dict] = []
+        self.attachment: Optional[bytes] = None
+
+    async def send_json(
+        self, data: dict, priority: Priority = Priority.normal
+    ) -> bool:
+        self.notifications.append(data)
+        return True
+
+    async def send_bytes(
+        self,
+        data: bytes,
+        frame_type: FrameType = FrameType.binary,
+        priority: Priority = Priority.normal,
+    ) -> bool:
+        self.attachment = data
+        return True
+
+    async def error(self, status: HTTPStatus, reason: str) -> None:
+        self.status = status
+        await NotificationStore().process(
+            ws=self, notification=get_error_message(reason=reason)
+        )
+
+    async def not_allowed(self) -> None:
+        self.headers[b"Allow"] = b"POST"
+        await self.error(HTTPStatus.METHOD_NOT_ALLOWED, BAD_REQUEST)
+
+    def response(self) -> HTTPResponse:
+        if self.attachment is None:
+            return HTTPResponse(
+                status=self.status,
+                body=CODEC.encode(self.notifications),
+                headers=self.headers,
+                keep_alive=self.request.keep_alive,
+            )
+
+        filename = ""
+        if self.notifications:
+            filename = self.notifications[-1]["payload"].get("filename", "")
+
+        self.headers[b"Content-Disposition"] = (
+            b"attachment; filename*=UTF-8''" + quote(filename).encode()
+        )
+
+        return HTTPResponse(
+            status=self.status,
+            body=self.attachment,
+            content_type=b"application/octet-stream",
+            headers=self.headers,
+            keep_alive=self.request.keep_alive,
+        )
+
+
+def get_message(request: HTTPRequest, command: type[Command]) -> dict:
+    # numeric query arguments are passed on as numbers
+    message: dict = {
+        name: (
+            int(value)
+            if value.isdigit() and name not in STRING_FIELDS
+            else value
+        )
+        for name, value in request.query.items()
+    }
+
+    if command.attachment:
+        message["attachment"] = request.body
+
+    elif request.body:
+        body = CODEC.decode(request.body)
+        if not isinstance(body, dict):
+            raise BadRequest
+
+        message.update(body)
+
+    return message
+
+
+async def connect(exchange: HTTPExchange) -> None:
+    token, meta = HTTPSessionStore().open()
+    logger.info(f'Opening HTTP session with username:{meta.user_name}')
+
+    exchange.headers[b"X-Session"] = token.encode()
+    await NotificationStore().process(
+        ws=exchange,
+        notification=get_connected_notification(meta.user_name, token),
+    )
+
+
+async def handle_request(
+    request: HTTPRequest, commands: dict[CommandType, type[Command]]
+) -> HTTPResponse:
+    exchange = HTTPExchange(request)
+    path = request.path.rstrip("/")
+
+    if path == CONNECT:
+        if request.method != "POST":
+            await exchange.not_allowed()
+        else:
+            await connect(exchange)
+
+        return exchange.response()
+
+    try:
+        command_type = CommandType(path)
+        command = commands[command_type]
+    except (ValueError, KeyError):
+        await exchange.error(HTTPStatus.NOT_FOUND, NOT_FOUND)
+        return exchange.response()
+
+    if request.method != "POST" and not (
+        request.method == "GET" and command_type in READ_ONLY
+    ):
+        await exchange.not_allowed()
+        return exchange.response()
+
+    token = request.headers.get("x-session")
+    meta = HTTPSessionStore().get(token)
+
+    if meta is None:
+        await exchange.error(HTTPStatus.UNAUTHORIZED, NO_SESSION)
+        return exchange.response()
+
+    try:
+        message = get_message(request, command)
+    except BadRequest:
+        await exchange.error(HTTPStatus.BAD_REQUEST, BAD_REQUEST)
+        return exchange.response()
+
+    message["command"] = command_type
+    logger.info(f'{meta.user_name}: HTTP {request.method} {path}')
+
+    await run_command(exchange, command, message, token)
+    return exchange.response()
+
+
+async def run_command(
+    exchange: HTTPExchange, command: type[Command], message: dict, token: str
+) -> None:
+    meta = HTTPSessionStore().get(token)
+    context = request_id.set(
+        message.get("request_id")
+        or exchange.request.headers.get("x-request-id")
+    )
+
+    try:
+        validate_request(message)
+        await command.run(
+            ws_response=exchange,
+            meta=meta,
+            command=message["command"],
+            message_json=message,
+        )
+    except BadRequest:
+        await exchange.error(HTTPStatus.BAD_REQUEST, BAD_REQUEST)
+    except NoRegistredUserFound:
+        await exchange.error(HTTPStatus.FORBIDDEN, NO_REGISTRED_FOUND)
+    except CloseSession:
+        logger.info(f'Closing HTTP session with username:{meta.user_name}')
+        HTTPSessionStore().close(token)
+    finally:
+        request_id.reset(context)
+
+
+async def handle_http(reader: StreamReader, writer: StreamWriter):
+    connection = HTTPConnection(reader=reader, writer=writer)
+    commands = init_commands()
+
+    try:
+        while True:
+            try:
+                request = await connection.read_request()
+            except HTTPError as ex:
+                await connection.write_response(
+                    HTTPResponse(
+                        status=ex.status,
+                        content_type=b"text/plain",
+                        keep_alive=False,
+                    )
+                )
+                return
+
+            if request is None:
+                return
+
+            if (
+                request.path == settings.WS_PATH
+                and request.headers.get("upgrade", "").lower() == "websocket"
+            ):
+                await serve(WebSocketResponse(
+                    reader=reader, writer=writer, request=request
+                ))
+                return
+
+            response = await handle_request(request, commands)
+            await connection.write_response(response, request.version)
+
+            if not response.keep_alive:
+                return
+
+    except (ConnectionResetError, BrokenPipeError):
+        pass
+    finally:
+        await connection.close()
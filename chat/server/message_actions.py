@@ -10,15 +10,25 @@ from chat.exceptions import (
 from chat.server.state.meta import Meta
 from chat.server.state.room import RoomStore
 from chat.server.state.user import UserStore
+from chat.server.state.cursor import ReadCursorStore
 from chat.server.state.message import (
     NotificationStore,
-    get_message_notification
+    get_message_notification,
+    get_unread_notification,
+    get_ack_notification,
+    get_search_notification,
 )
 from chat.server.command import Command
 
 
 logger = logging.getLogger()
 
+NOT_A_MEMBER = "Not a member of this room."
+# `/search` in all the rooms of the user
+ALL_ROOMS = "*"
+# hits per `/search` page at most
+MAX_SEARCH_LIMIT = 100
+
 
 class SendAction(Command):
     @classmethod
@@ -73,9 +83,21 @@ class HistoryAction(Command):
 
         try:
             room = message_json["room"]
-            notification_count = message_json["notification_count"]
+            limit = message_json.get("limit")
+            notification_count = int(
+                message_json["notification_count"] if limit is None else limit
+            )
+            # message ids are the seq of the messages in the room
+            before_id, after_id = (
+                None if message_json.get(name) is None
+                else int(message_json[name])
+                for name in ("before_id", "after_id")
+            )
 
-        except KeyError:
+        except (KeyError, TypeError, ValueError):
+            raise BadRequest
+
+        if before_id is not None and after_id is not None:
             raise BadRequest
 
         if room is None:
@@ -97,6 +119,217 @@ class HistoryAction(Command):
             user_name=meta.user_name,
             room=RoomStore().get_room_by_name(room_name=room),
             n=notification_count,
+            before_id=before_id,
+            after_id=after_id,
+        )
+
+        return meta
+
+
+class UnreadAction(Command):
+    @classmethod
+    async def run(
+        cls,
+        ws_response: WSResponse,
+        meta: Meta,
+        command: str = None,
+        message_json: dict[str, str] = None,
+    ):
+        if not command == CommandType.unread:
+            raise UnsuitableCommand
+
+        try:
+            room_name = message_json["room"]
+            notification_count = int(message_json["notification_count"])
+            after = message_json.get("after")
+            if after is not None:
+                after = int(after)
+        except (KeyError, TypeError, ValueError):
+            raise BadRequest
+
+        if not meta.loggedin:
+            raise NoRegistredUserFound
+
+        store = NotificationStore()
+
+        if not room_name:
+            await store.process(
+                ws=ws_response,
+                notification=get_unread_notification(
+                    user_name=meta.user_name,
+                    success=True,
+                    reason="",
+                    payload={"rooms": store.count_unread(meta.user_name)},
+                ),
+            )
+            return meta
+
+        room = RoomStore().get_room_by_name(room_name)
+
+        if not RoomStore().user_in_room(username=meta.user_name, room=room):
+            await store.process(
+                ws=ws_response,
+                notification=get_unread_notification(
+                    user_name=meta.user_name,
+                    success=False,
+                    reason=NOT_A_MEMBER,
+                    payload={"room_name": room_name},
+                ),
+            )
+            return meta
+
+        cursor = ReadCursorStore().get(meta.user_name, room.key)
+        # pages past the cursor are requested with the last seq received
+        messages, more = await store.get_unread(
+            room=room,
+            after=cursor if after is None else max(after, cursor),
+            n=notification_count,
+        )
+
+        await store.process(
+            ws=ws_response,
+            notification=get_unread_notification(
+                user_name=meta.user_name,
+                success=True,
+                reason="",
+                payload={
+                    "room_name": room_name,
+                    "cursor": cursor,
+                    "last_seq": store.last_seq(room),
+                    "more": more,
+                    "unread": messages,
+                },
+            ),
+        )
+
+        return meta
+
+
+class AckAction(Command):
+    @classmethod
+    async def run(
+        cls,
+        ws_response: WSResponse,
+        meta: Meta,
+        command: str = None,
+        message_json: dict[str, str] = None,
+    ):
+        if not command == CommandType.ack:
+            raise UnsuitableCommand
+
+        try:
+            room_name = message_json["room"]
+            seq = int(message_json["seq"])
+        except (KeyError, TypeError, ValueError):
+            raise BadRequest
+
+        if not meta.loggedin:
+            raise NoRegistredUserFound
+
+        room = RoomStore().get_room_by_name(room_name)
+
+        if not RoomStore().user_in_room(username=meta.user_name, room=room):
+            await NotificationStore().process(
+                ws=ws_response,
+                notification=get_ack_notification(
+                    user_name=meta.user_name,
+                    success=False,
+                    reason=NOT_A_MEMBER,
+                    room_name=room_name,
+                    seq=seq,
+                ),
+            )
+            return meta
+
+        cursor = ReadCursorStore().advance(
+            user_name=meta.user_name,
+            room_key=room.key,
+            seq=min(seq, NotificationStore().last_seq(room)),
+        )
+
+        await NotificationStore().process(
+            ws=ws_response,
+            notification=get_ack_notification(
+                user_name=meta.user_name,
+                success=True,
+                reason="",
+                room_name=room_name,
+                seq=cursor,
+            ),
+        )
+
+        return meta
+
+
+class SearchAction(Command):
+    @classmethod
+    async def run(
+        cls,
+        ws_response: WSResponse,
+        meta: Meta,
+        command: str = None,
+        message_json: dict[str, str] = None,
+    ):
+        if not command == CommandType.search:
+            raise UnsuitableCommand
+
+        try:
+            room_name = message_json["room"]
+            query = str(message_json["query"])
+            limit = int(message_json.get("limit", 20))
+            # [index of the room, seq] of the last hit of the page before
+            cursor = message_json.get("cursor")
+            if cursor is not None:
+                room_index, seq = map(int, cursor)
+                cursor = (max(room_index, 0), seq)
+        except (KeyError, TypeError, ValueError):
+            raise BadRequest
+
+        # an empty page would have the same next cursor over and over
+        if limit < 1:
+            raise BadRequest
+        limit = min(limit, MAX_SEARCH_LIMIT)
+
+        store = RoomStore()
+        if room_name == ALL_ROOMS:
+            rooms = store.get_user_rooms(meta.user_name)
+        else:
+            rooms = [store.get_room_by_name(room_name)]
+
+        rooms = [
+            room for room in rooms
+            if store.user_in_room(username=meta.user_name, room=room)
+        ]
+
+        if not rooms:
+            await NotificationStore().process(
+                ws=ws_response,
+                notification=get_search_notification(
+                    user_name=meta.user_name,
+                    success=False,
+                    reason=NOT_A_MEMBER,
+                    payload={"room_name": room_name, "query": query},
+                ),
+            )
+            return meta
+
+        hits, last = await NotificationStore().search(
+            rooms=rooms, query=query, after=cursor, n=limit
+        )
+
+        await NotificationStore().process(
+            ws=ws_response,
+            notification=get_search_notification(
+                user_name=meta.user_name,
+                success=True,
+                reason="",
+                payload={
+                    "room_name": room_name,
+                    "query": query,
+                    "hits": hits,
+                    "next_cursor": None if last is None else list(last),
+                },
+            ),
         )
 
         return meta
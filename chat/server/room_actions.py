@@ -13,7 +13,7 @@ from chat.exceptions import (
     NoRoomFound,
 )
 from chat.server.state.meta import Meta
-from chat.server.state.room import RoomStore, Room, RoomType
+from chat.server.state.room import RoomStore, Room, RoomType, MAX_TTL
 from chat.server.state.user import UserStore
 from chat.server.state.message import NotificationStore, UserAction
 from chat.server.command import Command
@@ -32,10 +32,9 @@ class JoinRoomAction(Command):
     def get_join_room_notification(
         user_name: str, room_name: str, success: bool, reason: str
     ):
-        return UserAction(
+        return UserAction.construct(
             action=CommandType.join_room,
             datetime=str(datetime.now()),
-            expired=False,
             success=success,
             reason=reason,
             user_name=user_name,
@@ -95,10 +94,9 @@ class LeaveRoomAction(Command):
     def get_leave_room_notification(
         user_name: str, room_name: str, success: bool, reason: str
     ):
-        return UserAction(
+        return UserAction.construct(
             action=CommandType.leave_room,
             datetime=str(datetime.now()),
-            expired=False,
             success=success,
             reason=reason,
             user_name=user_name,
@@ -149,10 +147,9 @@ class CreateRoomAction(Command):
     def get_create_room_notification(
         user_name: str, room_name: str, success: bool, reason: str
     ):
-        return UserAction(
+        return UserAction.construct(
             action=CommandType.create_room,
             datetime=str(datetime.now()),
-            expired=False,
             success=success,
             reason=reason,
             user_name=user_name,
@@ -173,7 +170,15 @@ class CreateRoomAction(Command):
         try:
             room_name = message_json["room_name"]
             room_type = RoomType(message_json["room_type"])
-        except (KeyError, ValueError):
+            # seconds messages are kept for, the server default if absent
+            ttl = message_json.get("ttl")
+            if ttl is not None:
+                ttl = float(ttl)
+        except (KeyError, TypeError, ValueError):
+            raise BadRequest
+
+        # not NaN or infinity either
+        if ttl is not None and not 0 <= ttl <= MAX_TTL:
             raise BadRequest
 
         # See OpenDialogue
@@ -201,6 +206,7 @@ class CreateRoomAction(Command):
                 admins=[meta.user_name],
                 allowed=[meta.user_name],
                 deleted=False,
+                ttl=ttl,
             )
         )
 
@@ -222,10 +228,9 @@ class DeleteRoomAction(Command):
     def get_delete_room_notification(
         user_name: str, room_name: str, success: bool, reason: str
     ):
-        return UserAction(
+        return UserAction.construct(
             action=CommandType.delete_room,
             datetime=str(datetime.now()),
-            expired=False,
             success=success,
             reason=reason,
             user_name=user_name,
@@ -286,10 +291,9 @@ class AddUserAction(Command):
         success: bool,
         reason: str
     ):
-        return UserAction(
+        return UserAction.construct(
             action=CommandType.add_user,
             datetime=str(datetime.now()),
-            expired=False,
             success=success,
             reason=reason,
             user_name=user_name,
@@ -366,10 +370,9 @@ class RemoveUserAction(Command):
         success: bool,
         reason: str
     ):
-        return UserAction(
+        return UserAction.construct(
             action=CommandType.remove_user,
             datetime=str(datetime.now()),
-            expired=False,
             success=success,
             reason=reason,
             user_name=user_name,
@@ -434,10 +437,9 @@ class OpenDialogueAction(Command):
     def get_open_dialogue_notification(
         user_name: str, with_user: str, success: bool, reason: str
     ):
-        return UserAction(
+        return UserAction.construct(
             action=CommandType.open_dialogue,
             datetime=str(datetime.now()),
-            expired=False,
             success=success,
             reason=reason,
             user_name=user_name,
@@ -514,10 +516,9 @@ class DeleteDialogueAction(Command):
     def create_notification(
         user_name: str, with_user: str, success: bool, reason: str
     ):
-        return UserAction(
+        return UserAction.construct(
             action=CommandType.delete_dialogue,
             datetime=str(datetime.now()),
-            expired=False,
             success=success,
             reason=reason,
             user_name=user_name,
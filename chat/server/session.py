@@ -0,0 +1,113 @@
+"""
+Session loop shared by the transports: whatever WSResponse flavour the
+peer connected with, its commands go through the same Dispatcher.
+"""
+import logging
+
+from chat.utils.my_response import WSResponse
+from chat.server.get_commands import init_commands
+from chat.server.dispatcher import Dispatcher, BAD_REQUEST
+from chat.server.state.meta import Meta
+from chat.server.state.user import UserStore
+from chat.server.state.session import SessionRegistry
+from chat.server.state.resume import ResumeStore
+from chat.server.state.message import (
+    NotificationStore,
+    get_connected_notification,
+    get_error_message,
+)
+from chat.exceptions import (
+    BadRequest,
+    CloseSession,
+    ProtocolError,
+)
+from chat.server.user_actions import LogoutAction
+
+logger = logging.getLogger("server")
+
+sockets: list[WSResponse] = []
+
+
+def log_requests(request: dict, username: str) -> None:
+    exclude = ['password', 'attachment']
+
+    logger.info(
+        f'{username}: %s',
+        {x: request[x] for x in request if x not in exclude}
+    )
+
+
+async def close_session(ws: WSResponse, user_name: str):
+    try:
+        sockets.remove(ws)
+        # a parked session has been replaced already
+        SessionRegistry().remove(user_name, ws)
+        await NotificationStore().process(
+            ws=ws,
+            notification=LogoutAction.get_logout(
+                success=True,
+                reason='',
+                user_name=user_name
+            )
+        )
+        logger.info(f'Closing session with username:{user_name}')
+        await ws.close()
+    except ConnectionResetError:
+        pass
+
+
+async def serve(websocket: WSResponse):
+    user_name = UserStore().get_anonymus_name()
+    logger.info(f'Opening session with username:{user_name}')
+    meta = Meta(user_name, False)
+
+    try:
+        await websocket.accept()
+    except (BadRequest, ProtocolError, ConnectionResetError):
+        logger.info(f'Handshake failed for username:{user_name}')
+        await websocket.close()
+        return
+
+    sockets.append(websocket)
+    SessionRegistry().add(meta.user_name, websocket)
+    session = ResumeStore().open(websocket, meta)
+
+    await NotificationStore().process(
+        ws=websocket, notification=get_connected_notification(
+            meta.user_name, session.token
+        ))
+    # notifications are numbered from here on
+    websocket.journal = session.journal
+
+    dispatcher = Dispatcher(ws=websocket, meta=meta, commands=init_commands())
+
+    while True:
+        try:
+            message = await websocket.receive_json()
+            # valid JSON may still be a string, a list, ...
+            if not isinstance(message, dict):
+                raise BadRequest
+            log_requests(message, dispatcher.meta.user_name)
+
+            await dispatcher.submit(message)
+
+        except BadRequest:
+            await NotificationStore().process(
+                ws=websocket, notification=get_error_message(
+                    reason=BAD_REQUEST
+                ))
+        except CloseSession:
+            dispatcher.cancel()
+            ResumeStore().close(dispatcher.meta.session)
+            await close_session(
+                ws=websocket, user_name=dispatcher.meta.user_name
+            )
+            return
+        except (ProtocolError, ConnectionResetError):
+            # the client may come back and resume the session
+            dispatcher.cancel()
+            ResumeStore().park(dispatcher.meta.session, websocket)
+            await close_session(
+                ws=websocket, user_name=dispatcher.meta.user_name
+            )
+            return
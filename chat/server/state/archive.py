@@ -0,0 +1,431 @@
+"""
+Room history older than the messages kept in memory, on disk.
+
+Messages dropped from a room log are appended to the room's archive: a
+directory of segment files named after the seq of their first message, a
+new one is started once the last one reaches ARCHIVE_SEGMENT_SIZE bytes.
+A segment gets a sparse index, the offset of one message in every
+ARCHIVE_INDEX_INTERVAL bytes, when it is first read. Reads map the file
+with mmap and decode only the messages asked for, so the memory used does
+not grow with the size of the archive.
+
+Writes, reads and removals run on one thread, in the order they are made,
+off the event loop; a read sees every message appended before it. Only
+opening an archive reads its directory and the index of its last segment
+in the caller, once per room.
+
+Files are fsynced before a snapshot drops the messages they hold, see
+chat.server.state.snapshot.
+"""
+import asyncio
+from bisect import bisect_right
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+import glob
+import logging
+import mmap
+import os
+import struct
+from typing import Callable, Iterator, Optional
+import uuid
+import zlib
+
+from chat import settings
+from chat.singleton import singleton
+from chat.utils.codecs import DEFAULT_CODEC
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+SEGMENT = "{:012}.log"
+SEGMENTS = "*.log"
+# seq the messages of the room have expired up to
+EXPIRED = "expired"
+
+# body length, seq and crc32 of the body
+HEADER = struct.Struct("!IQI")
+
+
+def read_headers(buf, offset: int, end: int) -> Iterator[tuple[int, int, int]]:
+    """
+    Seq, start and end offset of the intact records in buf[offset:end];
+    stops at the first torn or corrupt record.
+    """
+    while offset + HEADER.size <= end:
+        length, seq, crc = HEADER.unpack_from(buf, offset)
+        stop = offset + HEADER.size + length
+
+        if stop > end or zlib.crc32(buf[offset + HEADER.size:stop]) != crc:
+            return
+
+        yield seq, offset, stop
+        offset = stop
+
+
+def sync_paths(paths: set[str]) -> None:
+    """
+    Fsyncs the files and the directories they are in.
+    """
+    for path in paths | {os.path.dirname(path) for path in paths}:
+        fd = os.open(path, os.O_RDONLY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+
+class AppendFiles:
+    """
+    Files open for appending, at most `limit` at a time: the least
+    recently written one is closed to open another. Remembers the files
+    written since they were last synced.
+
+    The methods touching files are called through `submit`, `queue` or
+    `run`, which run them on the archive thread.
+    """
+
+    def __init__(self, limit: int = settings.ARCHIVE_OPEN_FILES) -> None:
+        self.limit = limit
+        self.unsynced: set[str] = set()
+        self.__fds: OrderedDict[str, int] = OrderedDict()
+        self.__executor: Optional[ThreadPoolExecutor] = None
+        # why a queued change failed; messages may be missing, so syncs
+        # fail until the archive is reopened
+        self.__error: Optional[OSError] = None
+
+    def submit(self, fn: Callable, *args) -> Future:
+        if self.__executor is None:
+            self.__executor = ThreadPoolExecutor(
+                1, thread_name_prefix="archive"
+            )
+
+        return self.__executor.submit(fn, *args)
+
+    def queue(self, fn: Callable, *args) -> None:
+        """
+        Runs a change nobody waits for; a failure is logged and raised by
+        the next sync.
+        """
+        self.submit(self.__change, fn, *args)
+
+    async def run(self, fn: Callable, *args):
+        return await asyncio.wrap_future(self.submit(fn, *args))
+
+    def __change(self, fn: Callable, *args) -> None:
+        try:
+            fn(*args)
+        except OSError as ex:
+            logger.error(f"Unable to archive messages, because: {ex}.")
+            self.__error = self.__error or ex
+
+    def write(self, path: str, data: bytes) -> None:
+        fd = self.__fds.get(path)
+
+        if fd is None:
+            if len(self.__fds) >= self.limit:
+                os.close(self.__fds.popitem(last=False)[1])
+
+            fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            self.__fds[path] = fd
+        else:
+            self.__fds.move_to_end(path)
+
+        os.write(fd, data)
+        self.unsynced.add(path)
+
+    def seal(self, path: str) -> None:
+        """
+        Fsyncs and closes a file that is not written any more.
+        """
+        fd = self.__fds.pop(path, None)
+        if fd is None:
+            fd = os.open(path, os.O_RDONLY)
+
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+        self.unsynced.discard(path)
+
+    def discard(self, path: str) -> None:
+        """
+        Forgets a file about to be removed.
+        """
+        fd = self.__fds.pop(path, None)
+        if fd is not None:
+            os.close(fd)
+
+        self.unsynced.discard(path)
+
+    def sync(self) -> None:
+        """
+        Fsyncs the files written since the last call.
+        """
+        if self.__error is not None:
+            raise OSError(f"Archived messages were lost: {self.__error}")
+
+        paths, self.unsynced = self.unsynced, set()
+
+        try:
+            sync_paths(paths)
+        except BaseException:
+            self.unsynced |= paths
+            raise
+
+    def close(self) -> None:
+        """
+        Waits for the queued work and closes the files.
+        """
+        if self.__executor is not None:
+            self.__executor.shutdown()
+            self.__executor = None
+
+        while self.__fds:
+            os.close(self.__fds.popitem()[1])
+        self.__error = None
+
+
+class Segment:
+    def __init__(self, path: str, first_seq: int, size: int = 0) -> None:
+        self.path = path
+        self.first_seq = first_seq
+        # bytes appended, some may still be queued
+        self.size = size
+        self.last_seq = 0
+
+        # sparse index: seqs and offsets of some of the messages
+        self.seqs: list[int] = []
+        self.offsets: list[int] = []
+        # the messages before this offset are indexed
+        self.indexed = 0
+
+    def index(self, buf, size: int) -> None:
+        """
+        Indexes the messages appended since the last call, in the first
+        `size` bytes; they end where the last intact one does.
+        """
+        for seq, start, end in read_headers(buf, self.indexed, size):
+            if (
+                not self.offsets
+                or start - self.offsets[-1] >= settings.ARCHIVE_INDEX_INTERVAL
+            ):
+                self.seqs.append(seq)
+                self.offsets.append(start)
+
+            self.last_seq = seq
+            self.indexed = end
+
+    def read(self, start: int, stop: int, size: int) -> list[bytes]:
+        """
+        Bodies of the messages with start <= seq < stop in the first
+        `size` bytes, the ones written.
+        """
+        if size == 0:
+            return []
+
+        bodies = []
+
+        with open(self.path, "rb") as f:
+            # shorter if a write failed
+            size = min(size, os.fstat(f.fileno()).st_size)
+            if size == 0:
+                return []
+
+            buf = mmap.mmap(f.fileno(), size, access=mmap.ACCESS_READ)
+
+        with buf:
+            self.index(buf, size)
+
+            i = bisect_right(self.seqs, start) - 1
+            offset = self.offsets[i] if i >= 0 else 0
+
+            for seq, begin, end in read_headers(buf, offset, self.indexed):
+                if seq >= stop:
+                    break
+                if seq >= start:
+                    bodies.append(buf[begin + HEADER.size:end])
+
+        return bodies
+
+
+class RoomArchive:
+    """
+    Messages of one room in seq order; `encode` turns one into a dict to
+    store, `decode` back.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        files: AppendFiles,
+        encode: Callable,
+        decode: Callable,
+        segment_size: int = settings.ARCHIVE_SEGMENT_SIZE,
+    ) -> None:
+        self.path = path
+        self.files = files
+        self.encode = encode
+        self.decode = decode
+        self.segment_size = segment_size
+
+        self.segments: list[Segment] = []
+        self.last_seq = 0
+        self.expired_seq = 0
+
+        self.__load()
+
+    def __load(self) -> None:
+        """
+        Finds the segments and the last message; a torn record at the end,
+        left by a crash, is cut off.
+        """
+        os.makedirs(self.path, exist_ok=True)
+
+        try:
+            with open(os.path.join(self.path, EXPIRED)) as f:
+                self.expired_seq = int(f.read())
+        except (FileNotFoundError, ValueError):
+            pass
+
+        paths = glob.glob(os.path.join(self.path, SEGMENTS))
+        # zero padded, sorted by name they are in order
+        self.segments = [
+            Segment(
+                path, int(os.path.basename(path)[:-4]), os.path.getsize(path)
+            )
+            for path in sorted(paths)
+        ]
+
+        while self.segments:
+            segment = self.segments[-1]
+
+            if segment.size > 0:
+                with open(segment.path, "rb") as f, mmap.mmap(
+                    f.fileno(), segment.size, access=mmap.ACCESS_READ
+                ) as buf:
+                    segment.index(buf, segment.size)
+
+            if segment.indexed == 0:
+                os.remove(segment.path)
+                self.segments.pop()
+                continue
+
+            if segment.indexed < segment.size:
+                os.truncate(segment.path, segment.indexed)
+                segment.size = segment.indexed
+
+            self.last_seq = segment.last_seq
+            break
+
+    def append(self, message) -> None:
+        """
+        Ignores the messages archived already (restored, replayed).
+        """
+        if message.seq <= self.last_seq:
+            return
+
+        body = DEFAULT_CODEC.encode(self.encode(message))
+        record = HEADER.pack(len(body), message.seq, zlib.crc32(body)) + body
+
+        if not self.segments or self.segments[-1].size >= self.segment_size:
+            if self.segments:
+                self.files.queue(self.files.seal, self.segments[-1].path)
+
+            path = os.path.join(self.path, SEGMENT.format(message.seq))
+            self.segments.append(Segment(path, message.seq))
+
+        segment = self.segments[-1]
+        self.files.queue(self.files.write, segment.path, record)
+        segment.size += len(record)
+        self.last_seq = message.seq
+
+    def expire(self, seq: int) -> int:
+        """
+        Hides the messages up to `seq` and removes the segments holding
+        only those; returns the number of bytes removed.
+        """
+        if seq <= self.expired_seq:
+            return 0
+
+        self.expired_seq = seq
+
+        removed = []
+        # the last segment is kept, appends go there
+        while len(self.segments) > 1 and self.segments[1].first_seq <= seq + 1:
+            removed.append(self.segments.pop(0))
+
+        self.files.queue(self.__expire, seq, [s.path for s in removed])
+
+        return sum(segment.size for segment in removed)
+
+    def __expire(self, seq: int, paths: list[str]) -> None:
+        with open(os.path.join(self.path, EXPIRED), "w") as f:
+            f.write(str(seq))
+
+        for path in paths:
+            self.files.discard(path)
+            os.remove(path)
+
+    async def read(self, start: int, stop: int) -> list:
+        """
+        The messages with start <= seq < stop, oldest first.
+        """
+        start = max(start, self.expired_seq + 1)
+        firsts = [segment.first_seq for segment in self.segments]
+        i = max(bisect_right(firsts, start) - 1, 0)
+        # the bytes appended so far, later ones may not be written yet
+        segments = [
+            (segment, segment.size)
+            for segment in self.segments[i:]
+            if segment.first_seq < stop
+        ]
+
+        return await self.files.run(self.__read, segments, start, stop)
+
+    def __read(self, segments: list, start: int, stop: int) -> list:
+        messages = []
+
+        for segment, size in segments:
+            messages.extend(
+                self.decode(DEFAULT_CODEC.decode(body))
+                for body in segment.read(start, stop, size)
+            )
+
+        return messages
+
+
+@singleton
+class Archives:
+    def __init__(self) -> None:
+        # None while closed, room logs keep their messages in memory only
+        self.dir: Optional[str] = None
+        self.files = AppendFiles()
+
+    @property
+    def opened(self) -> bool:
+        return self.dir is not None
+
+    def open(self, path: str) -> None:
+        os.makedirs(path, exist_ok=True)
+        self.dir = path
+
+    def room(
+        self, key: uuid.UUID, encode: Callable, decode: Callable
+    ) -> Optional[RoomArchive]:
+        if self.dir is None:
+            return None
+
+        return RoomArchive(
+            os.path.join(self.dir, str(key)), self.files, encode, decode
+        )
+
+    async def sync(self) -> None:
+        """
+        Fsyncs the messages archived so far.
+        """
+        await self.files.run(self.files.sync)
+
+    def close(self) -> None:
+        self.files.close()
+        self.dir = None
@@ -0,0 +1,91 @@
+import logging
+import uuid
+
+from chat.singleton import singleton
+from chat.manage_files import read_file
+from chat.server.state.segments import Segments
+from chat.server.state.storage import Storage
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+@singleton
+class ReadCursorStore:
+    """
+    Sequence number of the last room message each user has acknowledged,
+    by user name and room key. Cursors never move backwards.
+    """
+
+    def __init__(self) -> None:
+        self.cursors: dict[str, dict[uuid.UUID, int]] = {}
+        self.segments = Segments("cursors")
+
+    def get(self, user_name: str, room_key: uuid.UUID) -> int:
+        return self.cursors.get(user_name, {}).get(room_key, 0)
+
+    def advance(self, user_name: str, room_key: uuid.UUID, seq: int) -> int:
+        """
+        Moves the cursor forward to `seq`; returns the resulting cursor.
+        """
+        cursors = self.cursors.setdefault(user_name, {})
+        if seq <= cursors.get(room_key, 0):
+            return cursors.get(room_key, 0)
+
+        cursors[room_key] = seq
+        self.segments.touch(user_name)
+        Storage().append(
+            "cursors", "advance", user_name, str(room_key), seq
+        )
+
+        return seq
+
+    def redo(self, op: str, args: list) -> None:
+        """
+        Applies a change read from the write-ahead log.
+        """
+        if op == "advance":
+            user_name, room_key, seq = args
+            self.advance(user_name, uuid.UUID(room_key), seq)
+
+    def touch_all(self) -> None:
+        self.segments.touch_all()
+
+    def snapshot(self) -> dict[str, dict]:
+        """
+        Cursors by user name and room key, of the segments changed since
+        the last snapshot.
+        """
+        return {
+            name: {
+                user_name: {
+                    str(key): seq
+                    for key, seq in self.cursors[user_name].items()
+                }
+                for user_name in user_names
+            }
+            for name, user_names in self.segments.take().items()
+        }
+
+    def restore(self, name: str, data: dict) -> None:
+        for user_name, cursors in data.items():
+            self.cursors[user_name] = {
+                uuid.UUID(key): seq for key, seq in cursors.items()
+            }
+            self.segments.add(user_name)
+
+    async def load(self, path: str = "./data/cursors.json"):
+        """
+        Loads cursors saved before snapshots were segmented.
+        """
+        try:
+            data = await read_file(path)
+
+            for user_name, cursors in data.items():
+                self.cursors[user_name] = {
+                    uuid.UUID(key): seq for key, seq in cursors.items()
+                }
+                self.segments.touch(user_name)
+
+        except Exception as ex:
+            logger.error(f"Unable load cursors from {path}, because: {ex}.")
@@ -0,0 +1,52 @@
+from typing import Iterator, Optional
+
+from chat.singleton import singleton
+from chat.utils.my_response import WSResponse
+from chat.server.state.room import Room, RoomStore
+from chat.server.state.session import SessionRegistry, broadcast
+
+
+@singleton
+class DeliveryEngine:
+    """
+    Pushes room messages to live sessions of the room members. Recipients
+    are found by intersecting room members with online users, iterating
+    over the smaller of the two, so the cost follows the number of online
+    members rather than of all connections.
+    """
+
+    def online_members(self, room: Room) -> Iterator[str]:
+        store = RoomStore()
+        online = SessionRegistry().sessions
+
+        if room == store.default_room():
+            return iter(online)
+
+        members = store.room_users.get(room.key, set())
+
+        if len(members) < len(online):
+            return (user for user in members if user in online)
+
+        return (user for user in online if user in members)
+
+    async def deliver(
+        self,
+        room: Room,
+        notification: dict,
+        exclude: Optional[WSResponse] = None,
+    ) -> int:
+        """
+        Sends the notification to every online member's session except
+        `exclude`; returns the number of sessions it was queued for.
+        Congested sessions drop it, see OutboundQueue.
+        """
+        registry = SessionRegistry()
+
+        recipients = [
+            ws
+            for user in self.online_members(room)
+            for ws in registry.get(user)
+            if ws is not exclude
+        ]
+
+        return await broadcast(recipients, notification)
@@ -0,0 +1,54 @@
+"""
+When room messages expire, see NotificationStore.expire.
+"""
+import heapq
+import math
+import time
+from typing import Hashable, Iterator, Optional
+
+from chat import settings
+
+
+def expires_at(sent: Optional[float], ttl: float) -> float:
+    """
+    Timestamp a message sent at `sent` expires at; unknown -- now.
+    """
+    return (time.time() if sent is None else sent) + ttl
+
+
+class ExpiryIndex:
+    """
+    Messages by the time they expire, in buckets of `width` seconds: a
+    bucket has, for each room, the seq of its last message expiring in
+    the bucket. Messages of a room expire in the order of their seq, so
+    that is all there is to know to drop them, and a bucket is dropped
+    as a whole once it has passed.
+    """
+
+    def __init__(self, width: float = settings.EXPIRY_BUCKET) -> None:
+        self.width = width
+        self.buckets: dict[int, dict[Hashable, int]] = {}
+        # numbers of the buckets, the earliest first
+        self.__heap: list[int] = []
+
+    def __len__(self) -> int:
+        return len(self.buckets)
+
+    def add(self, room_key: Hashable, seq: int, expires_at: float) -> None:
+        # the end of the bucket, messages expire up to `width` late
+        number = math.ceil(expires_at / self.width)
+
+        bucket = self.buckets.get(number)
+        if bucket is None:
+            bucket = self.buckets[number] = {}
+            heapq.heappush(self.__heap, number)
+
+        bucket[room_key] = max(seq, bucket.get(room_key, 0))
+
+    def pop(self, now: float) -> Iterator[tuple[Hashable, int]]:
+        """
+        Rooms and the seq their messages have expired up to, from the
+        buckets that ended by `now`; they are removed from the index.
+        """
+        while self.__heap and self.__heap[0] * self.width <= now:
+            yield from self.buckets.pop(heapq.heappop(self.__heap)).items()
@@ -3,8 +3,7 @@ from dataclasses import dataclass
 import uuid
 
 from chat.singleton import singleton
-from chat.manage_files import receive_file
-from chat.utils.my_response import WSResponse
+from chat.manage_files import save_file
 
 
 logging.basicConfig(level=logging.INFO)
@@ -29,15 +28,11 @@ class FileStore:
         except KeyError:
             return None
 
-    async def publish_file(
-        self, filename: str, ws_response: WSResponse
-    ) -> File:
+    async def publish_file(self, filename: str, data: bytes) -> File:
         key = str(uuid.uuid4())
         dir = "./server_data/" + key
 
-        success = await receive_file(
-            ws=ws_response, dir=dir, filename=filename
-        )
+        success = await save_file(dir=dir, filename=filename, data=data)
         if success:
             self.store[key] = File(
                 key=key, path=f"{dir}/{filename}", name=filename
@@ -0,0 +1,147 @@
+from typing import Iterator, Optional
+
+from chat import settings
+from chat.server.state.archive import RoomArchive
+
+
+class RoomLog:
+    """
+    The latest `capacity` messages of a room in a ring buffer, oldest
+    first. Messages are numbered consecutively (`seq`), so the position
+    of any of them is computed rather than searched for.
+
+    Dropped messages go to the `archive`, if there is one, and reads
+    reaching past the buffer get the older ones from it.
+    """
+
+    def __init__(
+        self,
+        capacity: int = settings.ROOM_HISTORY_SIZE,
+        archive: Optional[RoomArchive] = None,
+    ) -> None:
+        if capacity < 1:
+            raise ValueError("capacity must be positive")
+
+        self.capacity = capacity
+        self.archive = archive
+        # number of the newest message, 0 while there are none
+        self.last_seq = 0
+
+        # grows up to `capacity` slots as messages come
+        self.__items: list = []
+        # index of the oldest message and number of messages
+        self.__start = 0
+        self.__count = 0
+
+    def __len__(self) -> int:
+        return self.__count
+
+    def __iter__(self) -> Iterator:
+        return self.__slice(0, self.__count)
+
+    @property
+    def first_seq(self) -> int:
+        return self.last_seq - self.__count + 1
+
+    def append(self, action) -> Optional[object]:
+        """
+        Numbers the message unless it already has a number (loaded ones);
+        the oldest one is dropped when the buffer is full, and returned.
+        """
+        if not action.seq:
+            action.seq = self.last_seq + 1
+        self.last_seq = action.seq
+
+        size = len(self.__items)
+
+        if self.__count == self.capacity:
+            dropped = self.__items[self.__start]
+            if self.archive is not None:
+                self.archive.append(dropped)
+
+            self.__items[self.__start] = action
+            self.__start = (self.__start + 1) % size
+            return dropped
+
+        if self.__count == size:
+            # unrolled into a twice larger list
+            self.__items = list(self.__slice(0, self.__count)) + [None] * (
+                min(max(size * 2, 8), self.capacity) - size
+            )
+            self.__start = 0
+            size = len(self.__items)
+
+        self.__items[(self.__start + self.__count) % size] = action
+        self.__count += 1
+
+        return None
+
+    def drop(self, seq: int) -> list:
+        """
+        Removes the messages up to `seq` (expired ones); returns them.
+        """
+        n = max(0, min(seq - self.first_seq + 1, self.__count))
+        dropped = list(self.__slice(0, n))
+
+        size = len(self.__items)
+        for i in range(self.__start, self.__start + n):
+            self.__items[i % size] = None
+
+        if n:
+            self.__start = (self.__start + n) % size
+            self.__count -= n
+
+        return dropped
+
+    async def last(self, n: int) -> list:
+        """
+        The newest n messages, oldest first.
+        """
+        return await self.before(self.last_seq + 1, n)
+
+    async def before(self, seq: int, n: int) -> list:
+        """
+        Up to n messages preceding `seq`, oldest first.
+        """
+        n = max(n, 0)
+        # messages are where their seq says, no search needed
+        stop = max(min(seq, self.last_seq + 1) - self.first_seq, 0)
+        hot = min(n, stop)
+        # taken before the archive is read, meanwhile the buffer may move
+        messages = list(self.__slice(stop - hot, hot))
+        cold_stop = min(seq, self.first_seq)
+        cold = await self.__archived(cold_stop - (n - hot), cold_stop)
+
+        return cold + messages
+
+    async def after(self, seq: int, n: int) -> list:
+        """
+        Up to n messages following `seq`, oldest first.
+        """
+        n = max(n, 0)
+        messages = self.cached(seq, n)
+        cold = await self.__archived(
+            seq + 1, min(seq + 1 + n, self.first_seq)
+        )
+
+        return (cold + messages)[:n]
+
+    def cached(self, seq: int, n: int) -> list:
+        """
+        Up to n of the messages in the buffer following `seq`.
+        """
+        start = max(seq - self.first_seq + 1, 0)
+        n = max(0, min(n, self.__count - start))
+        return list(self.__slice(start, n))
+
+    async def __archived(self, start: int, stop: int) -> list:
+        if self.archive is None or start >= stop:
+            return []
+
+        return await self.archive.read(max(start, 1), stop)
+
+    def __slice(self, start: int, n: int) -> Iterator:
+        size = len(self.__items)
+
+        for i in range(self.__start + start, self.__start + start + n):
+            yield self.__items[i % size]
@@ -0,0 +1,65 @@
+from collections import OrderedDict
+import secrets
+import time
+from typing import Optional
+
+from chat import settings
+from chat.singleton import singleton
+from chat.server.state.meta import Meta
+from chat.server.state.user import UserStore
+
+
+@singleton
+class HTTPSessionStore:
+    """
+    HTTP requests are stateless; a session opened with POST /connect keeps
+    the Meta between them, looked up by the X-Session token. Sessions
+    unused for `timeout` seconds are dropped, and the least recently used
+    ones past `max_sessions`.
+    """
+
+    def __init__(self) -> None:
+        self.timeout = settings.HTTP_SESSION_TIMEOUT
+        self.max_sessions = settings.HTTP_MAX_SESSIONS
+        # least recently used first, with the time they were last used
+        self.store: OrderedDict[str, tuple[Meta, float]] = OrderedDict()
+
+    def open(self) -> tuple[str, Meta]:
+        self.__evict()
+
+        token = secrets.token_urlsafe(16)
+        meta = Meta(UserStore().get_anonymus_name(), False)
+        self.store[token] = (meta, time.monotonic())
+
+        return token, meta
+
+    def get(self, token: Optional[str]) -> Optional[Meta]:
+        entry = self.store.get(token)
+        if entry is None:
+            return None
+
+        now = time.monotonic()
+        if now - entry[1] > self.timeout:
+            del self.store[token]
+            return None
+
+        self.store[token] = (entry[0], now)
+        self.store.move_to_end(token)
+
+        return entry[0]
+
+    def close(self, token: str) -> None:
+        self.store.pop(token, None)
+
+    def __evict(self) -> None:
+        now = time.monotonic()
+
+        while self.store:
+            token, (_, used) = next(iter(self.store.items()))
+            if (
+                len(self.store) < self.max_sessions
+                and now - used <= self.timeout
+            ):
+                return
+
+            del self.store[token]
@@ -1,35 +1,96 @@
+import asyncio
 import logging
 from datetime import datetime
 import dataclasses
-import json
+from functools import lru_cache
+import time
+from typing import Any, Callable, Optional
+import uuid
 
 from pydantic.dataclasses import dataclass
 from pydantic.tools import parse_obj_as
 
+from chat import settings
 from chat.singleton import singleton
 from chat.command_types import CommandType
+from chat.utils.codecs import DEFAULT_CODEC, PLACEHOLDER
 from chat.utils.my_response import WSResponse
+from chat.server.state.meta import request_id
 from chat.server.state.room import Room, RoomStore
+from chat.server.state.cursor import ReadCursorStore
+from chat.server.state.archive import Archives
+from chat.server.state.expiry import ExpiryIndex, expires_at
+from chat.server.state.history import RoomLog
+from chat.server.state.record import MessageRecord, WireCache
+from chat.server.state.search import (
+    SearchIndex,
+    has_phrase,
+    parse_query,
+    tokenize,
+)
+from chat.server.state.segments import Chunks, bucket
+from chat.server.state.delivery import DeliveryEngine
+from chat.server.state.session import SessionRegistry
 from chat.server.state.user import UserStore, User
+from chat.server.state.storage import Storage
 from chat.exceptions import NoRegistredUserFound, NoRoomFound
-from chat.manage_files import read_file, write_file
+from chat.manage_files import read_file
 
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# successful ones are replayed on the user's other sessions
+MIRRORED_ACTIONS = (
+    CommandType.join_room,
+    CommandType.leave_room,
+    CommandType.create_room,
+    CommandType.delete_room,
+    CommandType.open_dialogue,
+    CommandType.delete_dialogue,
+    CommandType.history,
+    CommandType.ack,
+)
+
+# replies to reads, not kept in the user's history; `/connected` has the
+# session token, which must not reach the log and snapshots
+NOT_STORED_ACTIONS = (
+    CommandType.history,
+    CommandType.status,
+    CommandType.unread,
+    CommandType.ack,
+    CommandType.search,
+    CommandType.connected,
+)
+
 
 @dataclass
 class Action():
     action: str
     datetime: str
-    expired: bool
 
     success: bool
     reason: str
 
     payload: dict
 
+    @classmethod
+    def construct(cls, **fields) -> "Action":
+        """
+        Builds the action from fields the server made itself, without
+        validating them; received and loaded data goes through the
+        constructor.
+        """
+        action = cls.__new__(cls)
+        action.__dict__ = {**field_defaults(cls), **fields}
+        return action
+
+    def to_dict(self) -> dict:
+        """
+        The fields by name, as dataclasses.asdict without copying them.
+        """
+        return {name: getattr(self, name) for name in field_names(type(self))}
+
     def get_notification(self) -> dict:
         return {
             "action": self.action,
@@ -59,6 +120,8 @@ class UserAction(Action):
 class RoomAction(Action):
     room_name: str
     user_name: str
+    # position in the room log, assigned when stored
+    seq: int = 0
 
     def get_notification(self) -> dict:
         return {
@@ -68,6 +131,7 @@ class RoomAction(Action):
             "datetime": self.datetime,
             "user": self.user_name,
             "room_name": self.room_name,
+            "seq": self.seq,
             "payload": self.payload,
         }
 
@@ -105,14 +169,70 @@ class FilePublished(UserAction):
         }
 
 
-def get_connected_notification(name: str) -> Action:
-    return Action(
+@lru_cache(maxsize=None)
+def field_names(cls: type) -> tuple[str, ...]:
+    return tuple(field.name for field in dataclasses.fields(cls))
+
+
+@lru_cache(maxsize=None)
+def field_defaults(cls: type) -> dict:
+    return {
+        field.name: field.default
+        for field in dataclasses.fields(cls)
+        if field.default is not dataclasses.MISSING
+    }
+
+
+# classes the stored actions are loaded as, by section of the store
+SECTIONS = {
+    "users": UserAction,
+    "rooms": RoomAction,
+    "other": Action,
+}
+
+
+def load_room_action(data: dict) -> RoomAction:
+    return parse_obj_as(RoomAction, data)
+
+
+def chunk_summary(name: str, data) -> Optional[dict]:
+    """
+    What recovery needs to know of a chunk of a room log without reading
+    it: the seq and time of its first message and the seq of its last
+    one (the room's, if it has none left); None for other chunks.
+    """
+    if not name.startswith("room-"):
+        return None
+
+    messages = data["messages"]
+    first = MessageRecord.from_dict(messages[0]) if messages else None
+
+    return {
+        "first_seq": first.seq if first else None,
+        "sent": first.timestamp() if first else None,
+        "last_seq": messages[-1]["seq"] if messages else data["last_seq"],
+    }
+
+
+def load_chunk(load: Callable[[], Any]) -> Any:
+    """
+    The data `load` returns, or the error it failed with.
+    """
+    try:
+        return load()
+    except (OSError, ValueError) as ex:
+        return ex
+
+
+def get_connected_notification(
+    name: str, session: Optional[str] = None
+) -> Action:
+    return Action.construct(
         action=CommandType.connected,
         datetime=str(datetime.now()),
-        expired=False,
         success=True,
         reason="",
-        payload={"user_name": name},
+        payload={"user_name": name, "session": session},
     )
 
 
@@ -122,10 +242,9 @@ def get_message_notification(
     # понимаю, что лучше переделать через pydemic
     # оставляю так, за нехваткой времени.
     if private:
-        return PrivateRoomAction(
+        return PrivateRoomAction.construct(
             action=CommandType.send,
             datetime=str(datetime.now()),
-            expired=False,
             success=success,
             reason=reason,
             payload={
@@ -136,10 +255,9 @@ def get_message_notification(
             user_name=user_name,
             room_name=''
         )
-    return RoomAction(
+    return RoomAction.construct(
         action=CommandType.send,
         datetime=str(datetime.now()),
-        expired=False,
         success=success,
         reason=reason,
         room_name=room_name,
@@ -149,24 +267,65 @@ def get_message_notification(
 
 
 def get_history_notification(
-    user_name: str, success: bool, reason: str, payload
+    user_name: str,
+    success: bool,
+    reason: str,
+    payload,
+    next_cursor: Optional[int] = None,
 ) -> UserAction:
-    return UserAction(
+    return UserAction.construct(
         action=CommandType.history,
         datetime=str(datetime.now()),
-        expired=False,
         success=success,
         reason=reason,
-        payload={"history": payload},
+        payload={"history": payload, "next_cursor": next_cursor},
+        user_name=user_name,
+    )
+
+
+def get_unread_notification(
+    user_name: str, success: bool, reason: str, payload: dict
+) -> UserAction:
+    return UserAction.construct(
+        action=CommandType.unread,
+        datetime=str(datetime.now()),
+        success=success,
+        reason=reason,
+        payload=payload,
+        user_name=user_name,
+    )
+
+
+def get_search_notification(
+    user_name: str, success: bool, reason: str, payload: dict
+) -> UserAction:
+    return UserAction.construct(
+        action=CommandType.search,
+        datetime=str(datetime.now()),
+        success=success,
+        reason=reason,
+        payload=payload,
+        user_name=user_name,
+    )
+
+
+def get_ack_notification(
+    user_name: str, success: bool, reason: str, room_name: str, seq: int
+) -> UserAction:
+    return UserAction.construct(
+        action=CommandType.ack,
+        datetime=str(datetime.now()),
+        success=success,
+        reason=reason,
+        payload={"room_name": room_name, "seq": seq},
         user_name=user_name,
     )
 
 
 def get_error_message(reason):
-    return Action(
+    return Action.construct(
         action=CommandType.error,
         datetime=str(datetime.now()),
-        expired=False,
         success=False,
         reason=reason,
         payload={},
@@ -180,104 +339,544 @@ class NotificationStore:
 
         self.store["users"] = {}
         self.store["rooms"] = {}
-        self.store["other"] = list()
+
+        # for snapshots: user notifications in streams by user name bucket,
+        # the others in one stream, room logs in chunks of their seq range
+        self.__user_chunks = [
+            Chunks(f"users-{i}") for i in range(settings.SNAPSHOT_SEGMENTS)
+        ]
+        self.__other_chunks = Chunks("other")
+        self.store["other"] = self.__other_chunks.entries
+        # changed chunks and the first chunk saved, by room key
+        self.__dirty_rooms: dict[uuid.UUID, set[int]] = {}
+        self.__saved_rooms: dict[uuid.UUID, int] = {}
+        # chunks of room logs to restore when the room is first read, with
+        # their summaries, and the last seq of those rooms
+        self.__deferred: dict[uuid.UUID, list[tuple]] = {}
+        self.__deferred_seqs: dict[uuid.UUID, int] = {}
+        # rooms being restored
+        self.__hydrating: dict[uuid.UUID, asyncio.Task] = {}
+
+        self.__expiry = ExpiryIndex()
+        self.__search = SearchIndex()
+        # totals, for the stats
+        self.expired_messages = 0
+        self.reclaimed_bytes = 0
 
     def __add(self, action: Action):
+        section, room_key = self.__add_to_section(action)
+        if section is None:
+            return
+
+        Storage().append(
+            "messages",
+            "add",
+            section,
+            action.to_dict(),
+            None if room_key is None else str(room_key),
+        )
+
+    def __add_to_section(
+        self, action: Action
+    ) -> tuple[Optional[str], Optional[uuid.UUID]]:
+        """
+        Stores the action; returns the section of the store it went to
+        and, for room messages, the key of the room.
+        """
+        if action.action in NOT_STORED_ACTIONS:
+            return None, None
+
         if issubclass(type(action), UserAction):
-            if action.action == CommandType.history:
-                return
+            self.store["users"].setdefault(action.user_name, []).append(action)
+            self.__user_stream(action.user_name).append(action)
 
-            try:
-                self.store["users"][action.user_name].append(action)
-            except KeyError:
-                self.store["users"][action.user_name] = list()
-                self.store["users"][action.user_name].append(action)
-            finally:
-                return
+            return "users", None
 
         if issubclass(type(action), RoomAction):
-            if action.payload["private"]:
-                room = RoomStore().find_private_room(
-                    user1=UserStore().get_user(action.user_name),
-                    user2=UserStore().get_user(action.payload["to"]),
+            room = self.__room_of(action)
+
+            record = MessageRecord.from_action(action)
+            self.__append(self.__room_log(room.key), record)
+            # the reply and the log record carry the number
+            action.seq = record.seq
+
+            self.__track_expiry(room, record)
+            self.__index(room.key, record)
+
+            self.__dirty_rooms.setdefault(room.key, set()).add(
+                (action.seq - 1) // settings.SNAPSHOT_CHUNK_SIZE
+            )
+            return "rooms", room.key
+
+        self.__other_chunks.append(action)
+        return "other", None
+
+    @staticmethod
+    def __room_of(action: RoomAction) -> Room:
+        if action.payload["private"]:
+            return RoomStore().find_private_room(
+                user1=UserStore().get_user(action.user_name),
+                user2=UserStore().get_user(action.payload["to"]),
+            )
+
+        return RoomStore().get_room_by_name(action.room_name)
+
+    def __room_log(self, key: uuid.UUID) -> RoomLog:
+        log = self.__log(key)
+        if log is None:
+            log = self.store["rooms"][key] = RoomLog(
+                archive=Archives().room(
+                    key, MessageRecord.to_dict, MessageRecord.from_dict
                 )
-            else:
-                room = RoomStore().get_room_by_name(action.room_name)
+            )
 
-            try:
-                self.store["rooms"][room.key].append(action)
-            except KeyError:
-                self.store["rooms"][room.key] = list()
-                self.store["rooms"][room.key].append(action)
+        return log
 
-            return
+    def __log(self, key: uuid.UUID) -> Optional[RoomLog]:
+        """
+        The room log; None if the room has no messages. A deferred room
+        is restored here, reading its chunks in the caller: that is for
+        the log replayed on recovery, the other paths `__hydrate` first.
+        """
+        chunks = self.__deferred.pop(key, None)
+        if chunks is not None:
+            self.__restore_room(key, [
+                (name, summary, load_chunk(load))
+                for name, load, summary in chunks
+            ])
+
+        return self.store["rooms"].get(key)
+
+    async def __hydrate(self, key: uuid.UUID) -> None:
+        """
+        Restores the room log if it was deferred, its chunks are read in
+        a thread; callers asking meanwhile wait for the same restore.
+        """
+        task = self.__hydrating.get(key)
+
+        if task is None:
+            chunks = self.__deferred.pop(key, None)
+            if chunks is None:
+                return
+
+            task = asyncio.ensure_future(self.__load_room(key, chunks))
+            self.__hydrating[key] = task
+            task.add_done_callback(lambda _: self.__hydrating.pop(key))
+
+        # the restore goes on if the caller is cancelled
+        await asyncio.shield(task)
+
+    async def __load_room(self, key: uuid.UUID, chunks: list) -> None:
+        loaded = []
+        for name, load, summary in chunks:
+            data = await asyncio.to_thread(load_chunk, load)
+            loaded.append((name, summary, data))
+
+        self.__restore_room(key, loaded)
+
+    def __restore_room(self, key: uuid.UUID, loaded: list) -> None:
+        """
+        Restores a room log from its chunks, as loaded or the error each
+        failed with. The messages up to the end of the last chunk that
+        failed are left out and the others numbered on from there, so no
+        seq is given twice.
+        """
+        start = 0
+        for i, (name, _, data) in enumerate(loaded):
+            if isinstance(data, Exception):
+                logger.error(f"Unable to load {name}, because: {data}.")
+                start = i + 1
+
+        log = self.__room_log(key)
+        last_seq = self.__deferred_seqs.pop(key, 0)
+
+        if start:
+            log.last_seq = loaded[start - 1][1]["last_seq"]
+            logger.error(
+                f"Messages of room {key} up to {log.last_seq} are lost."
+            )
+
+        for name, _, data in loaded[start:]:
+            self.restore(name, data)
+
+        if not log:
+            log.last_seq = max(log.last_seq, last_seq)
+
+    @staticmethod
+    def __append(log: RoomLog, record: MessageRecord) -> None:
+        dropped = log.append(record)
+        # archived, or dropped for good
+        if dropped is not None:
+            WireCache().discard(dropped)
+
+    def __track_expiry(self, room: Room, record: MessageRecord) -> None:
+        ttl = room.message_ttl
+        if ttl > 0:
+            self.__expiry.add(
+                room.key, record.seq, expires_at(record.timestamp(), ttl)
+            )
+
+    def __index(self, room_key: uuid.UUID, record: MessageRecord) -> None:
+        if isinstance(record.message, str):
+            self.__search.add(room_key, record.seq, record.message)
+
+    async def search(
+        self,
+        rooms: list[Room],
+        query: str,
+        after: Optional[tuple[int, int]] = None,
+        n: int = 20,
+    ) -> tuple[list, Optional[tuple[int, int]]]:
+        """
+        Up to n messages of the rooms matching the query, newest first in
+        each room, the rooms in the order given; starting past `after`,
+        the index of a room and a seq in it. Returns the place of the
+        last one if there are more.
+        """
+        words, phrases = parse_query(query)
+        hits = []
+        start, before = after or (0, None)
+        last = None
+
+        for i, room in enumerate(rooms[start:], start):
+            # the index has the messages of rooms read already
+            await self.__hydrate(room.key)
+
+            for seq in self.__search.find(
+                room.key, words, before if i == start else None
+            ):
+                message = None
+                if phrases:
+                    message = await self.__message(room, seq)
+                    if message is None:
+                        continue
+
+                    tokens = tokenize(message["payload"]["message"])
+                    if not all(has_phrase(tokens, p) for p in phrases):
+                        continue
+
+                if len(hits) == n:
+                    return hits, last
+
+                message = message or await self.__message(room, seq)
+                if message is not None:
+                    hits.append(message)
+                    last = (i, seq)
+
+        return hits, None
 
-        self.store["other"].append(action)
+    async def __message(self, room: Room, seq: int) -> Optional[dict]:
+        page, _ = await self.get_unread(room, seq - 1, 1)
+        return page[0] if page and page[0]["seq"] == seq else None
+
+    async def expire(self, now: Optional[float] = None) -> tuple[int, int]:
+        """
+        Drops the room messages expired by `now`, from memory, the room
+        archives and the storage; returns the number of them and of bytes
+        reclaimed. Deferred rooms are restored, their messages indexed
+        and those expired dropped too.
+        """
+        now = time.time() if now is None else now
+        expired = reclaimed = 0
+
+        for key, seq in self.__expiry.pop(now):
+            await self.__hydrate(key)
+            messages, size = self.__expire_room(key, seq)
+            Storage().append("messages", "expire", str(key), seq)
+
+            expired += messages
+            reclaimed += size
+
+        self.expired_messages += expired
+        self.reclaimed_bytes += reclaimed
+
+        return expired, reclaimed
+
+    def __expire_room(self, key: uuid.UUID, seq: int) -> tuple[int, int]:
+        log = self.__log(key)
+        if log is None:
+            return 0, 0
+
+        dropped = log.drop(seq)
+        self.__search.expire(key, seq)
+        for record in dropped:
+            WireCache().discard(record)
+        # as sent or saved
+        reclaimed = sum(
+            len(DEFAULT_CODEC.encode(m.to_dict())) for m in dropped
+        )
+        if log.archive is not None:
+            reclaimed += log.archive.expire(seq)
+
+        # a snapshot rewrites the first chunk left and removes the others
+        self.__dirty_rooms.setdefault(key, set()).add(
+            (log.first_seq - 1) // settings.SNAPSHOT_CHUNK_SIZE
+        )
+
+        return len(dropped), reclaimed
+
+    async def run_expiry(self, interval: float) -> None:
+        """
+        Drops expired messages every `interval` seconds.
+        """
+        while True:
+            await asyncio.sleep(interval)
+
+            expired, reclaimed = await self.expire()
+            if expired:
+                logger.info(
+                    "Expired: messages=%s bytes=%s total_bytes=%s",
+                    expired,
+                    reclaimed,
+                    self.reclaimed_bytes,
+                )
+
+    def __user_stream(self, user_name: str) -> Chunks:
+        return self.__user_chunks[bucket(user_name, len(self.__user_chunks))]
+
+    def redo(self, op: str, args: list) -> None:
+        """
+        Applies a change read from the write-ahead log.
+        """
+        if op == "add":
+            # records of older versions have no room key
+            section, data = args[:2]
+            self.__add_to_section(parse_obj_as(SECTIONS[section], data))
+
+        elif op == "expire":
+            key, seq = args
+            self.__expire_room(uuid.UUID(key), seq)
 
     async def __send(self, ws: WSResponse, mssg: dict):
+        if request_id.get() is not None:
+            mssg["request_id"] = request_id.get()
+
         await ws.send_json(mssg)
 
     async def process(self, ws: WSResponse, notification: Action):
 
         store = RoomStore()
+        # room messages are also pushed to the other members
+        room = None
 
         if issubclass(type(notification), PrivateRoomAction):
             user = UserStore().get_user(notification.user_name)
             to = UserStore().get_user(notification.payload["to"])
+            room = store.find_private_room(user, to)
 
             if not store.user_in_room(
                     username=notification.user_name,
-                    room=store.find_private_room(user, to)
+                    room=room
             ):
                 raise NoRegistredUserFound
 
         if issubclass(type(notification), RoomAction):
+            room = store.get_room_by_name(room_name=notification.room_name)
+
             if not store.user_in_room(
                 username=notification.user_name,
-                room=store.get_room_by_name(
-                    room_name=notification.room_name
-                ),
+                room=room,
             ):
                 raise NoRegistredUserFound
 
+        if issubclass(type(notification), RoomAction):
+            await self.__hydrate(self.__room_of(notification).key)
+
         self.__add(notification)
+        await Storage().commit()
         await self.__send(ws=ws, mssg=notification.get_notification())
 
-    def get_n_messages(self, room: Room, n: int = 20) -> list:
-        try:
-            messages = [
-                m.get_notification() for m in self.store["rooms"][room.key]
-            ][:n]
-            return messages
-        except KeyError:
+        # a room message reaches the sender's other sessions as a member
+        if room is not None:
+            await DeliveryEngine().deliver(
+                room=room,
+                notification=notification.get_notification(),
+                exclude=ws,
+            )
+
+        elif (
+            issubclass(type(notification), UserAction)
+            and notification.action in MIRRORED_ACTIONS
+            and notification.success
+        ):
+            await SessionRegistry().mirror(
+                user_name=notification.user_name,
+                notification=notification.get_notification(),
+                exclude=ws,
+            )
+
+    async def __dropped(
+        self, room: Room, start: int, stop: int
+    ) -> list[MessageRecord]:
+        """
+        Messages with start <= seq < stop the room log no longer has, from
+        the storage backend.
+        """
+        return [
+            MessageRecord.from_dict(data)
+            for data in await Storage().messages(
+                room.key, max(start, 1), stop
+            )
+        ]
+
+    async def get_n_messages(
+        self, room: Room, n: int = 20, before: Optional[int] = None
+    ) -> list:
+        """
+        The last n messages of the room, or the last n before seq `before`,
+        oldest first.
+        """
+        return [
+            m.get_notification()
+            for m in await self.__records_before(room, n, before)
+        ]
+
+    async def __records_before(
+        self, room: Room, n: int, before: Optional[int]
+    ) -> list[MessageRecord]:
+        await self.__hydrate(room.key)
+        log = self.__log(room.key)
+        if log is None:
             raise NoRoomFound
 
+        stop = log.last_seq + 1 if before is None else before
+        messages = await log.before(stop, n)
+        first = messages[0].seq if messages else min(stop, log.last_seq + 1)
+        messages = (
+            await self.__dropped(room, first - (n - len(messages)), first)
+            + messages
+        )
+
+        return messages
+
     def get_n_notifications_user(self, user: User, n: int = 20) -> list:
+        """
+        The last n notifications of the user, oldest first.
+        """
         try:
-            notifications = [
-                notification.get_notification()
-                for notification in self.store["users"][user.username]
-            ][:n]
-            return notifications
+            notifications = self.store["users"][user.username]
         except KeyError:
             raise NoRegistredUserFound
 
+        return [
+            notification.get_notification()
+            for notification in notifications[max(len(notifications) - n, 0):]
+        ]
+
+    def last_seq(self, room: Room) -> int:
+        log = self.store["rooms"].get(room.key)
+        if log is None:
+            return self.__deferred_seqs.get(room.key, 0)
+
+        return log.last_seq
+
+    async def get_unread(
+        self, room: Room, after: int, n: int = 20
+    ) -> tuple[list, bool]:
+        """
+        Up to n messages following `after`, oldest first, and whether there
+        are more.
+        """
+        page, more = await self.__records_after(room, after, n)
+        return [m.get_notification() for m in page], more
+
+    async def __records_after(
+        self, room: Room, after: int, n: int
+    ) -> tuple[list[MessageRecord], bool]:
+        await self.__hydrate(room.key)
+        log = self.__log(room.key)
+        if not log:
+            return [], False
+
+        page = await log.after(after, n)
+        first = page[0].seq if page else log.last_seq + 1
+        page = (
+            await self.__dropped(room, after + 1, min(first, after + 1 + n))
+            + page
+        )[:max(n, 0)]
+        more = bool(page) and page[-1].seq < log.last_seq
+
+        return page, more
+
+    def count_unread(self, user_name: str) -> dict[str, int]:
+        """
+        Number of unread messages in each room of the user that has any.
+        """
+        cursors = ReadCursorStore()
+        counts = {}
+
+        for room in RoomStore().get_user_rooms(user_name):
+            count = self.last_seq(room) - cursors.get(user_name, room.key)
+            if count > 0:
+                counts[room.name] = count
+
+        return counts
+
     async def history_room(
-        self, ws: WSResponse, user_name: str, room: Room, n: int = 20
+        self,
+        ws: WSResponse,
+        user_name: str,
+        room: Room,
+        n: int = 20,
+        before_id: Optional[int] = None,
+        after_id: Optional[int] = None,
     ) -> bool:
+        """
+        A page of n messages: the newest ones, those preceding `before_id`
+        or following `after_id`. The reply's `next_cursor` is the id to
+        ask the next page with, in the same direction; None on the last.
+        """
         if room is None:
             return ValueError
 
-        await self.process(
-            ws=ws,
-            notification=get_history_notification(
-                user_name=user_name,
-                success=True,
-                reason="",
-                payload=self.get_n_messages(room=room, n=n),
-            ),
+        if after_id is not None:
+            records, more = await self.__records_after(room, after_id, n)
+            next_cursor = records[-1].seq if more else None
+        else:
+            records = await self.__records_before(room, n, before_id)
+            more = len(records) == n > 0 and records[0].seq > 1
+            next_cursor = records[0].seq if more else None
+
+        notification = get_history_notification(
+            user_name=user_name,
+            success=True,
+            reason="",
+            payload=PLACEHOLDER,
+            next_cursor=next_cursor,
         )
 
+        if not isinstance(ws, WSResponse):
+            notification.payload["history"] = [
+                m.get_notification() for m in records
+            ]
+            await self.process(ws=ws, notification=notification)
+            return True
+
+        # the page is joined from the messages encoded already, the
+        # archived ones are encoded for this reply only
+        cache = WireCache()
+        log = self.__log(room.key)
+        first = log.first_seq if log else 0
+        items = [
+            cache.encode(m, ws.codec, keep=m.seq >= first) for m in records
+        ]
+
+        await Storage().commit()
+        mssg = notification.get_notification()
+        if request_id.get() is not None:
+            mssg["request_id"] = request_id.get()
+        await ws.send_encoded(ws.codec.splice(mssg, items))
+
+        if any(other is not ws for other in SessionRegistry().get(user_name)):
+            notification.payload["history"] = [
+                m.get_notification() for m in records
+            ]
+            await SessionRegistry().mirror(
+                user_name=user_name,
+                notification=notification.get_notification(),
+                exclude=ws,
+            )
+
         return True
 
     async def history_user(
@@ -298,36 +897,142 @@ class NotificationStore:
 
         return True
 
-    def __store_to_dict(self):
-        data = dict()
-        data["users"] = dict()
-        data["rooms"] = dict()
-        data["other"] = list()
+    @staticmethod
+    def __room_chunk(key: uuid.UUID, i: int) -> str:
+        return f"room-{key}-{i:06}"
 
-        for user, user_data in self.store["users"].items():
-            data["users"][user] = [dataclasses.asdict(d) for d in user_data]
+    def touch_all(self) -> None:
+        for chunks in self.__user_chunks + [self.__other_chunks]:
+            chunks.touch_all()
 
-        for room, room_data in self.store["rooms"].items():
-            data["rooms"][str(room)] = [
-                dataclasses.asdict(d) for d in room_data
-            ]
+        size = settings.SNAPSHOT_CHUNK_SIZE
+        for key, log in self.store["rooms"].items():
+            first = (log.first_seq - 1) // size
+            # an emptied log still has a chunk, with its last seq
+            self.__dirty_rooms[key] = set(range(
+                first, max(first, (log.last_seq - 1) // size) + 1
+            ))
+
+    def snapshot(self) -> dict[str, Optional[list]]:
+        """
+        Chunks with notifications added since the last snapshot; None for
+        the chunks of room messages that dropped out of the room logs.
+        """
+        data = {}
 
-        data["other"] = [dataclasses.asdict(d) for d in self.store["other"]]
+        for chunks in self.__user_chunks + [self.__other_chunks]:
+            for name, actions in chunks.take().items():
+                data[name] = [a.to_dict() for a in actions]
 
-        return json.dumps(data, indent=4, sort_keys=True, default=str)
+        size = settings.SNAPSHOT_CHUNK_SIZE
 
-    async def dump(self, path: str = "./data/messages.json") -> bool:
+        for key, dirty in self.__dirty_rooms.items():
+            log = self.store["rooms"][key]
+            first = (log.first_seq - 1) // size
+
+            for i in range(self.__saved_rooms.get(key, first), first):
+                data[self.__room_chunk(key, i)] = None
+            self.__saved_rooms[key] = first
+
+            for i in dirty:
+                if i < first:
+                    continue
+
+                messages = log.cached(i * size, size)
+                data[self.__room_chunk(key, i)] = {
+                    "room": str(key),
+                    "messages": [m.to_dict() for m in messages],
+                    "last_seq": log.last_seq,
+                }
+
+        self.__dirty_rooms = {}
+
+        return data
+
+    def defer(
+        self,
+        name: str,
+        load: Callable[[], Any],
+        summary: Optional[dict] = None,
+    ) -> None:
         """
-        Dumps all the data necessary for future load.
+        Restores the chunk `name` of a room log, from the data `load`
+        returns, once the room is first read or its first message
+        expires, as its `summary` (see chunk_summary) tells; other chunks
+        are restored right away. Chunks of a room are deferred in order.
         """
+        if not name.startswith("room-"):
+            self.restore(name, load())
+            return
 
-        store = self.__store_to_dict()
+        key = uuid.UUID(name[len("room-"):].rsplit("-", 1)[0])
+        self.__deferred.setdefault(key, []).append((name, load, summary))
+        self.__deferred_seqs[key] = max(
+            self.__deferred_seqs.get(key, 0), summary["last_seq"]
+        )
 
-        await write_file(path, store)
+        room = RoomStore().get_room_by_key(key)
+        if (
+            room is not None
+            and room.message_ttl > 0
+            and summary["first_seq"] is not None
+        ):
+            self.__expiry.add(
+                key,
+                summary["first_seq"],
+                expires_at(summary["sent"], room.message_ttl),
+            )
+
+    def restore(self, name: str, data) -> None:
+        """
+        Restores a chunk; the chunks of a stream come in order.
+        """
+        if name.startswith("room-"):
+            key = uuid.UUID(data["room"])
+            log = self.__room_log(key)
+            room = RoomStore().get_room_by_key(key)
+
+            for message in data["messages"]:
+                record = MessageRecord.from_dict(message)
+                self.__append(log, record)
+                self.__index(key, record)
+                if room is not None:
+                    self.__track_expiry(room, record)
+
+            # all expired, numbering goes on from the last one
+            if not log:
+                log.last_seq = max(log.last_seq, data.get("last_seq", 0))
+
+            i = int(name.rsplit("-", 1)[1])
+            self.__saved_rooms[key] = min(self.__saved_rooms.get(key, i), i)
+            return
 
-        return True
+        if name.startswith("other-"):
+            for action in data:
+                action = parse_obj_as(Action, action)
+                # older versions saved the session token, the chunk is
+                # saved again without it
+                leaked = (
+                    action.action == CommandType.connected
+                    and action.payload.get("session") is not None
+                )
+                if leaked:
+                    action.payload["session"] = None
+
+                self.__other_chunks.append(action, dirty=leaked)
+            return
+
+        users = self.store["users"]
+
+        for action in data:
+            action = parse_obj_as(UserAction, action)
+            users.setdefault(action.user_name, []).append(action)
+            self.__user_stream(action.user_name).append(action, dirty=False)
 
     async def load(self, path: str = "./data/messages.json"):
+        """
+        Loads notifications saved before snapshots were segmented.
+        """
         try:
             data = await read_file(path)
 
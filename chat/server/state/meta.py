@@ -1,7 +1,14 @@
+from contextvars import ContextVar
 from dataclasses import dataclass
+from typing import Optional
+
+# client generated id of the request being handled, echoed in responses
+request_id: ContextVar[Optional[str]] = ContextVar("request_id", default=None)
 
 
 @dataclass
 class Meta:
     user_name: str
     loggedin: bool
+    # token of the resumable session, see ResumeStore
+    session: Optional[str] = None
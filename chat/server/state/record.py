@@ -0,0 +1,272 @@
+"""
+Room messages as kept in the room logs.
+
+A RoomAction is a pydantic dataclass with its own payload dict, datetime
+string and copies of the user and room names; the room logs keep a
+MessageRecord instead: slotted, names replaced by their number in the
+Names table and the time by integer microseconds. The dict of the
+RoomAction, or the notification, is built again when the message is
+sent or saved.
+
+The notification of a record, encoded with a session codec, is kept on
+the record once it is read, for WireCache to bound.
+"""
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from functools import lru_cache
+from typing import Optional, Union
+
+from chat import settings
+from chat.singleton import singleton
+from chat.utils.codecs import Codec
+
+# times are microseconds since, as naive as the datetimes they come from
+EPOCH = datetime(1970, 1, 1)
+MICROSECOND = timedelta(microseconds=1)
+# payload of a room message, other keys are kept as they are
+PAYLOAD = ("private", "to", "message")
+
+
+@singleton
+class Names:
+    """
+    User names, room names and action types by number; the numbers are
+    not saved anywhere, only strings leave the records.
+    """
+
+    def __init__(self) -> None:
+        self.numbers: dict[str, int] = {}
+        self.names: list[str] = []
+
+    def number(self, name: str) -> int:
+        number = self.numbers.get(name)
+        if number is None:
+            number = self.numbers[name] = len(self.names)
+            self.names.append(name)
+
+        return number
+
+
+def to_micros(value: str) -> Union[int, str]:
+    """
+    Microseconds of a datetime string; the string if it is not one.
+    """
+    try:
+        return (datetime.fromisoformat(value) - EPOCH) // MICROSECOND
+    except (TypeError, ValueError):
+        return value
+
+
+def from_micros(value: Union[int, str]) -> str:
+    """
+    The datetime string back, as str(datetime) writes it.
+    """
+    if isinstance(value, str):
+        return value
+
+    seconds, micros = divmod(value, 1_000_000)
+    text = format_seconds(seconds)
+    return f"{text}.{micros:06}" if micros else text
+
+
+@lru_cache(maxsize=4096)
+def format_seconds(seconds: int) -> str:
+    # messages come close in time, most share the second with others
+    return str(EPOCH + timedelta(seconds=seconds))
+
+
+class MessageRecord:
+    __slots__ = (
+        "seq",
+        "action",
+        "sent",
+        "success",
+        "reason",
+        "user",
+        "room",
+        "private",
+        "to",
+        "message",
+        "extra",
+        "wire",
+        "wire_codec",
+    )
+
+    def __init__(
+        self,
+        seq: int,
+        action: str,
+        datetime: str,
+        success: bool,
+        reason: str,
+        payload: dict,
+        user_name: str,
+        room_name: str,
+    ) -> None:
+        names = Names()
+
+        self.seq = seq
+        self.action = names.number(action)
+        self.sent = to_micros(datetime)
+        self.success = success
+        self.reason = names.number(reason)
+        self.user = names.number(user_name)
+        self.room = names.number(room_name)
+
+        self.private = payload.get("private", False)
+        self.to = names.number(payload.get("to", ""))
+        self.message = payload.get("message", "")
+        # None unless the payload has keys of its own
+        self.extra: Optional[dict] = {
+            key: value for key, value in payload.items() if key not in PAYLOAD
+        } or None
+        # the encoded notification and the name of its codec, see WireCache
+        self.wire: Optional[bytes] = None
+        self.wire_codec: Optional[str] = None
+
+    @classmethod
+    def from_action(cls, action) -> "MessageRecord":
+        return cls(
+            seq=action.seq,
+            action=action.action,
+            datetime=action.datetime,
+            success=action.success,
+            reason=action.reason,
+            payload=action.payload,
+            user_name=action.user_name,
+            room_name=action.room_name,
+        )
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "MessageRecord":
+        """
+        From the dict of a RoomAction, as saved.
+        """
+        return cls(
+            seq=data.get("seq", 0),
+            action=data["action"],
+            datetime=data["datetime"],
+            success=data["success"],
+            reason=data["reason"],
+            payload=data["payload"],
+            user_name=data["user_name"],
+            room_name=data["room_name"],
+        )
+
+    @property
+    def datetime(self) -> str:
+        return from_micros(self.sent)
+
+    @property
+    def user_name(self) -> str:
+        return Names().names[self.user]
+
+    @property
+    def room_name(self) -> str:
+        return Names().names[self.room]
+
+    @property
+    def payload(self) -> dict:
+        return self.__payload(Names().names)
+
+    def __payload(self, names: list[str]) -> dict:
+        payload = {
+            "private": self.private,
+            "to": names[self.to],
+            "message": self.message,
+        }
+        if self.extra:
+            payload.update(self.extra)
+
+        return payload
+
+    def timestamp(self) -> Optional[float]:
+        """
+        POSIX time the message was sent at.
+        """
+        if isinstance(self.sent, str):
+            return None
+
+        return (EPOCH + self.sent * MICROSECOND).timestamp()
+
+    def to_dict(self) -> dict:
+        """
+        The dict of the RoomAction the record was made of.
+        """
+        names = Names().names
+        return {
+            "action": names[self.action],
+            "datetime": self.datetime,
+            "success": self.success,
+            "reason": names[self.reason],
+            "payload": self.__payload(names),
+            "room_name": names[self.room],
+            "user_name": names[self.user],
+            "seq": self.seq,
+        }
+
+    def get_notification(self) -> dict:
+        names = Names().names
+        return {
+            "action": names[self.action],
+            "success": self.success,
+            "reason": names[self.reason],
+            "datetime": from_micros(self.sent),
+            "user": names[self.user],
+            "room_name": names[self.room],
+            "seq": self.seq,
+            "payload": self.__payload(names),
+        }
+
+
+@singleton
+class WireCache:
+    """
+    Encoded notifications of records, kept on the records themselves. A
+    record keeps one encoding, the first one asked for; past `limit`
+    bytes the oldest encodings are dropped.
+    """
+
+    def __init__(self) -> None:
+        self.limit = settings.WIRE_CACHE_SIZE
+        self.size = 0
+        # by id, the records are kept alive meanwhile
+        self.__records: OrderedDict[int, MessageRecord] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self.__records)
+
+    def encode(
+        self, record: MessageRecord, codec: Codec, keep: bool = True
+    ) -> bytes:
+        """
+        The notification of the record encoded with `codec`; kept unless
+        `keep` is false, for records read from the archive.
+        """
+        if record.wire is not None and record.wire_codec == codec.name:
+            return record.wire
+
+        body = codec.encode(record.get_notification())
+
+        if keep and record.wire is None and len(body) <= self.limit:
+            # a copy, encoders may leave the buffer they wrote to oversized
+            body = bytes(memoryview(body))
+            record.wire, record.wire_codec = body, codec.name
+            self.__records[id(record)] = record
+            self.size += len(body)
+
+            while self.size > self.limit:
+                _, oldest = self.__records.popitem(last=False)
+                self.size -= len(oldest.wire)
+                oldest.wire = oldest.wire_codec = None
+
+        return body
+
+    def discard(self, record: MessageRecord) -> None:
+        """
+        Drops the encoding of a record leaving the room log (expired,
+        archived).
+        """
+        if self.__records.pop(id(record), None) is not None:
+            self.size -= len(record.wire)
+            record.wire = record.wire_codec = None
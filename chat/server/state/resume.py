@@ -0,0 +1,129 @@
+import asyncio
+from dataclasses import dataclass
+import secrets
+from typing import Optional
+
+from chat import settings
+from chat.singleton import singleton
+from chat.utils.codecs import Codec
+from chat.utils.my_response import WSResponse, FrameType
+from chat.utils.outbound import Frame, Priority
+from chat.utils.replay import ReplayBuffer
+from chat.server.state.meta import Meta
+from chat.server.state.session import SessionRegistry
+
+
+class ParkedSession:
+    """
+    Stands in for a dropped connection in SessionRegistry until the client
+    resumes: notifications sent to it are only recorded in the journal.
+    """
+
+    def __init__(self, codec: Codec, journal: ReplayBuffer) -> None:
+        self.codec = codec
+        self.journal = journal
+
+    @property
+    def wire_format(self) -> tuple:
+        return (type(self), self.codec.name)
+
+    def encode_frame(
+        self, data: bytes, frame_type: FrameType = FrameType.binary
+    ) -> Frame:
+        return ()
+
+    async def send_encoded(
+        self,
+        body: bytes,
+        frame: Optional[Frame] = None,
+        priority: Priority = Priority.normal,
+    ) -> bool:
+        self.journal.append(body)
+        return True
+
+
+@dataclass
+class ResumableSession:
+    token: str
+    # shared with the connection's Dispatcher, so it is always current
+    meta: Meta
+    journal: ReplayBuffer
+    # the one the journal entries are encoded with
+    codec: Codec
+
+    parked: Optional[ParkedSession] = None
+    expiry: Optional[asyncio.TimerHandle] = None
+
+
+@singleton
+class ResumeStore:
+    """
+    Sessions by token. A dropped connection's session is parked for
+    `timeout` seconds; a client reconnecting in time takes it over and
+    gets the notifications it has missed from the journal.
+    """
+
+    def __init__(self, timeout: float = settings.RESUME_TIMEOUT) -> None:
+        self.timeout = timeout
+        self.sessions: dict[str, ResumableSession] = {}
+
+    def __contains__(self, token: str) -> bool:
+        return token in self.sessions
+
+    def open(self, ws: WSResponse, meta: Meta) -> ResumableSession:
+        session = ResumableSession(
+            token=secrets.token_urlsafe(16),
+            meta=meta,
+            journal=ReplayBuffer(),
+            codec=ws.codec,
+        )
+        meta.session = session.token
+        self.sessions[session.token] = session
+
+        return session
+
+    def park(self, token: Optional[str], ws: WSResponse) -> None:
+        session = self.sessions.get(token)
+        if session is None:
+            return
+
+        ws.journal = None
+        session.parked = ParkedSession(session.codec, session.journal)
+
+        registry = SessionRegistry()
+        registry.remove(session.meta.user_name, ws)
+        registry.add(session.meta.user_name, session.parked)
+
+        session.expiry = asyncio.get_running_loop().call_later(
+            self.timeout, self.close, token
+        )
+
+    def resume(
+        self, token: Optional[str], ws: WSResponse
+    ) -> Optional[ResumableSession]:
+        """
+        Hands a parked session over to the connection; None if there is no
+        such session or it is not parked.
+        """
+        session = self.sessions.get(token)
+        if session is None or session.parked is None:
+            return None
+
+        session.expiry.cancel()
+        SessionRegistry().remove(session.meta.user_name, session.parked)
+        session.parked = None
+
+        if ws.codec.name != session.codec.name:
+            old, new = session.codec, ws.codec
+            session.journal.recode(lambda body: new.encode(old.decode(body)))
+            session.codec = new
+
+        return session
+
+    def close(self, token: Optional[str]) -> None:
+        session = self.sessions.pop(token, None)
+        if session is None or session.parked is None:
+            return
+
+        session.expiry.cancel()
+        SessionRegistry().remove(session.meta.user_name, session.parked)
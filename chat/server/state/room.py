@@ -1,24 +1,30 @@
 from dataclasses import dataclass
 from enum import Enum
+from typing import Optional
 import uuid
 import json
 import logging
 import re
 
+from chat import settings
 from chat.singleton import singleton
-from chat.server.state.user import User
+from chat.server.state.user import User, UserStore
 from chat.exceptions import (
     NotAuthorized,
     NoRegistredUserFound,
     DialogueOpenedAlready
 )
-from chat.manage_files import write_file, read_file
+from chat.manage_files import read_file
+from chat.server.state.segments import Segments
+from chat.server.state.storage import Storage
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
 DEFAULT_ROOM = "Global"
+# longest ttl a room can have, ten years
+MAX_TTL = 10 * 365 * 24 * 3600.0
 
 
 class RoomType(str, Enum):
@@ -37,6 +43,8 @@ class Room:
     allowed: list[str]
 
     deleted: bool
+    # seconds messages are kept for, None -- settings.MESSAGE_TTL
+    ttl: Optional[float] = None
 
     def __post_init__(self):
         if not self.key:
@@ -54,8 +62,27 @@ class Room:
             "admins": self.admins,
             "allowed": self.allowed,
             "deleted": self.deleted,
+            "ttl": self.ttl,
         }
 
+    @classmethod
+    def from_dict(cls, data: dict) -> "Room":
+        return cls(
+            key=uuid.UUID(data["key"]),
+            name=data["name"],
+            room_type=RoomType(data["room_type"]),
+            admins=data["admins"],
+            allowed=data["allowed"],
+            deleted=data["deleted"],
+            ttl=data.get("ttl"),
+        )
+
+    @property
+    def message_ttl(self) -> float:
+        ttl = settings.MESSAGE_TTL if self.ttl is None else self.ttl
+        # rooms saved before ttls were bounded may keep theirs forever
+        return ttl if 0 < ttl <= MAX_TTL else 0
+
 
 @singleton
 class RoomStore:
@@ -73,12 +100,19 @@ class RoomStore:
 
         self.store[global_room.key] = global_room
 
+        # rooms by key and user_rooms by user name, for snapshots
+        self.room_segments = Segments("rooms")
+        self.room_segments.touch(global_room.key)
+        self.member_segments = Segments("members")
+
         self.key_by_name: dict[str, str] = {}
         self.key_by_name[DEFAULT_ROOM] = global_room.key
 
         self.private_keys: dict[frozenset, str] = {}
 
         self.user_rooms: dict[str, list[str]] = {}
+        # reverse of user_rooms; members of the default room are implicit
+        self.room_users: dict[str, set[str]] = {}
 
     def __add_room_to_user(self, usename: str, room: Room) -> None:
         try:
@@ -87,6 +121,16 @@ class RoomStore:
             self.user_rooms[usename] = list()
             self.user_rooms[usename].append(room.key)
 
+        self.room_users.setdefault(room.key, set()).add(usename)
+        self.member_segments.touch(usename)
+
+    def __remove_room_from_user(self, username: str, room: Room) -> None:
+        self.user_rooms[username].remove(room.key)
+        self.member_segments.touch(username)
+
+        if room.key not in self.user_rooms[username]:
+            self.room_users.get(room.key, set()).discard(username)
+
     def __allowed_to_join(self, username: str, room: Room) -> bool:
         if room.room_type == RoomType.open:
             return True
@@ -109,6 +153,16 @@ class RoomStore:
         except KeyError:
             raise NoRegistredUserFound
 
+    def get_user_rooms(self, username: str) -> list[Room]:
+        """
+        Rooms and dialogues the user is in, default room first.
+        """
+        return [self.default_room()] + [
+            self.store[key]
+            for key in self.user_rooms.get(username, [])
+            if not self.store[key].deleted
+        ]
+
     def user_in_room(self, username: str, room: Room) -> bool:
         """
         Supposed to be called every time, user trying to write in room.
@@ -131,6 +185,15 @@ class RoomStore:
         return self.store[self.key_by_name[DEFAULT_ROOM]]
 
     def add_room(self, room: Room) -> Room:
+        added = self.__add_room(room)
+
+        if added is not None:
+            self.room_segments.touch(added.key)
+            Storage().append("rooms", "add_room", added.to_dict())
+
+        return added
+
+    def __add_room(self, room: Room) -> Room:
         if room.room_type == RoomType.private:
             if not len(room.admins) == 2:
                 raise ValueError
@@ -172,10 +235,18 @@ class RoomStore:
         return False
 
     def delete_room(self, room: Room, admin: User) -> bool:
+        self.__delete_room(room=room, admin=admin)
+        Storage().append(
+            "rooms", "delete_room", str(room.key), admin.username
+        )
+        return True
+
+    def __delete_room(self, room: Room, admin: User) -> bool:
         if not self.user_is_admin(room=room, user=admin):
             raise NotAuthorized
 
         room.deleted = True
+        self.room_segments.touch(room.key)
 
         if room.room_type == RoomType.private:
             del self.private_keys[frozenset((room.admins[0], room.admins[1]))]
@@ -184,7 +255,7 @@ class RoomStore:
 
         for user in room.allowed:
             try:
-                self.user_rooms[user].remove(room.key)
+                self.__remove_room_from_user(username=user, room=room)
             except KeyError:
                 pass
 
@@ -203,6 +274,14 @@ class RoomStore:
             return False
 
         room.allowed.append(new_user.username)
+        self.room_segments.touch(room.key)
+        Storage().append(
+            "rooms",
+            "add_user",
+            str(room.key),
+            admin.username,
+            new_user.username,
+        )
         return True
 
     def remove_user_from_room(
@@ -218,14 +297,22 @@ class RoomStore:
         if not self.user_is_admin(room=room, user=admin):
             return False
 
-        self.leave(user=remove_user, room=room)
+        self.__leave(user=remove_user, room=room)
 
         try:
             room.allowed.remove(remove_user.username)
         except ValueError:
             pass
-        finally:
-            return True
+
+        self.room_segments.touch(room.key)
+        Storage().append(
+            "rooms",
+            "remove_user",
+            str(room.key),
+            admin.username,
+            remove_user.username,
+        )
+        return True
 
     def get_room_by_name(self, room_name: str) -> Room:
         """
@@ -273,6 +360,9 @@ class RoomStore:
 
         if self.__allowed_to_join(username=user.username, room=room):
             self.__add_room_to_user(usename=user.username, room=room)
+            Storage().append(
+                "rooms", "join", user.username, str(room.key)
+            )
             return True
 
         return False
@@ -281,7 +371,13 @@ class RoomStore:
         """
         User leaves the room; User can't leave default room.
         """
+        if not self.__leave(user=user, room=room):
+            return False
+
+        Storage().append("rooms", "leave", user.username, str(room.key))
+        return True
 
+    def __leave(self, user: User, room: Room) -> bool:
         if room == self.default_room():
             return False
 
@@ -290,89 +386,131 @@ class RoomStore:
 
         if room.room_type == RoomType.private:
             room.deleted = True
-            self.user_rooms[room.allowed[0]].remove(room.key)
-            self.user_rooms[room.allowed[1]].remove(room.key)
+            self.room_segments.touch(room.key)
+            self.__remove_room_from_user(username=room.allowed[0], room=room)
+            self.__remove_room_from_user(username=room.allowed[1], room=room)
 
             return True
 
         if (
             len(room.admins) == 1 and self.user_is_admin(room=room, user=user)
         ) or room.room_type == RoomType.private:
-            self.delete_room(room=room, admin=user)
+            self.__delete_room(room=room, admin=user)
             return True
 
-        self.user_rooms[user.username].remove(room.key)
+        self.__remove_room_from_user(username=user.username, room=room)
         return True
 
-    def __store_to_dict(self):
-        data = dict()
-        for key, value in self.store.items():
-            data[str(key)] = json.dumps(value.to_dict(), indent=4)
-
-        return data
-
-    @staticmethod
-    def __keys_to_dict(key_store):
-        data = dict()
+    def redo(self, op: str, args: list) -> None:
+        """
+        Applies a change read from the write-ahead log.
+        """
+        users = UserStore()
 
-        for key, value in key_store.items():
-            data[str(key)] = str(value)
+        if op == "add_room":
+            self.add_room(Room.from_dict(args[0]))
+            return
 
-        return data
+        if op in ("join", "leave"):
+            username, key = args
+            getattr(self, op)(
+                user=users.get_user(username),
+                room=self.store[uuid.UUID(key)],
+            )
+            return
 
-    def __users_to_dict(self):
-        data = dict()
+        room = self.store[uuid.UUID(args[0])]
+        admin = users.get_user(args[1])
 
-        for key, value in self.user_rooms.items():
-            data[key] = json.dumps(
-                [str(key_room) for key_room in value], indent=4
+        if op == "delete_room":
+            self.delete_room(room=room, admin=admin)
+        elif op == "add_user":
+            self.add_user_to_room(
+                room=room, admin=admin, new_user=users.get_user(args[2])
+            )
+        elif op == "remove_user":
+            self.remove_user_from_room(
+                room=room, admin=admin, remove_user=users.get_user(args[2])
             )
 
-        return data
+    def touch_all(self) -> None:
+        self.room_segments.touch_all()
+        self.member_segments.touch_all()
+
+    def dialogue_open(self, room: Room) -> bool:
+        """
+        Whether the dialogue is the one of its pair, so it can be reopened.
+        """
+        pair = frozenset(room.admins)
+        return self.private_keys.get(pair) == room.key
 
-    async def dump(self, path: str = "./data/rooms.json") -> bool:
+    def snapshot(self) -> dict[str, dict]:
         """
-        Dumps all the data necessary for future load.
+        Rooms and the rooms of each user, of the segments changed since
+        the last snapshot.
         """
+        data = {}
+
+        for name, keys in self.room_segments.take().items():
+            rooms = [self.store[key] for key in keys]
+            data[name] = {
+                "rooms": [room.to_dict() for room in rooms],
+                "dialogues": [
+                    str(room.key)
+                    for room in rooms
+                    if room.room_type == RoomType.private
+                    and self.dialogue_open(room)
+                ],
+            }
+
+        for name, usernames in self.member_segments.take().items():
+            data[name] = {
+                username: [str(key) for key in self.user_rooms[username]]
+                for username in usernames
+            }
 
-        store = self.__store_to_dict()
+        return data
 
-        key_by_name = self.__keys_to_dict(self.key_by_name)
+    def restore(self, name: str, data: dict) -> None:
+        if name.startswith(self.room_segments.prefix):
+            for room_data in data["rooms"]:
+                self.__restore_room(Room.from_dict(room_data))
 
-        private_keys = self.__keys_to_dict(self.private_keys)
+            for key in data["dialogues"]:
+                room = self.store[uuid.UUID(key)]
+                self.private_keys[frozenset(room.admins)] = room.key
+            return
 
-        user_room = self.__users_to_dict()
+        for username, keys in data.items():
+            self.user_rooms[username] = [uuid.UUID(key) for key in keys]
+            self.member_segments.add(username)
 
-        data = json.dumps(
-            {
-                "store": store,
-                "key_by_name": key_by_name,
-                "private_keys": private_keys,
-                "user_room": user_room,
-            },
-            indent=4,
-        )
+            for key in self.user_rooms[username]:
+                self.room_users.setdefault(key, set()).add(username)
+
+    def __restore_room(self, room: Room) -> None:
+        self.store[room.key] = room
+        self.room_segments.add(room.key)
 
-        await write_file(path, data)
+        if room.room_type == RoomType.private or room.deleted:
+            return
 
-        return True
+        current = self.key_by_name.get(room.name)
+        if current is not None and current != room.key:
+            # the default room made up on start, the saved one replaces it
+            del self.store[current]
+            self.room_segments.discard(current)
+
+        self.key_by_name[room.name] = room.key
 
     def __load_store(self, data: dict):
         self.store = {}
+        self.room_segments = Segments("rooms")
 
         for room_key, room_data_str in data.items():
-            key = uuid.UUID(room_key)
-            room_data = json.loads(room_data_str)
-
-            room = Room(
-                key=key,
-                name=room_data["name"],
-                room_type=RoomType(room_data["room_type"]),
-                admins=room_data["admins"],
-                allowed=room_data["allowed"],
-                deleted=room_data["deleted"],
-            )
-            self.store[key] = room
+            room = Room.from_dict(json.loads(room_data_str))
+            self.store[room.key] = room
+            self.room_segments.touch(room.key)
 
     def __load_key_by_name(self, data: dict):
         for room_name, room_key in data.items():
@@ -390,8 +528,15 @@ class RoomStore:
             self.user_rooms[name] = [
                 uuid.UUID(room_key) for room_key in user_data_list
             ]
+            self.member_segments.touch(name)
+
+            for room_key in self.user_rooms[name]:
+                self.room_users.setdefault(room_key, set()).add(name)
 
     async def load(self, path: str = "./data/rooms.json"):
+        """
+        Loads rooms saved before snapshots were segmented.
+        """
         try:
             data = await read_file(path)
 
@@ -0,0 +1,147 @@
+"""
+Full-text index of room messages, see NotificationStore.search.
+
+Messages are split into lowercase word tokens. For each token the index
+keeps, by room, the seqs of the messages having it in an array, which
+stays sorted since seqs only grow. A query is words, and "quoted
+phrases"; a message matches if it has all of the words, its seqs are
+the intersection of the arrays. Phrases are matched on the messages
+found that way.
+
+Expiring messages cuts their seqs off the arrays of the room right away,
+empty arrays are removed: each room has a heap of its tokens by the first
+seq of their array, the tokens with expired seqs are at its top.
+"""
+from array import array
+from bisect import bisect_left, bisect_right
+import heapq
+import re
+from typing import Hashable, Iterator, Optional
+
+WORD = re.compile(r"\w+")
+PHRASE = re.compile(r'"([^"]*)"')
+
+
+def tokenize(text: str) -> list[str]:
+    return WORD.findall(text.lower())
+
+
+def parse_query(query: str) -> tuple[list[str], list[list[str]]]:
+    """
+    Distinct words of the query and its phrases (the quoted parts).
+    """
+    phrases = [tokenize(phrase) for phrase in PHRASE.findall(query)]
+    words = dict.fromkeys(tokenize(query))
+
+    return list(words), [phrase for phrase in phrases if len(phrase) > 1]
+
+
+def has_phrase(tokens: list[str], phrase: list[str]) -> bool:
+    n = len(phrase)
+    return any(
+        tokens[i:i + n] == phrase
+        for i in range(len(tokens) - n + 1)
+        if tokens[i] == phrase[0]
+    )
+
+
+class SearchIndex:
+    def __init__(self) -> None:
+        # token -> room key -> seqs of the messages with it
+        self.postings: dict[str, dict[Hashable, array]] = {}
+        # seq the messages of a room have expired up to
+        self.floors: dict[Hashable, int] = {}
+        # room key -> (first seq of the array, token) for each token
+        self.firsts: dict[Hashable, list[tuple[int, str]]] = {}
+
+    def __len__(self) -> int:
+        return len(self.postings)
+
+    def add(self, room_key: Hashable, seq: int, text: str) -> None:
+        """
+        Indexes a message; it has to be newer than the ones of the room
+        indexed already.
+        """
+        for token in dict.fromkeys(tokenize(text)):
+            rooms = self.postings.get(token)
+            if rooms is None:
+                rooms = self.postings[token] = {}
+
+            seqs = rooms.get(room_key)
+            if seqs is None:
+                seqs = rooms[room_key] = array("I")
+                heapq.heappush(
+                    self.firsts.setdefault(room_key, []), (seq, token)
+                )
+
+            if not seqs or seqs[-1] < seq:
+                seqs.append(seq)
+
+    def expire(self, room_key: Hashable, seq: int) -> None:
+        """
+        Forgets the messages of the room up to `seq`.
+        """
+        floor = self.floors[room_key] = max(
+            seq, self.floors.get(room_key, 0)
+        )
+        firsts = self.firsts.get(room_key, [])
+
+        while firsts and firsts[0][0] <= floor:
+            _, token = firsts[0]
+            rooms = self.postings[token]
+            seqs = rooms[room_key]
+
+            del seqs[:bisect_right(seqs, floor)]
+            if seqs:
+                heapq.heapreplace(firsts, (seqs[0], token))
+                continue
+
+            heapq.heappop(firsts)
+            del rooms[room_key]
+            if not rooms:
+                del self.postings[token]
+
+        if not firsts:
+            self.firsts.pop(room_key, None)
+
+    def __seqs(self, token: str, room_key: Hashable) -> array:
+        seqs = self.postings.get(token, {}).get(room_key)
+        return array("I") if seqs is None else seqs
+
+    def find(
+        self,
+        room_key: Hashable,
+        words: list[str],
+        before: Optional[int] = None,
+    ) -> Iterator[int]:
+        """
+        Seqs of the messages of the room having all the words, newest
+        first; below `before` if given.
+        """
+        if not words:
+            return
+
+        lists = sorted(
+            (self.__seqs(word, room_key) for word in words), key=len
+        )
+        shortest, others = lists[0], lists[1:]
+        seq = before
+
+        while True:
+            # the arrays may be cut or grow between two steps, the place
+            # is found again by seq
+            i = bisect_left(shortest, seq) if seq else len(shortest)
+            if i == 0:
+                return
+
+            seq = shortest[i - 1]
+            if seq <= self.floors.get(room_key, 0):
+                return
+
+            if all(contains(seqs, seq) for seqs in others):
+                yield seq
+
+
+def contains(seqs: array, seq: int) -> bool:
+    i = bisect_left(seqs, seq)
+    return i < len(seqs) and seqs[i] == seq
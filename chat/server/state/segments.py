@@ -0,0 +1,95 @@
+"""
+Bookkeeping of the parts of a store changed since the last snapshot, see
+chat.server.state.snapshot.
+"""
+from typing import Hashable
+import zlib
+
+from chat import settings
+
+
+def bucket(key: Hashable, count: int) -> int:
+    return zlib.crc32(str(key).encode("utf-8")) % count
+
+
+class Segments:
+    """
+    Spreads the keys of a store over `count` segments and remembers the
+    segments with keys changed since they were last taken.
+    """
+
+    def __init__(
+        self, prefix: str, count: int = settings.SNAPSHOT_SEGMENTS
+    ) -> None:
+        self.prefix = prefix
+        self.keys: list[set] = [set() for _ in range(count)]
+        self.dirty: set[int] = set()
+
+    def name(self, i: int) -> str:
+        return f"{self.prefix}-{i}"
+
+    def add(self, key: Hashable) -> None:
+        """
+        A key restored from a snapshot, the segment has it already.
+        """
+        self.keys[bucket(key, len(self.keys))].add(key)
+
+    def touch(self, key: Hashable) -> None:
+        i = bucket(key, len(self.keys))
+        self.keys[i].add(key)
+        self.dirty.add(i)
+
+    def discard(self, key: Hashable) -> None:
+        i = bucket(key, len(self.keys))
+        self.keys[i].discard(key)
+        self.dirty.add(i)
+
+    def touch_all(self) -> None:
+        self.dirty = set(range(len(self.keys)))
+
+    def take(self) -> dict[str, set]:
+        """
+        Keys of each changed segment, by segment name; they are clean
+        afterwards.
+        """
+        taken = {self.name(i): set(self.keys[i]) for i in self.dirty}
+        self.dirty = set()
+
+        return taken
+
+
+class Chunks:
+    """
+    Append-only sequence of entries saved in chunks of `size`; remembers
+    the chunks with entries appended since they were last taken.
+    """
+
+    def __init__(
+        self, prefix: str, size: int = settings.SNAPSHOT_CHUNK_SIZE
+    ) -> None:
+        self.prefix = prefix
+        self.size = size
+        self.entries: list = []
+        self.dirty: set[int] = set()
+
+    def name(self, i: int) -> str:
+        # zero padded, so chunks sort in order by name
+        return f"{self.prefix}-{i:06}"
+
+    def append(self, entry, dirty: bool = True) -> None:
+        self.entries.append(entry)
+
+        if dirty:
+            self.dirty.add((len(self.entries) - 1) // self.size)
+
+    def touch_all(self) -> None:
+        self.dirty = set(range((len(self.entries) - 1) // self.size + 1))
+
+    def take(self) -> dict[str, list]:
+        taken = {
+            self.name(i): self.entries[i * self.size:(i + 1) * self.size]
+            for i in self.dirty
+        }
+        self.dirty = set()
+
+        return taken
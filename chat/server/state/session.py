@@ -0,0 +1,98 @@
+from typing import Iterable, Optional
+
+from chat.singleton import singleton
+from chat.utils.my_response import WSResponse, FrameType
+from chat.utils.outbound import Frame, Priority
+
+
+async def broadcast(
+    sessions: Iterable[WSResponse],
+    notification: dict,
+    priority: Priority = Priority.low,
+) -> int:
+    """
+    Sends the notification to every session; returns the number of
+    sessions it was queued for.
+
+    The notification is encoded once per codec and framed once per wire
+    format, sessions share the resulting buffers, so it must not hold
+    per-recipient fields.
+    """
+    bodies: dict[str, bytes] = {}
+    frames: dict[tuple, Frame] = {}
+    delivered = 0
+
+    for ws in sessions:
+        wire_format = ws.wire_format
+        frame = frames.get(wire_format)
+
+        body = bodies.get(ws.codec.name)
+        if body is None:
+            body = bodies[ws.codec.name] = ws.codec.encode(notification)
+
+        if frame is None:
+            frame = frames[wire_format] = ws.encode_frame(
+                body, frame_type=FrameType.json
+            )
+
+        try:
+            if await ws.send_encoded(body, frame, priority=priority):
+                delivered += 1
+        except ConnectionResetError:
+            pass
+
+    return delivered
+
+
+@singleton
+class SessionRegistry:
+    """
+    Live sessions by user name; a user may be connected from several
+    clients at once.
+    """
+
+    def __init__(self) -> None:
+        self.sessions: dict[str, set[WSResponse]] = {}
+
+    def __contains__(self, user_name: str) -> bool:
+        return user_name in self.sessions
+
+    def __len__(self) -> int:
+        return len(self.sessions)
+
+    def get(self, user_name: str) -> set[WSResponse]:
+        return self.sessions.get(user_name, set())
+
+    def add(self, user_name: str, ws: WSResponse) -> None:
+        self.sessions.setdefault(user_name, set()).add(ws)
+
+    def remove(self, user_name: str, ws: WSResponse) -> None:
+        sessions = self.sessions.get(user_name)
+        if sessions is None:
+            return
+
+        sessions.discard(ws)
+        if not sessions:
+            del self.sessions[user_name]
+
+    def rename(self, old: str, new: str, ws: WSResponse) -> None:
+        """
+        Called when a session logs in or out.
+        """
+        self.remove(old, ws)
+        self.add(new, ws)
+
+    async def mirror(
+        self,
+        user_name: str,
+        notification: dict,
+        exclude: Optional[WSResponse] = None,
+    ) -> int:
+        """
+        Replays what happened on one session to the user's other ones.
+        """
+        siblings = [ws for ws in self.get(user_name) if ws is not exclude]
+        if not siblings:
+            return 0
+
+        return await broadcast(siblings, notification, Priority.normal)
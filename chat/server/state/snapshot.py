@@ -0,0 +1,294 @@
+"""
+Snapshots of the stores tied to a position in the write-ahead log.
+
+The stores keep track of the segments (groups of users, rooms, chunks of
+message history) changed since the last snapshot. A snapshot writes only
+those, each to a new file, then replaces `manifest.json`, which lists the
+files of all segments and the number of the last log record they include.
+After a crash at any point there is a whole snapshot and the log records
+to replay on top of it.
+
+On recovery the chunks of room messages are not read: a room log is
+restored when the room is first read, or its oldest message expires, so
+startup does not take longer as history grows. The manifest has a
+summary of each chunk for that (see chunk_summary).
+"""
+import asyncio
+import copy
+from functools import partial
+import json
+import logging
+import os
+import time
+from typing import Optional
+import uuid
+
+from chat import settings
+from chat.manage_files import read_file, read_file_sync, replace_file
+from chat.singleton import singleton
+from chat.server.state.archive import Archives
+from chat.server.state.user import UserStore
+from chat.server.state.room import RoomStore
+from chat.server.state.message import NotificationStore, chunk_summary
+from chat.server.state.cursor import ReadCursorStore
+from chat.server.state.storage import StorageBackend
+from chat.server.state.wal import WriteAheadLog
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+MANIFEST = "manifest.json"
+SEGMENTS_DIR = "segments"
+ARCHIVE_DIR = "archive"
+
+# in the order they are restored, rooms refer to users and so on
+STORES = {
+    "users": UserStore,
+    "rooms": RoomStore,
+    "messages": NotificationStore,
+    "cursors": ReadCursorStore,
+}
+
+
+def write_segments(path: str, files: dict[str, bytes]) -> None:
+    os.makedirs(path, exist_ok=True)
+
+    for name, data in files.items():
+        with open(os.path.join(path, name), "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def remove_segments(path: str, files: list[str]) -> None:
+    for name in files:
+        try:
+            os.remove(os.path.join(path, name))
+        except FileNotFoundError:
+            pass
+
+
+@singleton
+class Snapshots:
+    def __init__(self) -> None:
+        self.dir = settings.DATA_DIR
+        self.manifest = {"lsn": 0, "generation": 0, "segments": {}}
+        self.lock = asyncio.Lock()
+
+    async def recover(self) -> int:
+        """
+        Restores the latest snapshot and replays the log on top of it;
+        returns the number of log records replayed.
+        """
+        if settings.ROOM_ARCHIVE:
+            Archives().open(os.path.join(self.dir, ARCHIVE_DIR))
+
+        try:
+            self.manifest = await read_file(os.path.join(self.dir, MANIFEST))
+        except FileNotFoundError:
+            await self.__load_unsegmented()
+
+        for name, store in STORES.items():
+            segments = self.manifest["segments"].get(name, {})
+
+            for segment in sorted(segments):
+                path = os.path.join(self.dir, SEGMENTS_DIR, segments[segment])
+
+                # room messages are read with their room, on first access
+                if store is NotificationStore:
+                    await self.__defer(segment, path)
+                    continue
+
+                store().restore(segment, await read_file(path))
+
+        wal = WriteAheadLog()
+        wal.dir = self.dir
+        # records are numbered on from the snapshot if the log is gone
+        wal.lsn = max(wal.lsn, self.manifest["lsn"])
+        replayed = 0
+
+        for lsn, name, op, args in wal.replay(self.manifest["lsn"]):
+            try:
+                STORES[name]().redo(op, args)
+                replayed += 1
+            except Exception as ex:
+                logger.error(f"Unable to replay record {lsn}, because: {ex}.")
+
+        return replayed
+
+    async def __defer(self, segment: str, path: str) -> None:
+        summaries = self.manifest.setdefault("summaries", {})
+        summary = summaries.get(segment)
+
+        if summary is None and segment.startswith("room-"):
+            # saved by older versions, it goes to the next manifest
+            summary = summaries[segment] = chunk_summary(
+                segment, await read_file(path)
+            )
+
+        NotificationStore().defer(
+            segment, partial(read_file_sync, path), summary
+        )
+
+    async def __load_unsegmented(self) -> None:
+        """
+        Whole store dumps saved by older versions, all of it goes to the
+        first snapshot.
+        """
+        for name, store in STORES.items():
+            path = os.path.join(self.dir, f"{name}.json")
+            if os.path.exists(path):
+                await store().load(path)
+
+    async def snapshot(self) -> dict:
+        """
+        Saves the segments changed since the last snapshot; returns the
+        number of segments written and removed and bytes written.
+        """
+        async with self.lock:
+            wal = WriteAheadLog()
+
+            # the state after record `lsn`: nothing changes until an await
+            lsn = wal.lsn
+            changes = {
+                name: store().snapshot() for name, store in STORES.items()
+            }
+            rotated = wal.rotate()
+
+            try:
+                return await self.__save(lsn, changes, rotated)
+            except BaseException:
+                # the changes taken are not saved, the next snapshot
+                # writes everything
+                for store in STORES.values():
+                    store().touch_all()
+                raise
+
+    async def __save(
+        self, lsn: int, changes: dict, rotated: asyncio.Future
+    ) -> dict:
+        generation = self.manifest["generation"] + 1
+        manifest = copy.deepcopy(self.manifest)
+        manifest.update(lsn=lsn, generation=generation)
+
+        files: dict[str, bytes] = {}
+        superseded: list[str] = []
+        removed = 0
+
+        summaries = manifest.setdefault("summaries", {})
+
+        for name, segments in changes.items():
+            saved = manifest["segments"].setdefault(name, {})
+
+            for segment, data in segments.items():
+                if segment in saved:
+                    superseded.append(saved.pop(segment))
+                    summaries.pop(segment, None)
+
+                if data is None:
+                    removed += 1
+                    continue
+
+                saved[segment] = f"{segment}.{generation}.json"
+                if name == "messages":
+                    summary = chunk_summary(segment, data)
+                    if summary is not None:
+                        summaries[segment] = summary
+                files[saved[segment]] = json.dumps(
+                    data, default=str, separators=(",", ":")
+                ).encode("utf-8")
+
+        path = os.path.join(self.dir, SEGMENTS_DIR)
+        await asyncio.to_thread(write_segments, path, files)
+        # the chunks of the messages moved to the archive are removed
+        await Archives().sync()
+        await replace_file(
+            os.path.join(self.dir, MANIFEST), json.dumps(manifest)
+        )
+        self.manifest = manifest
+
+        await asyncio.to_thread(remove_segments, path, superseded)
+        await rotated
+        WriteAheadLog().remove(lsn)
+
+        return {
+            "written": len(files),
+            "removed": removed,
+            "bytes": sum(len(data) for data in files.values()),
+        }
+
+    async def run(self, interval: float) -> None:
+        """
+        Takes a snapshot every `interval` seconds.
+        """
+        while True:
+            await asyncio.sleep(interval)
+
+            start = time.perf_counter()
+            try:
+                stats = await self.snapshot()
+            except OSError as ex:
+                logger.error(f"Unable to take a snapshot, because: {ex}.")
+                continue
+
+            logger.info(
+                "Snapshot: segments=%s removed=%s bytes=%s in %.3fs",
+                stats["written"],
+                stats["removed"],
+                stats["bytes"],
+                time.perf_counter() - start,
+            )
+
+
+class MemoryBackend(StorageBackend):
+    """
+    The stores kept in memory, saved by snapshots and the write-ahead log;
+    older room messages are in the room archives.
+    """
+
+    def __init__(self) -> None:
+        self.__snapshots: Optional[asyncio.Task] = None
+
+    async def open(self) -> int:
+        replayed = await Snapshots().recover()
+
+        if settings.WAL:
+            WriteAheadLog().open()
+
+        # the replayed changes go to a snapshot right away
+        await Snapshots().snapshot()
+
+        if settings.SNAPSHOT_INTERVAL > 0:
+            self.__snapshots = asyncio.ensure_future(
+                Snapshots().run(settings.SNAPSHOT_INTERVAL)
+            )
+
+        return replayed
+
+    def append(self, store: str, op: str, *args) -> None:
+        WriteAheadLog().append(store, op, *args)
+
+    async def commit(self) -> None:
+        await WriteAheadLog().commit()
+
+    async def messages(
+        self, room_key: uuid.UUID, start: int, stop: int
+    ) -> list[dict]:
+        # the room logs read the archives themselves
+        return []
+
+    async def close(self) -> None:
+        if self.__snapshots is not None:
+            self.__snapshots.cancel()
+            await asyncio.gather(self.__snapshots, return_exceptions=True)
+
+        # what the log writer has not written yet is written on close
+        await WriteAheadLog().close()
+        await Snapshots().snapshot()
+        Archives().close()
@@ -0,0 +1,416 @@
+"""
+Storage backend keeping the state of the stores in an SQLite database.
+
+The changes the stores record are turned into statements on the event
+loop and run in batches, one transaction each, by a dedicated thread, so
+the loop never waits for the disk; a batch is whatever was recorded while
+the previous one was committed. Room messages the room logs have dropped
+are read back by (room_key, seq) on the same thread.
+"""
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import json
+import logging
+import os
+import sqlite3
+from typing import Optional
+import uuid
+
+from chat import settings
+from chat.server.state.cursor import ReadCursorStore
+from chat.server.state.message import NotificationStore
+from chat.server.state.room import RoomStore
+from chat.server.state.storage import StorageBackend
+from chat.server.state.user import UserStore
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    name TEXT PRIMARY KEY,
+    hashed_password TEXT NOT NULL
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS rooms (
+    key TEXT PRIMARY KEY,
+    data TEXT NOT NULL,
+    -- the dialogue of its pair of users, it is reopened rather than
+    -- created again
+    dialogue INTEGER NOT NULL
+) WITHOUT ROWID;
+
+-- rooms of each user in the order joined
+CREATE TABLE IF NOT EXISTS members (
+    user TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    room_key TEXT NOT NULL,
+    PRIMARY KEY (user, position)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS members_by_room ON members (room_key, user);
+
+CREATE TABLE IF NOT EXISTS messages (
+    room_key TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    data TEXT NOT NULL,
+    PRIMARY KEY (room_key, seq)
+) WITHOUT ROWID;
+
+-- seq the messages of a room have expired up to
+CREATE TABLE IF NOT EXISTS expired (
+    room_key TEXT PRIMARY KEY,
+    seq INTEGER NOT NULL
+) WITHOUT ROWID;
+
+-- notifications of a user, user is NULL for the others
+CREATE TABLE IF NOT EXISTS notifications (
+    id INTEGER PRIMARY KEY,
+    user TEXT,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS notifications_by_user
+    ON notifications (user, id);
+
+CREATE TABLE IF NOT EXISTS cursors (
+    user TEXT NOT NULL,
+    room_key TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    PRIMARY KEY (user, room_key)
+) WITHOUT ROWID;
+"""
+
+PUT_USER = "INSERT OR REPLACE INTO users VALUES (?, ?)"
+PUT_ROOM = "INSERT OR REPLACE INTO rooms VALUES (?, ?, ?)"
+CLEAR_MEMBER = "DELETE FROM members WHERE user = ?"
+ADD_MEMBER = "INSERT INTO members VALUES (?, ?, ?)"
+PUT_MESSAGE = "INSERT OR REPLACE INTO messages VALUES (?, ?, ?)"
+EXPIRE_MESSAGES = "DELETE FROM messages WHERE room_key = ? AND seq <= ?"
+PUT_EXPIRED = "INSERT OR REPLACE INTO expired VALUES (?, ?)"
+ADD_NOTIFICATION = "INSERT INTO notifications (user, data) VALUES (?, ?)"
+ADVANCE_CURSOR = (
+    "INSERT INTO cursors VALUES (?, ?, ?) ON CONFLICT (user, room_key) "
+    "DO UPDATE SET seq = max(seq, excluded.seq)"
+)
+GET_MESSAGES = (
+    "SELECT data FROM messages WHERE room_key = ? AND seq >= ? AND seq < ? "
+    "ORDER BY seq"
+)
+# the newest ones of a room, newest first
+GET_TAIL = (
+    "SELECT data FROM messages WHERE room_key = ? ORDER BY seq DESC LIMIT ?"
+)
+
+
+def dumps(data) -> str:
+    return json.dumps(data, default=str, separators=(",", ":"))
+
+
+class SqliteBackend(StorageBackend):
+    def __init__(self, path: Optional[str] = None) -> None:
+        self.path = path or os.path.join(
+            settings.DATA_DIR, settings.SQLITE_FILE
+        )
+        self.durable = settings.WAL_FSYNC_INTERVAL <= 0
+
+        # statements not handed to the thread yet, and the numbers of the
+        # last change recorded and committed
+        self.__pending: list[tuple[str, tuple]] = []
+        self.appended = 0
+        self.committed = 0
+
+        self.__connection: Optional[sqlite3.Connection] = None
+        self.__executor: Optional[ThreadPoolExecutor] = None
+        self.__waiters: list[tuple[int, asyncio.Future]] = []
+        self.__wakeup: Optional[asyncio.Event] = None
+        self.__writer: Optional[asyncio.Task] = None
+
+        # statements of a change, by store
+        self.__statements = {
+            "users": self.__users,
+            "rooms": self.__rooms,
+            "messages": self.__messages,
+            "cursors": self.__cursors,
+        }
+
+    async def __run(self, function, *args):
+        return await asyncio.get_running_loop().run_in_executor(
+            self.__executor, function, *args
+        )
+
+    async def open(self) -> int:
+        """
+        Loads users, rooms, cursors, notifications and the newest
+        ROOM_HISTORY_SIZE messages of each room; returns the number of
+        rows loaded.
+        """
+        self.__executor = ThreadPoolExecutor(1, thread_name_prefix="sqlite")
+        await self.__run(self.__connect)
+        loaded = await self.__run(self.__load)
+
+        self.__wakeup = asyncio.Event()
+        self.__writer = asyncio.ensure_future(self.__write_loop())
+
+        restored = self.__restore(loaded)
+        # made up on the first start, it is saved like the others
+        self.append("rooms", "add_room", RoomStore().default_room().to_dict())
+
+        return restored
+
+    def __connect(self) -> None:
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+
+        self.__connection = sqlite3.connect(self.path)
+        self.__connection.execute("PRAGMA journal_mode = WAL")
+        self.__connection.execute(
+            f"PRAGMA synchronous = {'FULL' if self.durable else 'NORMAL'}"
+        )
+        self.__connection.executescript(SCHEMA)
+
+    def __load(self) -> dict:
+        db = self.__connection
+        loaded = {
+            "users": dict(db.execute("SELECT * FROM users")),
+            "rooms": db.execute("SELECT data, dialogue FROM rooms").fetchall(),
+            "members": {},
+            "cursors": {},
+            "notifications": db.execute(
+                "SELECT user, data FROM notifications ORDER BY id"
+            ).fetchall(),
+            "messages": {},
+        }
+
+        for user, room_key in db.execute(
+            "SELECT user, room_key FROM members ORDER BY user, position"
+        ):
+            loaded["members"].setdefault(user, []).append(room_key)
+
+        for user, room_key, seq in db.execute("SELECT * FROM cursors"):
+            loaded["cursors"].setdefault(user, {})[room_key] = seq
+
+        expired = dict(db.execute("SELECT * FROM expired"))
+
+        for (room_key,) in db.execute("SELECT key FROM rooms"):
+            tail = db.execute(
+                GET_TAIL, (room_key, settings.ROOM_HISTORY_SIZE)
+            ).fetchall()
+            if tail or room_key in expired:
+                loaded["messages"][room_key] = {
+                    "room": room_key,
+                    "messages": [json.loads(data) for data, in reversed(tail)],
+                    "last_seq": expired.get(room_key, 0),
+                }
+
+        return loaded
+
+    @staticmethod
+    def __restore(loaded: dict) -> int:
+        """
+        Hands the rows to the stores in the form of snapshot segments.
+        """
+        UserStore().restore("users", loaded["users"])
+
+        RoomStore().restore("rooms", {
+            "rooms": [json.loads(data) for data, _ in loaded["rooms"]],
+            "dialogues": [
+                json.loads(data)["key"]
+                for data, dialogue in loaded["rooms"]
+                if dialogue
+            ],
+        })
+        RoomStore().restore("members", loaded["members"])
+        ReadCursorStore().restore("cursors", loaded["cursors"])
+
+        notifications = NotificationStore()
+        for room_key, chunk in loaded["messages"].items():
+            notifications.restore(f"room-{room_key}-{0:06}", chunk)
+
+        users = [json.loads(d) for u, d in loaded["notifications"] if u]
+        other = [json.loads(d) for u, d in loaded["notifications"] if not u]
+        notifications.restore("users", users)
+        notifications.restore("other-0", other)
+
+        return (
+            len(loaded["users"])
+            + len(loaded["rooms"])
+            + len(loaded["notifications"])
+            + sum(len(c["messages"]) for c in loaded["messages"].values())
+        )
+
+    def append(self, store: str, op: str, *args) -> None:
+        if self.__wakeup is None:
+            return
+
+        statements = self.__statements[store](op, args)
+        if not statements:
+            return
+
+        self.__pending.extend(statements)
+        self.appended += 1
+        self.__wakeup.set()
+
+    def __users(self, op: str, args: tuple) -> list:
+        if op == "register":
+            return [(PUT_USER, tuple(args))]
+
+        return []
+
+    def __cursors(self, op: str, args: tuple) -> list:
+        if op == "advance":
+            return [(ADVANCE_CURSOR, tuple(args))]
+
+        return []
+
+    def __messages(self, op: str, args: tuple) -> list:
+        if op == "expire":
+            return [(EXPIRE_MESSAGES, tuple(args)), (PUT_EXPIRED, tuple(args))]
+
+        if op != "add":
+            return []
+
+        section, data, room_key = args
+
+        if section == "rooms":
+            return [(PUT_MESSAGE, (room_key, data["seq"], dumps(data)))]
+
+        user = data["user_name"] if section == "users" else None
+        return [(ADD_NOTIFICATION, (user, dumps(data)))]
+
+    def __rooms(self, op: str, args: tuple) -> list:
+        """
+        The room changed and the rooms of the users it may have changed
+        for, as they are after the change.
+        """
+        store = RoomStore()
+
+        if op == "add_room":
+            key = args[0]["key"]
+            users = set()
+        elif op in ("join", "leave"):
+            key = args[1]
+            users = {args[0]}
+        else:
+            key = args[0]
+            users = set(args[2:])
+
+        room = store.get_room_by_key(uuid.UUID(key))
+        users |= set(room.allowed)
+
+        statements = [(
+            PUT_ROOM,
+            (key, dumps(room.to_dict()), int(store.dialogue_open(room))),
+        )]
+
+        for user in sorted(users):
+            statements.append((CLEAR_MEMBER, (user,)))
+            statements.extend(
+                (ADD_MEMBER, (user, position, str(room_key)))
+                for position, room_key in enumerate(
+                    store.user_rooms.get(user, [])
+                )
+            )
+
+        return statements
+
+    async def commit(self) -> None:
+        if self.durable:
+            await self.flush()
+
+    async def flush(self) -> None:
+        """
+        Waits until the changes recorded so far are committed.
+        """
+        if self.__wakeup is None or self.committed >= self.appended:
+            return
+
+        future = asyncio.get_running_loop().create_future()
+        self.__waiters.append((self.appended, future))
+        self.__wakeup.set()
+
+        await future
+
+    async def messages(
+        self, room_key: uuid.UUID, start: int, stop: int
+    ) -> list[dict]:
+        if self.__wakeup is None:
+            return []
+
+        await self.flush()
+        rows = await self.__run(
+            self.__query, GET_MESSAGES, (str(room_key), start, stop)
+        )
+
+        return [json.loads(data) for data, in rows]
+
+    def __query(self, sql: str, params: tuple) -> list:
+        return self.__connection.execute(sql, params).fetchall()
+
+    async def __write_loop(self) -> None:
+        while True:
+            await self.__wakeup.wait()
+            self.__wakeup.clear()
+
+            # everything recorded while the previous batch was committed
+            batch, self.__pending = self.__pending, []
+            appended = self.appended
+            if not batch:
+                continue
+
+            try:
+                await self.__run(self.__write, batch)
+            except sqlite3.Error as ex:
+                logger.error(f"Unable to save changes, because: {ex}.")
+                # the transaction is rolled back, the batch is lost: its
+                # waiters fail, later batches do not depend on it
+                self.__release_waiters(appended, ex)
+
+            self.committed = appended
+            self.__release_waiters()
+
+    def __write(self, batch: list) -> None:
+        with self.__connection:
+            for sql, params in batch:
+                self.__connection.execute(sql, params)
+
+    def __release_waiters(
+        self, lost: int = 0, error: Optional[sqlite3.Error] = None
+    ) -> None:
+        """
+        Releases the waiters of committed changes; with `error`, fails
+        those of the changes up to `lost` instead.
+        """
+        waiting = []
+
+        for number, future in self.__waiters:
+            if future.done():
+                continue
+
+            if number <= lost:
+                # a new one each, the error holds the writer's frames
+                future.set_exception(
+                    sqlite3.Error(f"Unable to save changes: {error}")
+                )
+            elif number > self.committed:
+                waiting.append((number, future))
+            else:
+                future.set_result(None)
+
+        self.__waiters = waiting
+
+    async def close(self) -> None:
+        """
+        Commits what is left and closes the database.
+        """
+        if self.__wakeup is None:
+            return
+
+        self.__writer.cancel()
+        await asyncio.gather(self.__writer, return_exceptions=True)
+
+        batch, self.__pending = self.__pending, []
+        await self.__run(self.__write, batch)
+        self.committed = self.appended
+        self.__release_waiters()
+
+        await self.__run(self.__connection.close)
+        self.__executor.shutdown()
+        self.__wakeup = None
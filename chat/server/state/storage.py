@@ -0,0 +1,70 @@
+"""
+Where the stores keep their state beyond memory.
+
+The stores make their changes in memory and append a record of each one,
+(store, op, args), to the storage backend chosen at server start: the
+memory backend saves the stores with snapshots and the write-ahead log
+(chat.server.state.snapshot), the SQLite one applies the changes to its
+tables (chat.server.state.sqlite).
+"""
+from typing import Optional
+import uuid
+
+from chat.singleton import singleton
+
+
+class StorageBackend:
+    async def open(self) -> int:
+        """
+        Restores the stores; returns the number of changes replayed.
+        """
+        raise NotImplementedError
+
+    def append(self, store: str, op: str, *args) -> None:
+        """
+        Records a change the store has made; must not block.
+        """
+        raise NotImplementedError
+
+    async def commit(self) -> None:
+        """
+        Waits for the changes recorded so far to be on disk, if replies
+        are to wait for that.
+        """
+        raise NotImplementedError
+
+    async def messages(
+        self, room_key: uuid.UUID, start: int, stop: int
+    ) -> list[dict]:
+        """
+        Room messages with start <= seq < stop the room log has dropped,
+        oldest first.
+        """
+        raise NotImplementedError
+
+    async def close(self) -> None:
+        raise NotImplementedError
+
+
+@singleton
+class Storage:
+    def __init__(self) -> None:
+        # None until the server starts (tests, benchmarks), changes are
+        # kept in memory only
+        self.backend: Optional[StorageBackend] = None
+
+    def append(self, store: str, op: str, *args) -> None:
+        if self.backend is not None:
+            self.backend.append(store, op, *args)
+
+    async def commit(self) -> None:
+        if self.backend is not None:
+            await self.backend.commit()
+
+    async def messages(
+        self, room_key: uuid.UUID, start: int, stop: int
+    ) -> list[dict]:
+        if self.backend is None or start >= stop:
+            return []
+
+        return await self.backend.messages(room_key, start, stop)
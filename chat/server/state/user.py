@@ -6,7 +6,9 @@ import uuid
 import argon2
 
 from chat.singleton import singleton
-from chat.manage_files import write_file, read_file, to_dict
+from chat.manage_files import read_file
+from chat.server.state.segments import Segments
+from chat.server.state.storage import Storage
 
 from chat.exceptions import (
     UsernameUnaceptable,
@@ -52,6 +54,7 @@ class User:
 class UserStore:
     def __init__(self) -> None:
         self.store: dict[str, User] = dict()
+        self.segments = Segments("users")
 
     def get_user(self, username: str) -> User:
         try:
@@ -106,16 +109,57 @@ class UserStore:
             username=username,
             hashed_password=password
         )
+        self.segments.touch(username)
+        Storage().append(
+            "users",
+            "register",
+            username,
+            self.store[username].hashed_password.decode("utf-8"),
+        )
         return self.store[username]
 
-    async def dump(self, path: str = "./data/users.json"):
+    def redo(self, op: str, args: list) -> None:
+        """
+        Applies a change read from the write-ahead log.
+        """
+        if op == "register":
+            username, hashed_password = args
+            self.store[username] = User(
+                username=username,
+                hashed_password=bytes(hashed_password, encoding="utf-8"),
+                hashed=True,
+            )
+            self.segments.touch(username)
+
+    def snapshot(self) -> dict[str, dict]:
         """
-        Dumps whole store in json format as it is without any encription.
+        Hashed passwords by user name, of the segments changed since the
+        last snapshot.
         """
-        data = to_dict(self.store)
-        await write_file(path, json.dumps(data, indent=4))
+        return {
+            name: {
+                username: self.store[username].hashed_password.decode("utf-8")
+                for username in usernames
+            }
+            for name, usernames in self.segments.take().items()
+        }
+
+    def touch_all(self) -> None:
+        self.segments.touch_all()
+
+    def restore(self, name: str, data: dict) -> None:
+        for username, hashed_password in data.items():
+            self.store[username] = User(
+                username=username,
+                hashed_password=bytes(hashed_password, encoding="utf-8"),
+                hashed=True,
+            )
+            self.segments.add(username)
 
     async def load(self, path: str = "./data/users.json"):
+        """
+        Loads users saved before snapshots were segmented.
+        """
         try:
             data = await read_file(path)
 
@@ -129,6 +173,7 @@ class UserStore:
                     ),
                     hashed=True
                 )
+                self.segments.touch(obj["username"])
 
         except Exception as ex:
             logger.error(f"Unable load users from {path}, because: {ex}.")
@@ -0,0 +1,371 @@
+"""
+Write-ahead log of state changes.
+
+Stores append a record for every change they make. A background task
+writes the records in batches (group commit) from a dedicated thread and
+fsyncs the file every WAL_FSYNC_INTERVAL seconds, or after every batch in
+durable mode. The log is kept in segment files named after the number of
+their first record: a snapshot starts a new segment and removes the ones
+it includes. On startup the records following the last snapshot are
+replayed on top of it, see chat.server.state.snapshot.
+"""
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import glob
+import logging
+import os
+import struct
+import time
+from typing import Iterator, Optional
+import zlib
+
+from chat import settings
+from chat.exceptions import BadRequest
+from chat.singleton import singleton
+from chat.utils.codecs import DEFAULT_CODEC
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+SEGMENT = "wal-{:012}.log"
+SEGMENTS = "wal-*.log"
+
+# body length and crc32, the body is [lsn, store, op, args]
+HEADER = struct.Struct("!II")
+
+
+def encode_record(lsn: int, store: str, op: str, args: tuple) -> bytes:
+    body = DEFAULT_CODEC.encode([lsn, store, op, args])
+    return HEADER.pack(len(body), zlib.crc32(body)) + body
+
+
+def read_records(path: str) -> Iterator[tuple[int, bytes]]:
+    """
+    Bodies of the intact records with the offset each one ends at; stops
+    at the first torn or corrupt record.
+    """
+    with open(path, "rb") as f:
+        end = 0
+
+        while True:
+            header = f.read(HEADER.size)
+            if len(header) < HEADER.size:
+                return
+
+            length, crc = HEADER.unpack(header)
+            body = f.read(length)
+            if len(body) < length or zlib.crc32(body) != crc:
+                return
+
+            end += HEADER.size + length
+            yield end, body
+
+
+@singleton
+class WriteAheadLog:
+    def __init__(self) -> None:
+        self.dir = settings.DATA_DIR
+        self.fsync_interval = settings.WAL_FSYNC_INTERVAL
+
+        # numbers of the last record appended, written and fsynced
+        self.lsn = 0
+        self.written_lsn = 0
+        self.synced_lsn = 0
+
+        self.__file = None
+        # records and, for rotations, (path of the next segment, future)
+        self.__pending: list = []
+        self.__waiters: list[tuple[int, asyncio.Future]] = []
+        self.__wakeup: Optional[asyncio.Event] = None
+        self.__writer: Optional[asyncio.Task] = None
+        # wakes the writer to fsync records written in the meantime
+        self.__timer: Optional[asyncio.TimerHandle] = None
+        self.__sync_requested = False
+        self.__executor: Optional[ThreadPoolExecutor] = None
+        # first and last number of the records a failed write lost, and
+        # why; they are durable again once a snapshot includes them
+        self.__lost: Optional[tuple[int, int, OSError]] = None
+
+    @property
+    def durable(self) -> bool:
+        return self.fsync_interval <= 0
+
+    @property
+    def opened(self) -> bool:
+        return self.__file is not None
+
+    def segments(self) -> list[tuple[int, str]]:
+        """
+        Number of the first record and path of each segment, in order.
+        """
+        paths = glob.glob(os.path.join(self.dir, SEGMENTS))
+        return sorted(
+            (int(os.path.basename(path)[4:-4]), path) for path in paths
+        )
+
+    def replay(self, after: int = 0) -> Iterator[list]:
+        """
+        Records following lsn `after`, as [lsn, store, op, args]; stops at
+        the first torn or corrupt one.
+        """
+        segments = self.segments()
+
+        for i, (_, path) in enumerate(segments):
+            # the next segment starts past `after`, this one is all older
+            if i + 1 < len(segments) and segments[i + 1][0] <= after + 1:
+                continue
+
+            end = 0
+            for end, body in read_records(path):
+                try:
+                    record = DEFAULT_CODEC.decode(body)
+                except BadRequest:
+                    return
+
+                self.lsn = max(self.lsn, record[0])
+                if record[0] > after:
+                    yield record
+
+            # records past a damaged one would apply out of order
+            if end < os.path.getsize(path):
+                return
+
+    def open(self, lsn: int = 0) -> None:
+        """
+        Starts appending records numbered past `lsn` and the ones logged
+        before to the last segment. A torn record at its end, left by a
+        crash, is cut off.
+        """
+        os.makedirs(self.dir, exist_ok=True)
+
+        segments = self.segments()
+        end, last = 0, None
+
+        if segments:
+            path = segments[-1][1]
+            for end, last in read_records(path):
+                pass
+        else:
+            path = os.path.join(self.dir, SEGMENT.format(lsn + 1))
+
+        if last is not None:
+            lsn = max(lsn, DEFAULT_CODEC.decode(last)[0])
+
+        self.__file = open(path, "ab")
+        self.__file.truncate(end)
+
+        self.lsn = self.written_lsn = self.synced_lsn = max(lsn, self.lsn)
+
+        self.__wakeup = asyncio.Event()
+        self.__executor = ThreadPoolExecutor(1, thread_name_prefix="wal")
+        self.__writer = asyncio.ensure_future(self.__write_loop())
+
+    def append(self, store: str, op: str, *args) -> int:
+        """
+        Queues a record of a change; returns its number, 0 while the log
+        is not open (loading, replaying, tests).
+        """
+        if self.__file is None:
+            return 0
+
+        self.lsn += 1
+        self.__pending.append(encode_record(self.lsn, store, op, args))
+        self.__wakeup.set()
+
+        return self.lsn
+
+    async def sync(self, lsn: Optional[int] = None) -> None:
+        """
+        Waits until the records up to `lsn`, all appended ones by default,
+        are fsynced.
+        """
+        lsn = self.lsn if lsn is None else lsn
+        if self.__file is None or lsn <= self.synced_lsn:
+            return
+        if self.__lost is not None and lsn >= self.__lost[0]:
+            raise self.__lost_error()
+
+        future = asyncio.get_running_loop().create_future()
+        self.__waiters.append((lsn, future))
+        self.__wakeup.set()
+
+        await future
+
+    def rotate(self) -> asyncio.Future:
+        """
+        Starts a new segment for the records appended from now on; the
+        future is done once the previous segment is synced and closed.
+        """
+        done = asyncio.get_running_loop().create_future()
+
+        if self.__file is None:
+            done.set_result(None)
+            return done
+
+        path = os.path.join(self.dir, SEGMENT.format(self.lsn + 1))
+        self.__pending.append((path, done))
+        self.__wakeup.set()
+
+        return done
+
+    def remove(self, lsn: int) -> None:
+        """
+        Removes the segments with no records past `lsn`, a snapshot
+        includes them.
+        """
+        segments = self.segments()
+
+        for (_, path), (start, _) in zip(segments, segments[1:]):
+            if start <= lsn + 1:
+                os.remove(path)
+
+        if self.__lost is not None and lsn >= self.__lost[1]:
+            self.__lost = None
+            self.synced_lsn = max(self.synced_lsn, lsn)
+            self.__release_waiters()
+
+    async def commit(self) -> None:
+        """
+        In durable mode waits for the changes made so far to be fsynced.
+        """
+        if self.durable:
+            await self.sync()
+
+    async def close(self) -> None:
+        """
+        Writes and fsyncs what is left and closes the file.
+        """
+        if self.__file is None:
+            return
+
+        self.__writer.cancel()
+        await asyncio.gather(self.__writer, return_exceptions=True)
+        if self.__timer is not None:
+            self.__timer.cancel()
+            self.__timer = None
+
+        batch, self.__pending = self.__pending, []
+        await asyncio.get_running_loop().run_in_executor(
+            self.__executor, self.__write, batch, True
+        )
+        self.__executor.shutdown()
+        self.__rotated(batch)
+
+        self.written_lsn = self.synced_lsn = self.lsn
+        self.__release_waiters()
+
+        self.__file.close()
+        self.__file = None
+
+    async def __write_loop(self) -> None:
+        loop = asyncio.get_running_loop()
+        last_sync = time.monotonic()
+
+        while True:
+            await self.__wakeup.wait()
+            self.__wakeup.clear()
+
+            # everything queued while the previous batch was written
+            batch, self.__pending = self.__pending, []
+            lsn = self.lsn
+            fsync = (
+                self.durable
+                or bool(self.__waiters)
+                or self.__sync_requested
+                or time.monotonic() - last_sync >= self.fsync_interval
+            )
+            if not batch and (not fsync or self.synced_lsn == lsn):
+                continue
+
+            try:
+                await loop.run_in_executor(
+                    self.__executor, self.__write, batch, fsync
+                )
+            except OSError as ex:
+                logger.error(f"Unable to write the log, because: {ex}.")
+                self.__rotated(batch, ex)
+                # the records may be partly written, or not at all: the
+                # log has a hole nothing past is acknowledged across
+                first = self.__lost[0] if self.__lost else self.synced_lsn + 1
+                self.__lost = (first, lsn, ex)
+                self.__release_waiters()
+                continue
+            self.written_lsn = lsn
+            self.__rotated(batch)
+
+            if fsync:
+                if self.__timer is not None:
+                    self.__timer.cancel()
+                    self.__timer = None
+                self.__sync_requested = False
+                last_sync = time.monotonic()
+                self.synced_lsn = (
+                    lsn if self.__lost is None else self.__lost[0] - 1
+                )
+                self.__release_waiters()
+            elif self.__timer is None:
+                self.__timer = loop.call_later(
+                    max(last_sync + self.fsync_interval - time.monotonic(), 0),
+                    self.__sync_due,
+                )
+
+    def __sync_due(self) -> None:
+        self.__timer = None
+        self.__sync_requested = True
+        self.__wakeup.set()
+
+    def __write(self, batch: list, fsync: bool) -> None:
+        records = []
+
+        for item in batch:
+            if isinstance(item, bytes):
+                records.append(item)
+                continue
+
+            # rotation: the segment is finished and synced first
+            self.__file.write(b"".join(records))
+            self.__file.flush()
+            os.fsync(self.__file.fileno())
+            self.__file.close()
+
+            records = []
+            self.__file = open(item[0], "ab")
+
+        if records:
+            self.__file.write(b"".join(records))
+            self.__file.flush()
+
+        if fsync:
+            os.fsync(self.__file.fileno())
+
+    @staticmethod
+    def __rotated(batch: list, error: Optional[Exception] = None) -> None:
+        for item in batch:
+            if isinstance(item, bytes) or item[1].done():
+                continue
+
+            if error is None:
+                item[1].set_result(None)
+            else:
+                item[1].set_exception(error)
+
+    def __lost_error(self) -> OSError:
+        # a new one each time, the original holds the writer's frames
+        first, _, ex = self.__lost
+        return OSError(f"Log records from {first} on were lost: {ex}")
+
+    def __release_waiters(self) -> None:
+        waiting = []
+
+        for lsn, future in self.__waiters:
+            if future.done():
+                continue
+
+            if self.__lost is not None and lsn >= self.__lost[0]:
+                future.set_exception(self.__lost_error())
+            elif lsn > self.synced_lsn:
+                waiting.append((lsn, future))
+            else:
+                future.set_result(None)
+
+        self.__waiters = waiting
@@ -12,8 +12,10 @@ from chat.exceptions import (
     UsernameUnaceptable,
     CloseSession
 )
-from chat.server.state.meta import Meta
+from chat.server.state.meta import Meta, request_id
 from chat.server.state.user import UserStore
+from chat.server.state.room import RoomStore, RoomType
+from chat.server.state.resume import ResumeStore
 from chat.server.state.message import (
     NotificationStore,
     UserAction,
@@ -27,6 +29,7 @@ INCORRECT_AUTH = "Incorrect username or password."
 REGISTER_FAIL = "The specified username is already taken."
 ALREADY_LOGGED_IN = "Already logged in."
 ALREADY_LOGGED_OUT = "Already logged out."
+NO_SESSION_TO_RESUME = "No session to resume."
 
 
 class RegisterAction(Command):
@@ -35,10 +38,9 @@ class RegisterAction(Command):
         if not reason:
             reason = ""
 
-        return Action(
+        return Action.construct(
             action=CommandType.register,
             datetime=str(datetime.now()),
-            expired=False,
             success=success,
             reason="",
             payload={"user_name": username},
@@ -96,15 +98,16 @@ class RegisterAction(Command):
 
 
 class LoginAction(Command):
+    exclusive = True
+
     @staticmethod
     def __get_notification(username, success, reason=None):
         if not reason:
             reason = ""
 
-        return UserAction(
+        return UserAction.construct(
             action=CommandType.login,
             datetime=str(datetime.now()),
-            expired=False,
             success=success,
             reason=reason,
             user_name=username,
@@ -162,13 +165,13 @@ class LoginAction(Command):
 
 
 class LogoutAction(Command):
+    exclusive = True
 
     @staticmethod
     def get_logout(success: bool, reason: str, user_name: str):
-        return UserAction(
+        return UserAction.construct(
             action=CommandType.logout,
             datetime=str(datetime.now()),
-            expired=False,
             success=success,
             reason=reason,
             user_name=user_name,
@@ -216,6 +219,8 @@ class LogoutAction(Command):
 
 
 class QuitAction(Command):
+    exclusive = True
+
     @classmethod
     async def run(
         cls,
@@ -228,3 +233,191 @@ class QuitAction(Command):
             raise UnsuitableCommand
 
         raise CloseSession
+
+
+class StatusAction(Command):
+    @staticmethod
+    def get_status(user_name: str, loggedin: bool):
+        rooms = RoomStore().get_user_rooms(username=user_name)
+
+        return UserAction.construct(
+            action=CommandType.status,
+            datetime=str(datetime.now()),
+            success=True,
+            reason="",
+            user_name=user_name,
+            payload={
+                "loggedin": loggedin,
+                "rooms": [
+                    room.name
+                    for room in rooms
+                    if room.room_type != RoomType.private
+                ],
+                "dialogues": [
+                    user
+                    for room in rooms
+                    if room.room_type == RoomType.private
+                    for user in room.admins
+                    if user != user_name
+                ],
+            },
+        )
+
+    @classmethod
+    async def run(
+        cls,
+        ws_response: WSResponse,
+        meta: Meta,
+        command: str = None,
+        message_json: dict[str, str] = None,
+    ):
+        if not command == CommandType.status:
+            raise UnsuitableCommand
+
+        await NotificationStore().process(
+            ws=ws_response,
+            notification=StatusAction.get_status(
+                user_name=meta.user_name, loggedin=meta.loggedin
+            ),
+        )
+
+        return meta
+
+
+class ResumeAction(Command):
+    """
+    Takes over a session dropped with the previous connection. The reply
+    carries the number of the last notification the client has got, the
+    missed ones follow it; when the journal no longer has all of them,
+    `complete` is false and unread counts point to the persistent history.
+    Neither the reply nor the replayed notifications are numbered again.
+    """
+    exclusive = True
+
+    @staticmethod
+    def get_resume(
+        user_name: str, success: bool, reason: str, payload: dict
+    ) -> UserAction:
+        return UserAction.construct(
+            action=CommandType.resume,
+            datetime=str(datetime.now()),
+            success=success,
+            reason=reason,
+            user_name=user_name,
+            payload=payload,
+        )
+
+    @classmethod
+    async def run(
+        cls,
+        ws_response: WSResponse,
+        meta: Meta,
+        command: str = None,
+        message_json: dict[str, str] = None,
+    ):
+        if not command == CommandType.resume:
+            raise UnsuitableCommand
+
+        try:
+            token = message_json["session"]
+            seq = int(message_json["seq"])
+        except (KeyError, TypeError, ValueError):
+            raise BadRequest
+
+        # only connections of the regular session loop are resumable
+        if getattr(ws_response, "journal", None) is None:
+            raise BadRequest
+
+        session = None
+        if token != meta.session:
+            session = ResumeStore().resume(token, ws_response)
+
+        if session is None:
+            notification = ResumeAction.get_resume(
+                user_name=meta.user_name,
+                success=False,
+                reason=NO_SESSION_TO_RESUME,
+                payload={
+                    "session": meta.session,
+                    "seq": ws_response.journal.seq,
+                    "replayed": 0,
+                    "complete": False,
+                },
+            )
+            cls.__reply(ws_response, notification)
+            return meta
+
+        ResumeStore().close(meta.session)
+
+        missed = session.journal.since(seq)
+        payload = {
+            "session": session.token,
+            "seq": seq,
+            "replayed": 0,
+            "complete": missed is not None,
+        }
+
+        if missed is None:
+            missed = []
+            payload["seq"] = session.journal.seq
+
+            if session.meta.loggedin:
+                payload["unread"] = NotificationStore().count_unread(
+                    session.meta.user_name
+                )
+
+        payload["replayed"] = len(missed)
+
+        ws_response.journal = session.journal
+        cls.__reply(
+            ws_response,
+            ResumeAction.get_resume(
+                user_name=session.meta.user_name,
+                success=True,
+                reason="",
+                payload=payload,
+            ),
+            missed,
+        )
+
+        return session.meta
+
+    @staticmethod
+    def __reply(
+        ws_response: WSResponse, notification: UserAction, missed=()
+    ) -> None:
+        reply = notification.get_notification()
+        if request_id.get() is not None:
+            reply["request_id"] = request_id.get()
+
+        # at once, so that nothing else is queued in between
+        ws_response.resend([ws_response.codec.encode(reply), *missed])
+
+
+class ReceivedAction(Command):
+    """
+    Delivery acknowledgement: the journal forgets notifications up to the
+    given number. Not replied to.
+    """
+
+    @classmethod
+    async def run(
+        cls,
+        ws_response: WSResponse,
+        meta: Meta,
+        command: str = None,
+        message_json: dict[str, str] = None,
+    ):
+        if not command == CommandType.received:
+            raise UnsuitableCommand
+
+        try:
+            seq = int(message_json["seq"])
+        except (KeyError, TypeError, ValueError):
+            raise BadRequest
+
+        journal = getattr(ws_response, "journal", None)
+        if journal is not None:
+            journal.ack(seq)
+
+        return meta
@@ -0,0 +1,138 @@
+"""
+Tuning knobs shared by server and client.
+
+Every value can be overridden with an environment variable of the same
+name prefixed with `CHAT_` (e.g. `CHAT_LEGACY_FRAMING=1`).
+"""
+import os
+
+ENV_PREFIX = "CHAT_"
+
+
+def env_bool(name: str, default: bool) -> bool:
+    value = os.getenv(ENV_PREFIX + name)
+    if value is None:
+        return default
+
+    return value.lower() in ("1", "true", "yes", "on")
+
+
+def env_int(name: str, default: int) -> int:
+    value = os.getenv(ENV_PREFIX + name)
+    if value is None:
+        return default
+
+    return int(value)
+
+
+def env_float(name: str, default: float) -> float:
+    value = os.getenv(ENV_PREFIX + name)
+    if value is None:
+        return default
+
+    return float(value)
+
+
+def env_str(name: str, default: str) -> str:
+    return os.getenv(ENV_PREFIX + name, default)
+
+
+# Transport
+LEGACY_FRAMING = env_bool("LEGACY_FRAMING", False)
+# bytes requested per read while scanning for the legacy END_SIGNAL
+READ_CHUNK_SIZE = env_int("READ_CHUNK_SIZE", 2**16)
+# a sender awaits drain() only once the transport buffers more than this
+WRITE_HIGH_WATER = env_int("WRITE_HIGH_WATER", 2**18)
+# comma separated codec names to offer/accept, empty -- all installed
+CODECS = env_str("CODECS", "")
+# "deflate" or empty to disable, payloads under the threshold go as is
+COMPRESSION = env_str("COMPRESSION", "deflate")
+COMPRESSION_THRESHOLD = env_int("COMPRESSION_THRESHOLD", 1024)
+COMPRESSION_LEVEL = env_int("COMPRESSION_LEVEL", 1)
+# outbound queue, in frames
+OUTBOUND_QUEUE_SIZE = env_int("OUTBOUND_QUEUE_SIZE", 1024)
+OUTBOUND_HIGH_WATER = env_int("OUTBOUND_HIGH_WATER", 768)
+OUTBOUND_LOW_WATER = env_int("OUTBOUND_LOW_WATER", 256)
+# "drop" or "disconnect", see chat.utils.outbound.OverflowPolicy
+OUTBOUND_POLICY = env_str("OUTBOUND_POLICY", "drop")
+SLOW_CONSUMER_TIMEOUT = env_float("SLOW_CONSUMER_TIMEOUT", 10.0)
+# seconds between outbound queue stats log lines, 0 to disable
+QUEUE_STATS_INTERVAL = env_float("QUEUE_STATS_INTERVAL", 60.0)
+# WebSocket transport, served on HTTP_PORT by upgrading requests to WS_PATH
+WS_PATH = env_str("WS_PATH", "/ws")
+# larger messages are sent as several frames
+WS_FRAGMENT_SIZE = env_int("WS_FRAGMENT_SIZE", 2**20)
+# seconds between pings, a peer missing a pong is dropped; 0 to disable
+WS_PING_INTERVAL = env_float("WS_PING_INTERVAL", 20.0)
+# client connects over WebSocket instead of the custom protocol
+WEBSOCKET = env_bool("WEBSOCKET", False)
+
+# Server
+# commands of one connection processed concurrently
+MAX_INFLIGHT_COMMANDS = env_int("MAX_INFLIGHT_COMMANDS", 16)
+# bytes of notifications kept per session to replay them after a reconnect
+REPLAY_BUFFER_SIZE = env_int("REPLAY_BUFFER_SIZE", 2**18)
+# seconds a dropped session can be resumed for
+RESUME_TIMEOUT = env_float("RESUME_TIMEOUT", 60.0)
+# latest messages of a room kept in memory, older ones are archived on disk
+ROOM_HISTORY_SIZE = env_int("ROOM_HISTORY_SIZE", 10_000)
+# bytes of encoded room messages kept to answer /history with, the ones
+# encoded first are dropped first; 0 -- messages are encoded on every read
+WIRE_CACHE_SIZE = env_int("WIRE_CACHE_SIZE", 2**25)
+# seconds room messages are kept for, a room can set its own; 0 -- forever
+MESSAGE_TTL = env_float("MESSAGE_TTL", 3600.0)
+# messages expiring within the same this many seconds are dropped together,
+# up to that late
+EXPIRY_BUCKET = env_float("EXPIRY_BUCKET", 60.0)
+
+# Persistence
+# snapshots of the stores and the write-ahead log live here
+DATA_DIR = env_str("DATA_DIR", "./data")
+# "memory" -- the stores are kept in memory and saved with snapshots and
+# the write-ahead log, "sqlite" -- in SQLITE_FILE, the newest messages of
+# each room are kept in memory too
+STORAGE = env_str("STORAGE", "memory")
+# the SQLite database, relative to DATA_DIR
+SQLITE_FILE = env_str("SQLITE_FILE", "chat.sqlite3")
+# log every change so a crash loses at most WAL_FSYNC_INTERVAL seconds of
+# them; off -- state is only saved on shutdown
+WAL = env_bool("WAL", True)
+# seconds between fsyncs of the log; 0 -- durable mode, a reply is only
+# sent once the change it reports is on disk, with either storage
+WAL_FSYNC_INTERVAL = env_float("WAL_FSYNC_INTERVAL", 1.0)
+# seconds between background snapshots, 0 -- only on start and shutdown
+SNAPSHOT_INTERVAL = env_float("SNAPSHOT_INTERVAL", 300.0)
+# users, rooms, memberships and cursors are spread over this many segments,
+# a snapshot rewrites only the segments with changes
+SNAPSHOT_SEGMENTS = env_int("SNAPSHOT_SEGMENTS", 64)
+# entries per segment of the message histories
+SNAPSHOT_CHUNK_SIZE = env_int("SNAPSHOT_CHUNK_SIZE", 128)
+# room messages older than ROOM_HISTORY_SIZE go to segment files under
+# DATA_DIR/archive; off -- they are dropped
+ROOM_ARCHIVE = env_bool("ROOM_ARCHIVE", True)
+# a new segment of a room archive is started past this many bytes
+ARCHIVE_SEGMENT_SIZE = env_int("ARCHIVE_SEGMENT_SIZE", 2**20)
+# bytes of messages per entry of the sparse index of a segment
+ARCHIVE_INDEX_INTERVAL = env_int("ARCHIVE_INDEX_INTERVAL", 4096)
+# segment files kept open for appending
+ARCHIVE_OPEN_FILES = env_int("ARCHIVE_OPEN_FILES", 64)
+
+# HTTP front end, HTTP_PORT=0 disables it
+HTTP_PORT = env_int("HTTP_PORT", 8080)
+# idle keep-alive connections are closed after this many seconds
+HTTP_KEEPALIVE_TIMEOUT = env_float("HTTP_KEEPALIVE_TIMEOUT", 15.0)
+# sessions opened with POST /connect are dropped once unused for this many
+# seconds, and the least recently used ones past HTTP_MAX_SESSIONS
+HTTP_SESSION_TIMEOUT = env_float("HTTP_SESSION_TIMEOUT", 1800.0)
+HTTP_MAX_SESSIONS = env_int("HTTP_MAX_SESSIONS", 10_000)
+HTTP_MAX_HEADER_SIZE = env_int("HTTP_MAX_HEADER_SIZE", 2**16)
+HTTP_MAX_BODY_SIZE = env_int("HTTP_MAX_BODY_SIZE", 5 * 2**20)
+# larger bodies are sent with chunked transfer encoding
+HTTP_CHUNK_SIZE = env_int("HTTP_CHUNK_SIZE", 2**16)
+
+# Client
+# attempts to resume the session once the connection drops
+RECONNECT_ATTEMPTS = env_int("RECONNECT_ATTEMPTS", 5)
+RECONNECT_DELAY = env_float("RECONNECT_DELAY", 1.0)
+# notifications received before they are acknowledged with /received
+DELIVERY_ACK_INTERVAL = env_int("DELIVERY_ACK_INTERVAL", 32)
@@ -0,0 +1,133 @@
+"""
+Payload codecs negotiated per connection.
+
+Codecs are named after their wire format, so a peer encoding JSON with
+orjson talks to one using the stdlib json module. orjson and msgpack are
+optional: they are used when installed.
+"""
+import json
+from typing import Any, Optional
+import uuid
+
+from chat.exceptions import BadRequest
+from chat import settings
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover
+    msgpack = None
+
+# stands for a list of already encoded items in data given to Codec.splice;
+# random, so no string coming from users is taken for it
+PLACEHOLDER = f"<{uuid.uuid4().hex}>"
+
+
+class Codec:
+    name: str = ""
+
+    def encode(self, data: Any) -> bytes:
+        raise NotImplementedError
+
+    def decode(self, data: bytes) -> Any:
+        raise NotImplementedError
+
+    def encode_list(self, items: list[bytes]) -> bytes:
+        """
+        A list of items each encoded with this codec already.
+        """
+        raise NotImplementedError
+
+    def splice(self, data: Any, items: list[bytes]) -> bytes:
+        """
+        Encodes data holding PLACEHOLDER in place of the list of `items`,
+        without decoding or encoding the items again.
+        """
+        return self.encode(data).replace(
+            self.encode(PLACEHOLDER), self.encode_list(items), 1
+        )
+
+
+class JsonCodec(Codec):
+    name = "json"
+
+    def encode(self, data: Any) -> bytes:
+        return json.dumps(data, default=str).encode("utf-8")
+
+    def decode(self, data: bytes) -> Any:
+        try:
+            return json.loads(data)
+        except (json.decoder.JSONDecodeError, UnicodeDecodeError):
+            raise BadRequest
+
+    def encode_list(self, items: list[bytes]) -> bytes:
+        return b"[" + b",".join(items) + b"]"
+
+
+class OrjsonCodec(JsonCodec):
+    def encode(self, data: Any) -> bytes:
+        return orjson.dumps(
+            data, default=str, option=orjson.OPT_NON_STR_KEYS
+        )
+
+    def decode(self, data: bytes) -> Any:
+        try:
+            return orjson.loads(data)
+        except orjson.JSONDecodeError:
+            raise BadRequest
+
+
+class MsgpackCodec(Codec):
+    name = "msgpack"
+
+    def encode(self, data: Any) -> bytes:
+        return msgpack.packb(data, default=str, use_bin_type=True)
+
+    def decode(self, data: bytes) -> Any:
+        try:
+            return msgpack.unpackb(data, raw=False)
+        except (ValueError, msgpack.ExtraData, msgpack.FormatError):
+            raise BadRequest
+
+    def encode_list(self, items: list[bytes]) -> bytes:
+        header = msgpack.Packer().pack_array_header(len(items))
+        return header + b"".join(items)
+
+
+DEFAULT_CODEC = JsonCodec()
+
+
+def available_codecs() -> list[Codec]:
+    """
+    Codecs usable on this side, fastest first. CHAT_CODECS narrows the
+    list down, e.g. `CHAT_CODECS=json`.
+    """
+    codecs: list[Codec] = []
+
+    if orjson is not None:
+        codecs.append(OrjsonCodec())
+    if msgpack is not None:
+        codecs.append(MsgpackCodec())
+    if orjson is None:
+        codecs.append(DEFAULT_CODEC)
+
+    if settings.CODECS:
+        allowed = settings.CODECS.split(",")
+        codecs = [codec for codec in codecs if codec.name in allowed]
+
+    return codecs
+
+
+def choose_codec(offered: list[str]) -> Optional[Codec]:
+    """
+    Picks the first local codec the peer offered.
+    """
+    for codec in available_codecs():
+        if codec.name in offered:
+            return codec
+
+    return None
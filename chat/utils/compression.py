@@ -0,0 +1,66 @@
+"""
+Per-frame payload compression negotiated per connection.
+
+Every compressed frame is a self-contained raw deflate stream, so the same
+compressed bytes can be handed to any connection that negotiated deflate.
+"""
+import zlib
+from typing import Optional
+
+from chat.exceptions import ProtocolError
+from chat import settings
+
+
+class Deflate:
+    name = "deflate"
+
+    def __init__(
+        self,
+        level: int = settings.COMPRESSION_LEVEL,
+        threshold: int = settings.COMPRESSION_THRESHOLD,
+    ) -> None:
+        self.level = level
+        self.threshold = threshold
+
+    def compress(self, data: bytes) -> Optional[bytes]:
+        """
+        Returns None when the payload is below threshold or does not shrink.
+        """
+        if len(data) < self.threshold:
+            return None
+
+        compressor = zlib.compressobj(self.level, zlib.DEFLATED, -15)
+        compressed = compressor.compress(data) + compressor.flush()
+
+        if len(compressed) >= len(data):
+            return None
+
+        return compressed
+
+    def decompress(self, data: bytes, max_size: int) -> bytes:
+        decompressor = zlib.decompressobj(-15)
+
+        try:
+            result = decompressor.decompress(data, max_size)
+        except zlib.error:
+            raise ProtocolError
+
+        if decompressor.unconsumed_tail or not decompressor.eof:
+            raise ProtocolError
+
+        return result
+
+
+def available_compressions() -> list[Deflate]:
+    if not settings.COMPRESSION:
+        return []
+
+    return [Deflate()]
+
+
+def choose_compression(offered: list[str]) -> Optional[Deflate]:
+    for compression in available_compressions():
+        if compression.name in offered:
+            return compression
+
+    return None
@@ -0,0 +1,280 @@
+"""
+Minimal HTTP/1.1 on asyncio streams: keep-alive, pipelining, chunked
+request and response bodies.
+"""
+import asyncio
+from asyncio import (
+    StreamReader,
+    StreamWriter,
+    IncompleteReadError,
+    LimitOverrunError,
+)
+from dataclasses import dataclass, field
+from email.utils import formatdate
+from functools import lru_cache
+from http import HTTPStatus
+import re
+import time
+from typing import Optional
+from urllib.parse import unquote
+
+from chat.exceptions import HTTPError
+from chat import settings
+
+HEAD_END = b"\r\n\r\n"
+CRLF = b"\r\n"
+# int() would take signs, underscores and 0x prefixes too
+CONTENT_LENGTH = re.compile(r"[0-9]+")
+CHUNK_SIZE = re.compile(rb"[0-9A-Fa-f]+")
+
+STATUS_LINES = {
+    status.value: f"HTTP/1.1 {status.value} {status.phrase}\r\n".encode()
+    for status in HTTPStatus
+}
+
+
+@lru_cache(maxsize=1)
+def format_date(second: int) -> bytes:
+    return formatdate(second, usegmt=True).encode()
+
+
+def http_date() -> bytes:
+    # formatted once per second
+    return format_date(int(time.time()))
+
+
+def parse_query(query: str) -> dict[str, str]:
+    params = {}
+
+    for pair in query.split("&"):
+        if pair:
+            name, _, value = pair.partition("=")
+            params[unquote(name)] = unquote(value.replace("+", " "))
+
+    return params
+
+
+@dataclass
+class HTTPRequest:
+    method: str
+    path: str
+    version: str
+    query: dict[str, str] = field(default_factory=dict)
+    # header names are lower case
+    headers: dict[str, str] = field(default_factory=dict)
+    body: bytes = b""
+
+    @property
+    def keep_alive(self) -> bool:
+        connection = self.headers.get("connection", "").lower()
+
+        if self.version == "HTTP/1.0":
+            return "keep-alive" in connection
+
+        return "close" not in connection
+
+
+@dataclass
+class HTTPResponse:
+    status: int = 200
+    body: bytes = b""
+    content_type: bytes = b"application/json"
+    headers: dict[bytes, bytes] = field(default_factory=dict)
+    keep_alive: bool = True
+
+
+class HTTPConnection:
+    """
+    Reads requests and writes responses of one connection in order, so
+    pipelined requests are answered one after another. Requests queued
+    behind the current one stay in the reader buffer.
+    """
+
+    def __init__(
+        self,
+        reader: StreamReader,
+        writer: StreamWriter,
+        keepalive_timeout: float = settings.HTTP_KEEPALIVE_TIMEOUT,
+        max_body_size: int = settings.HTTP_MAX_BODY_SIZE,
+        chunk_size: int = settings.HTTP_CHUNK_SIZE,
+        high_water: int = settings.WRITE_HIGH_WATER,
+    ) -> None:
+        self.reader = reader
+        self.writer = writer
+        self.keepalive_timeout = keepalive_timeout
+        self.max_body_size = max_body_size
+        self.chunk_size = chunk_size
+        self.high_water = high_water
+
+        self.writer.transport.set_write_buffer_limits(high=high_water)
+
+    async def read_request(self) -> Optional[HTTPRequest]:
+        """
+        Returns None once the peer closed the connection (or stayed idle
+        for `keepalive_timeout`) between requests.
+        """
+        idle = asyncio.get_running_loop().call_later(
+            self.keepalive_timeout, self.writer.transport.close
+        )
+
+        try:
+            head = await self.reader.readuntil(HEAD_END)
+        except IncompleteReadError as ex:
+            if ex.partial.strip():
+                raise ConnectionResetError
+            return None
+        except LimitOverrunError:
+            raise HTTPError(HTTPStatus.REQUEST_HEADER_FIELDS_TOO_LARGE)
+        finally:
+            idle.cancel()
+
+        request = self.__parse_head(head)
+
+        try:
+            request.body = await self.__read_body(request)
+        except IncompleteReadError:
+            raise ConnectionResetError
+        except LimitOverrunError:
+            raise HTTPError(HTTPStatus.BAD_REQUEST)
+
+        return request
+
+    @staticmethod
+    def __parse_head(head: bytes) -> HTTPRequest:
+        # empty lines before a request line are ignored (RFC 9112, 2.2)
+        lines = head.lstrip(CRLF)[:-len(HEAD_END)].split(CRLF)
+
+        try:
+            method, target, version = lines[0].decode("latin-1").split(" ")
+        except ValueError:
+            raise HTTPError(HTTPStatus.BAD_REQUEST)
+
+        if version not in ("HTTP/1.1", "HTTP/1.0"):
+            raise HTTPError(HTTPStatus.HTTP_VERSION_NOT_SUPPORTED)
+
+        headers = {}
+        for line in lines[1:]:
+            name, sep, value = line.partition(b":")
+            if not sep:
+                raise HTTPError(HTTPStatus.BAD_REQUEST)
+
+            headers[name.strip().lower().decode("latin-1")] = (
+                value.strip().decode("latin-1")
+            )
+
+        path, _, query = target.partition("?")
+
+        return HTTPRequest(
+            method=method,
+            path=unquote(path),
+            version=version,
+            query=parse_query(query),
+            headers=headers,
+        )
+
+    async def __read_body(self, request: HTTPRequest) -> bytes:
+        headers = request.headers
+        chunked = "chunked" in headers.get("transfer-encoding", "").lower()
+
+        length = headers.get("content-length", "0")
+        if not CONTENT_LENGTH.fullmatch(length):
+            raise HTTPError(HTTPStatus.BAD_REQUEST)
+        length = int(length)
+
+        if not chunked and not length:
+            return b""
+
+        if length > self.max_body_size:
+            raise HTTPError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE)
+
+        if headers.get("expect", "").lower() == "100-continue":
+            self.writer.write(b"HTTP/1.1 100 Continue\r\n\r\n")
+
+        if chunked:
+            return await self.__read_chunked()
+
+        return await self.reader.readexactly(length)
+
+    async def __read_chunked(self) -> bytes:
+        body = bytearray()
+
+        while True:
+            line = await self.reader.readuntil(CRLF)
+
+            size = line.split(b";", 1)[0].strip()
+            if not CHUNK_SIZE.fullmatch(size):
+                raise HTTPError(HTTPStatus.BAD_REQUEST)
+            size = int(size, 16)
+
+            if not size:
+                break
+
+            if len(body) + size > self.max_body_size:
+                raise HTTPError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE)
+
+            body += await self.reader.readexactly(size)
+
+            if await self.reader.readexactly(len(CRLF)) != CRLF:
+                raise HTTPError(HTTPStatus.BAD_REQUEST)
+
+        # trailer fields are skipped
+        while await self.reader.readuntil(CRLF) != CRLF:
+            pass
+
+        return bytes(body)
+
+    async def write_response(
+        self, response: HTTPResponse, version: str = "HTTP/1.1"
+    ) -> None:
+        """
+        Bodies over `chunk_size` go out chunked (HTTP/1.1 only), waiting
+        for the peer between chunks; everything else is a single write.
+        """
+        head = [
+            STATUS_LINES[response.status],
+            b"Date: ", http_date(), CRLF,
+            b"Content-Type: ", response.content_type, CRLF,
+        ]
+        for name, value in response.headers.items():
+            head += [name, b": ", value, CRLF]
+
+        if not response.keep_alive:
+            head.append(b"Connection: close\r\n")
+        elif version == "HTTP/1.0":
+            head.append(b"Connection: keep-alive\r\n")
+
+        body = memoryview(response.body)
+
+        if len(body) <= self.chunk_size or version == "HTTP/1.0":
+            head.append(b"Content-Length: %d\r\n\r\n" % len(body))
+            self.writer.writelines((b"".join(head), body))
+            await self.drain()
+            return
+
+        head.append(b"Transfer-Encoding: chunked\r\n\r\n")
+        self.writer.write(b"".join(head))
+
+        for start in range(0, len(body), self.chunk_size):
+            chunk = body[start:start + self.chunk_size]
+            self.writer.writelines((b"%x\r\n" % len(chunk), chunk, CRLF))
+            await self.drain()
+
+        self.writer.write(b"0\r\n\r\n")
+        await self.drain()
+
+    async def drain(self) -> None:
+        transport = self.writer.transport
+
+        if transport.is_closing():
+            raise ConnectionResetError
+
+        if transport.get_write_buffer_size() > self.high_water:
+            await self.writer.drain()
+
+    async def close(self) -> None:
+        self.writer.close()
+
+        try:
+            await self.writer.wait_closed()
+        except (ConnectionResetError, BrokenPipeError):
+            pass
@@ -1,11 +1,57 @@
-from asyncio import StreamReader, StreamWriter
-import json
+from asyncio import StreamReader, StreamWriter, IncompleteReadError
+from enum import IntEnum
+import struct
+from typing import Iterable, Optional
 
-from chat.exceptions import BadRequest
+from chat.command_types import CommandType
+from chat.exceptions import BadRequest, ProtocolError
+from chat.utils.outbound import OutboundQueue, Frame, Priority
+from chat.utils.replay import ReplayBuffer
+from chat.utils.codecs import (
+    Codec,
+    DEFAULT_CODEC,
+    available_codecs,
+    choose_codec,
+)
+from chat.utils.compression import (
+    Deflate,
+    available_compressions,
+    choose_compression,
+)
+from chat import settings
 
-CHUNK_SIZE = 1024
+CHUNK_SIZE = settings.READ_CHUNK_SIZE
 END_SIGNAL = b"10101101110111110"
 
+# version, frame type, flags, payload length
+FRAME_HEADER = struct.Struct("!BBBI")
+MAX_FRAME_SIZE = 2**24
+
+FLAG_DEFLATE = 0x01
+
+
+class Framing(IntEnum):
+    """
+    Wire format versions; the highest one known to both sides is
+    negotiated at connect, sentinel framing is used until then.
+    """
+    sentinel = 1
+    length_prefixed = 2
+    # RFC 6455 frames, chosen by an HTTP upgrade instead of /handshake
+    websocket = 3
+
+
+class FrameType(IntEnum):
+    json = 1
+    binary = 2
+
+
+def supported_framings() -> list[Framing]:
+    if settings.LEGACY_FRAMING:
+        return [Framing.sentinel]
+
+    return [Framing.length_prefixed, Framing.sentinel]
+
 
 class WSResponse:
     def __init__(
@@ -14,45 +60,307 @@ class WSResponse:
         writer: StreamWriter,
         chunk_size: int = CHUNK_SIZE,
         end_signal: bytes = END_SIGNAL,
+        high_water: int = settings.WRITE_HIGH_WATER,
     ) -> None:
         self.reader = reader
         self.writer = writer
         self.end_signal = end_signal
         self.chunk_size = chunk_size
+        self.high_water = high_water
+        self.framing = Framing.sentinel
+        self.codec: Codec = DEFAULT_CODEC
+        self.compression: Optional[Deflate] = None
+        # numbers and keeps sent notifications when the session is resumable
+        self.journal: Optional[ReplayBuffer] = None
+
+        self.writer.transport.set_write_buffer_limits(high=high_water)
+        self.outbound = OutboundQueue(
+            write=self.writer.writelines,
+            drain=self.drain,
+            evict=self.writer.transport.abort,
+        )
+
+        self.__buffer = bytearray()
+        self.__early: Optional[dict] = None
+
+    @property
+    def stats(self):
+        return self.outbound.stats
+
+    @property
+    def wire_format(self) -> tuple:
+        """
+        Connections with equal wire formats get identical frames for the
+        same payload, so a broadcast encodes once per format.
+        """
+        compression = None
+        if self.compression is not None:
+            compression = (
+                self.compression.name,
+                self.compression.level,
+                self.compression.threshold,
+            )
+
+        return (type(self), self.framing, self.codec.name, compression)
+
+    async def handshake(
+        self,
+        framings: list[Framing] = None,
+        codecs: list[Codec] = None,
+        compressions: list[Deflate] = None,
+    ) -> Framing:
+        """
+        Client side of the negotiation: offers framings, codecs and
+        compressions, switches to the ones chosen by server.
+        """
+        if framings is None:
+            framings = supported_framings()
+        if codecs is None:
+            codecs = available_codecs()
+        if compressions is None:
+            compressions = available_compressions()
 
-    async def receive_bytes(self):
-        data: bytes = b""
+        await self.send_json({
+            "command": CommandType.handshake,
+            "framing": [int(framing) for framing in framings],
+            "codecs": [codec.name for codec in codecs],
+            "compression": [compression.name for compression in compressions],
+        })
+        reply = await self.receive_json()
+
+        try:
+            self.framing = Framing(reply["framing"])
+            self.codec = next(
+                codec for codec in codecs if codec.name == reply["codec"]
+            )
+            self.compression = next(
+                (
+                    compression
+                    for compression in compressions
+                    if compression.name == reply.get("compression")
+                ),
+                None,
+            )
+        except (KeyError, ValueError, StopIteration):
+            raise ProtocolError
+
+        return self.framing
+
+    async def accept(self, framings: list[Framing] = None) -> Framing:
+        """
+        Server side of the negotiation. A peer that starts with a regular
+        command is treated as a legacy one and stays on sentinel framing.
+        """
+        if framings is None:
+            framings = supported_framings()
+
+        message = await self.receive_json()
+
+        if message.get("command") != CommandType.handshake:
+            self.__early = message
+            return self.framing
+
+        offered = message.get("framing", [])
+        chosen = max(
+            (framing for framing in framings if framing in offered),
+            default=Framing.sentinel,
+        )
+        codec = choose_codec(message.get("codecs", [])) or DEFAULT_CODEC
+        compression = None
+        if chosen == Framing.length_prefixed:
+            compression = choose_compression(message.get("compression", []))
+
+        await self.send_json({
+            "action": CommandType.handshake,
+            "framing": int(chosen),
+            "codec": codec.name,
+            "compression": compression.name if compression else None,
+        })
+        self.framing = chosen
+        self.codec = codec
+        self.compression = compression
+
+        return self.framing
+
+    async def __read_sentinel_frame(self) -> bytes:
+        start = 0
 
         while True:
+            end = self.__buffer.find(self.end_signal, start)
+            if end != -1:
+                data = bytes(self.__buffer[:end])
+                del self.__buffer[:end + len(self.end_signal)]
+                return data
+
+            start = max(0, len(self.__buffer) - len(self.end_signal) + 1)
+
             chunk = await self.reader.read(
                 self.chunk_size + len(self.end_signal)
             )
-            data += chunk
+            if not chunk:
+                raise ConnectionResetError
 
-            if data[-1 * len(self.end_signal):] == self.end_signal:
-                return data[: -1 * len(self.end_signal)]
+            self.__buffer += chunk
 
-    async def receive_json(self):
+    async def __readexactly(self, n: int) -> bytes:
+        # frames read along with the handshake reply are left in the buffer
+        if not self.__buffer:
+            return await self.reader.readexactly(n)
+
+        data = bytes(self.__buffer[:n])
+        del self.__buffer[:n]
+
+        if len(data) < n:
+            data += await self.reader.readexactly(n - len(data))
+
+        return data
+
+    async def __read_frame(self) -> tuple[FrameType, bytes]:
         try:
-            return json.loads(await self.receive_bytes())
-        except json.decoder.JSONDecodeError:
+            header = await self.__readexactly(FRAME_HEADER.size)
+            version, frame_type, flags, length = FRAME_HEADER.unpack(header)
+
+            if version != Framing.length_prefixed or length > MAX_FRAME_SIZE:
+                raise ProtocolError
+
+            data = await self.__readexactly(length)
+        except IncompleteReadError:
+            raise ConnectionResetError
+
+        if flags & FLAG_DEFLATE:
+            if self.compression is None:
+                raise ProtocolError
+
+            data = self.compression.decompress(data, MAX_FRAME_SIZE)
+
+        try:
+            return FrameType(frame_type), data
+        except ValueError:
+            raise ProtocolError
+
+    async def receive_frame(self) -> tuple[FrameType, bytes]:
+        if self.framing == Framing.sentinel:
+            return FrameType.binary, await self.__read_sentinel_frame()
+
+        return await self.__read_frame()
+
+    async def receive_bytes(self) -> bytes:
+        _, data = await self.receive_frame()
+        return data
+
+    async def receive_json(self):
+        if self.__early is not None:
+            message, self.__early = self.__early, None
+            return message
+
+        frame_type, data = await self.receive_frame()
+
+        if self.framing != Framing.sentinel and frame_type != FrameType.json:
             raise BadRequest
 
-    async def send_bytes(self, data: bytes):
+        return self.codec.decode(data)
+
+    def encode_frame(
+        self, data: bytes, frame_type: FrameType = FrameType.binary
+    ) -> Frame:
+        """
+        Returns the whole frame as buffers for a single writelines call;
+        the payload is wrapped in a memoryview, so it is not copied here.
+        """
+        if self.framing == Framing.length_prefixed:
+            flags = 0
+
+            if self.compression is not None:
+                compressed = self.compression.compress(data)
+                if compressed is not None:
+                    data, flags = compressed, FLAG_DEFLATE
 
-        for i in range(0, int(len(data) / self.chunk_size) + 1):
-            self.writer.write(
-                data[i * self.chunk_size: (i + 1) * self.chunk_size]
+            return (
+                FRAME_HEADER.pack(self.framing, frame_type, flags, len(data)),
+                memoryview(data),
             )
+
+        return (memoryview(data), self.end_signal)
+
+    async def drain(self) -> None:
+        transport = self.writer.transport
+
+        if transport.is_closing():
+            raise ConnectionResetError
+
+        if transport.get_write_buffer_size() > self.high_water:
             await self.writer.drain()
 
-        self.writer.write(self.end_signal)
-        await self.writer.drain()
+    async def send_bytes(
+        self,
+        data: bytes,
+        frame_type: FrameType = FrameType.binary,
+        priority: Priority = Priority.normal,
+    ) -> bool:
+        """
+        Queues the frame for the writer task. Returns False if it was
+        dropped because the peer does not keep up.
+        """
+        return await self.send_frame(
+            self.encode_frame(data, frame_type=frame_type), priority=priority
+        )
+
+    async def send_frame(
+        self, frame: Frame, priority: Priority = Priority.normal
+    ) -> bool:
+        """
+        Queues an encoded frame as is; its buffers may be shared with
+        other connections and must not be modified.
+        """
+        return await self.outbound.put(frame, priority=priority)
+
+    async def send_encoded(
+        self,
+        body: bytes,
+        frame: Optional[Frame] = None,
+        priority: Priority = Priority.normal,
+    ) -> bool:
+        """
+        Queues a notification encoded with the session codec, `frame` is
+        its frame when shared by several sessions. Queued notifications are
+        recorded in the journal.
+        """
+        if frame is None:
+            frame = self.encode_frame(body, frame_type=FrameType.json)
+
+        queued = await self.send_frame(frame, priority=priority)
+
+        # nothing is awaited between queueing and numbering, so numbers
+        # follow the queue order
+        if queued and self.journal is not None:
+            self.journal.append(body)
+
+        return queued
+
+    def resend(self, bodies: Iterable[bytes]) -> None:
+        """
+        Queues encoded notifications at once, nothing sent concurrently
+        gets in between; they are not recorded in the journal.
+        """
+        for body in bodies:
+            self.outbound.put_nowait(
+                self.encode_frame(body, frame_type=FrameType.json)
+            )
 
-    async def send_json(self, data: dict):
-        bdata = json.dumps(data).encode("utf-8")
-        await self.send_bytes(bdata)
+    async def send_json(
+        self, data: dict, priority: Priority = Priority.normal
+    ) -> bool:
+        return await self.send_encoded(
+            self.codec.encode(data), priority=priority
+        )
 
     async def close(self):
+        await self.outbound.flush(timeout=settings.SLOW_CONSUMER_TIMEOUT)
+        self.outbound.close()
+
         self.writer.close()
-        await self.writer.wait_closed()
+
+        try:
+            await self.writer.wait_closed()
+        except (ConnectionResetError, BrokenPipeError):
+            pass
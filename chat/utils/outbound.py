@@ -0,0 +1,198 @@
+import asyncio
+from collections import deque
+from dataclasses import dataclass
+from enum import Enum, IntEnum
+import logging
+from typing import Awaitable, Callable, Optional, Sequence
+
+from chat import settings
+
+logger = logging.getLogger(__name__)
+
+Frame = Sequence[bytes]
+
+
+class Priority(IntEnum):
+    low = 0
+    normal = 1
+
+
+class OverflowPolicy(str, Enum):
+    """
+    drop -- low priority frames are dropped while the queue is congested;
+    disconnect -- same, and a consumer that stays congested for
+    `slow_consumer_timeout` seconds is evicted.
+    """
+    drop = "drop"
+    disconnect = "disconnect"
+
+
+@dataclass
+class QueueStats:
+    depth: int = 0
+    max_depth: int = 0
+    sent: int = 0
+    dropped: int = 0
+    congested: bool = False
+    evicted: bool = False
+
+
+class OutboundQueue:
+    """
+    Bounded per-connection queue of encoded frames drained by a dedicated
+    writer task, so a slow peer never stalls the coroutine sending to it.
+
+    Past `high_water` frames the queue is congested until it drains below
+    `low_water`. Normal priority frames wait for room once `size` frames
+    are queued.
+    """
+
+    def __init__(
+        self,
+        write: Callable[[Frame], None],
+        drain: Callable[[], Awaitable[None]],
+        evict: Callable[[], None],
+        size: int = settings.OUTBOUND_QUEUE_SIZE,
+        high_water: int = settings.OUTBOUND_HIGH_WATER,
+        low_water: int = settings.OUTBOUND_LOW_WATER,
+        policy: OverflowPolicy = OverflowPolicy(settings.OUTBOUND_POLICY),
+        slow_consumer_timeout: float = settings.SLOW_CONSUMER_TIMEOUT,
+    ) -> None:
+        self.write = write
+        self.drain = drain
+        self.evict = evict
+
+        self.size = size
+        self.high_water = high_water
+        self.low_water = low_water
+        self.policy = policy
+        self.slow_consumer_timeout = slow_consumer_timeout
+
+        self.stats = QueueStats()
+        self.closed = False
+
+        self.__queue: deque[Frame] = deque()
+        self.__wakeup = asyncio.Event()
+        self.__space = asyncio.Event()
+        self.__idle = asyncio.Event()
+        self.__idle.set()
+
+        self.__task: Optional[asyncio.Task] = None
+        self.__eviction: Optional[asyncio.TimerHandle] = None
+
+    def __len__(self) -> int:
+        return len(self.__queue)
+
+    async def put(
+        self, frame: Frame, priority: Priority = Priority.normal
+    ) -> bool:
+        """
+        Returns False if the frame was dropped.
+        """
+        if self.closed:
+            raise ConnectionResetError
+
+        if self.stats.congested and priority == Priority.low:
+            self.stats.dropped += 1
+            return False
+
+        while len(self.__queue) >= self.size:
+            self.__space.clear()
+            await self.__space.wait()
+
+            if self.closed:
+                raise ConnectionResetError
+
+        self.put_nowait(frame)
+        return True
+
+    def put_nowait(self, frame: Frame) -> None:
+        """
+        Queues the frame even past `size`; for a bounded batch that must
+        not be interleaved with frames sent concurrently.
+        """
+        if self.closed:
+            raise ConnectionResetError
+
+        self.__queue.append(frame)
+        self.__idle.clear()
+        self.__update_depth()
+
+        if self.__task is None:
+            self.__task = asyncio.ensure_future(self.__run())
+
+        self.__wakeup.set()
+
+    async def flush(self, timeout: Optional[float] = None) -> None:
+        try:
+            await asyncio.wait_for(self.__idle.wait(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning(
+                f"Outbound queue not flushed, {len(self)} frames left."
+            )
+
+    def close(self) -> None:
+        self.closed = True
+        self.__queue.clear()
+        self.__update_depth()
+
+        self.__idle.set()
+        self.__space.set()
+
+        if self.__eviction is not None:
+            self.__eviction.cancel()
+
+        if self.__task is not None:
+            self.__task.cancel()
+
+    def __update_depth(self) -> None:
+        depth = len(self.__queue)
+
+        self.stats.depth = depth
+        self.stats.max_depth = max(self.stats.max_depth, depth)
+
+        if not self.stats.congested and depth >= self.high_water:
+            self.stats.congested = True
+
+            if self.policy == OverflowPolicy.disconnect:
+                self.__eviction = asyncio.get_running_loop().call_later(
+                    self.slow_consumer_timeout, self.__evict
+                )
+
+        elif self.stats.congested and depth <= self.low_water:
+            self.stats.congested = False
+
+            if self.__eviction is not None:
+                self.__eviction.cancel()
+                self.__eviction = None
+
+    def __evict(self) -> None:
+        logger.warning(
+            f"Evicting slow consumer, {len(self)} frames queued for "
+            f"{self.slow_consumer_timeout} seconds."
+        )
+        self.stats.evicted = True
+        self.close()
+        self.evict()
+
+    async def __run(self) -> None:
+        try:
+            while True:
+                while not self.__queue:
+                    self.__idle.set()
+                    self.__wakeup.clear()
+                    await self.__wakeup.wait()
+
+                # drain() only suspends once the transport buffer is past
+                # its high water mark, so queued frames go out in a batch
+                while self.__queue:
+                    self.write(self.__queue.popleft())
+                    self.stats.sent += 1
+
+                    self.__update_depth()
+                    self.__space.set()
+
+                    await self.drain()
+
+        except (ConnectionResetError, BrokenPipeError):
+            self.close()
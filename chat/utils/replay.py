@@ -0,0 +1,69 @@
+from collections import deque
+from itertools import islice
+from typing import Callable, Optional
+
+from chat import settings
+
+
+class ReplayBuffer:
+    """
+    Numbers the notifications queued on a session (from 1, in queue order,
+    so the peer numbers them the same way by counting) and keeps the latest
+    ones, up to `budget` bytes of encoded payloads, to send them again
+    after a reconnect.
+    """
+
+    def __init__(self, budget: int = settings.REPLAY_BUFFER_SIZE) -> None:
+        self.budget = budget
+        # number of the last notification
+        self.seq = 0
+        self.size = 0
+
+        self.__entries: deque[bytes] = deque()
+
+    def __len__(self) -> int:
+        return len(self.__entries)
+
+    @property
+    def first_seq(self) -> int:
+        """
+        Number of the oldest notification kept.
+        """
+        return self.seq - len(self.__entries) + 1
+
+    def append(self, body: bytes) -> int:
+        self.seq += 1
+        self.__entries.append(body)
+        self.size += len(body)
+
+        while self.size > self.budget:
+            self.size -= len(self.__entries.popleft())
+
+        return self.seq
+
+    def ack(self, seq: int) -> None:
+        """
+        Forgets notifications up to `seq`, the peer has got them.
+        """
+        for _ in range(min(seq, self.seq) - self.first_seq + 1):
+            self.size -= len(self.__entries.popleft())
+
+    def since(self, seq: int) -> Optional[list[bytes]]:
+        """
+        Notifications following `seq`; None if some of them are not kept
+        anymore.
+        """
+        if seq < self.first_seq - 1 or seq > self.seq:
+            return None
+
+        return list(islice(self.__entries, seq - self.first_seq + 1, None))
+
+    def recode(self, recode: Callable[[bytes], bytes]) -> None:
+        """
+        Re-encodes the payloads, when the session resumes with another codec.
+        """
+        self.__entries = deque(recode(body) for body in self.__entries)
+        self.size = sum(len(body) for body in self.__entries)
+
+        while self.size > self.budget:
+            self.size -= len(self.__entries.popleft())
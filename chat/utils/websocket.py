@@ -0,0 +1,420 @@
+"""
+RFC 6455 WebSocket transport with the WSResponse interface, so sessions
+run the same way over it as over the custom protocol. Text frames carry
+JSON commands and notifications, binary frames carry files.
+"""
+import asyncio
+from asyncio import StreamReader, StreamWriter, IncompleteReadError
+from base64 import b64encode
+import hashlib
+import logging
+import os
+import struct
+from typing import Optional
+
+from chat.exceptions import BadRequest, HTTPError, ProtocolError
+from chat.utils.my_response import (
+    WSResponse,
+    Framing,
+    FrameType,
+    MAX_FRAME_SIZE,
+)
+from chat.utils.codecs import Codec, DEFAULT_CODEC, choose_codec
+from chat.utils.compression import Deflate
+from chat.utils.http_protocol import HTTPConnection, HTTPRequest, HEAD_END
+from chat.utils.outbound import Frame, Priority
+from chat import settings
+
+logger = logging.getLogger(__name__)
+
+GUID = b"258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+
+OP_CONTINUATION = 0x0
+OP_TEXT = 0x1
+OP_BINARY = 0x2
+OP_CLOSE = 0x8
+OP_PING = 0x9
+OP_PONG = 0xA
+
+CLOSE_NORMAL = 1000
+CLOSE_PROTOCOL_ERROR = 1002
+CLOSE_TOO_BIG = 1009
+
+FIN = 0x80
+MASKED = 0x80
+MAX_CONTROL_PAYLOAD = 125
+
+U16 = struct.Struct("!H")
+U64 = struct.Struct("!Q")
+CLOSE_CODE = struct.Struct("!H")
+
+# short payloads are XORed as one integer, longer ones lane by lane with
+# bytes.translate, see benchmarks/bench_websocket.py
+MASK_TRANSLATE_FROM = 512
+XOR_TABLES = [bytes(b ^ key for b in range(256)) for key in range(256)]
+
+
+def apply_mask(data: bytes, mask: bytes) -> bytes:
+    """
+    XORs data with the 4 byte masking key, masking and unmasking alike.
+    """
+    length = len(data)
+
+    if length < MASK_TRANSLATE_FROM:
+        key = mask * (length // 4) + mask[:length % 4]
+        return (
+            int.from_bytes(data, "big") ^ int.from_bytes(key, "big")
+        ).to_bytes(length, "big")
+
+    # every 4th byte is XORed with the same key byte
+    result = bytearray(data)
+    for lane in range(4):
+        result[lane::4] = result[lane::4].translate(XOR_TABLES[mask[lane]])
+
+    return bytes(result)
+
+
+def accept_key(key: str) -> str:
+    return b64encode(hashlib.sha1(key.encode() + GUID).digest()).decode()
+
+
+def frame_header(opcode: int, length: int, fin: bool = True) -> bytearray:
+    header = bytearray((opcode | (FIN if fin else 0),))
+
+    if length < 126:
+        header.append(length)
+    elif length < 2**16:
+        header.append(126)
+        header += U16.pack(length)
+    else:
+        header.append(127)
+        header += U64.pack(length)
+
+    return header
+
+
+class WebSocketResponse(WSResponse):
+    """
+    Server side is set up by accept() from an HTTP upgrade request (read
+    off the stream or, when already parsed by the HTTP front end, passed
+    in as `request`); client side by handshake(). Client frames are
+    masked, server ones are not.
+    """
+
+    def __init__(
+        self,
+        reader: StreamReader,
+        writer: StreamWriter,
+        request: Optional[HTTPRequest] = None,
+        client: bool = False,
+        fragment_size: int = settings.WS_FRAGMENT_SIZE,
+        ping_interval: float = settings.WS_PING_INTERVAL,
+        **kwargs,
+    ) -> None:
+        super().__init__(reader=reader, writer=writer, **kwargs)
+
+        self.framing = Framing.websocket
+        self.request = request
+        self.client = client
+        self.fragment_size = fragment_size
+        self.ping_interval = ping_interval
+
+        # set once the upgrade is done, control frames are sent only then
+        self.__open = False
+        self.__close_sent = False
+        self.__pong_received = True
+        self.__heartbeat: Optional[asyncio.Task] = None
+
+    async def handshake(
+        self,
+        framings: list[Framing] = None,
+        codecs: list[Codec] = None,
+        compressions: list[Deflate] = None,
+        path: str = settings.WS_PATH,
+    ) -> Framing:
+        """
+        Client side of the upgrade. Only JSON goes over text frames, so
+        out of `codecs` the json one is used.
+        """
+        key = b64encode(os.urandom(16)).decode()
+        peer = self.writer.get_extra_info("peername")
+        host = "localhost"
+        if isinstance(peer, tuple):
+            host = f"{peer[0]}:{peer[1]}"
+
+        self.writer.write((
+            f"GET {path} HTTP/1.1\r\n"
+            f"Host: {host}\r\n"
+            "Upgrade: websocket\r\n"
+            "Connection: Upgrade\r\n"
+            f"Sec-WebSocket-Key: {key}\r\n"
+            "Sec-WebSocket-Version: 13\r\n\r\n"
+        ).encode())
+
+        try:
+            head = await self.reader.readuntil(HEAD_END)
+        except IncompleteReadError:
+            raise ConnectionResetError
+
+        lines = head.decode("latin-1").split("\r\n")
+        headers = {
+            name.strip().lower(): value.strip()
+            for name, _, value in (line.partition(":") for line in lines[1:])
+        }
+
+        if (
+            lines[0].split(" ")[1:2] != ["101"]
+            or headers.get("sec-websocket-accept") != accept_key(key)
+        ):
+            raise ProtocolError
+
+        self.codec = next(
+            (codec for codec in codecs or [] if codec.name == "json"),
+            DEFAULT_CODEC,
+        )
+        self.client = True
+        self.__open = True
+
+        return self.framing
+
+    async def accept(self, framings: list[Framing] = None) -> Framing:
+        request = self.request
+
+        if request is None:
+            connection = HTTPConnection(reader=self.reader, writer=self.writer)
+
+            try:
+                request = await connection.read_request()
+            except HTTPError:
+                raise BadRequest
+
+            if request is None:
+                raise ConnectionResetError
+
+        headers = request.headers
+        key = headers.get("sec-websocket-key")
+
+        if (
+            request.method != "GET"
+            or headers.get("upgrade", "").lower() != "websocket"
+            or "upgrade" not in headers.get("connection", "").lower()
+            or headers.get("sec-websocket-version") != "13"
+            or not key
+        ):
+            self.writer.write(
+                b"HTTP/1.1 400 Bad Request\r\n"
+                b"Sec-WebSocket-Version: 13\r\n"
+                b"Content-Length: 0\r\n\r\n"
+            )
+            raise BadRequest
+
+        self.writer.write((
+            "HTTP/1.1 101 Switching Protocols\r\n"
+            "Upgrade: websocket\r\n"
+            "Connection: Upgrade\r\n"
+            f"Sec-WebSocket-Accept: {accept_key(key)}\r\n\r\n"
+        ).encode())
+
+        self.codec = choose_codec(["json"]) or DEFAULT_CODEC
+        self.__open = True
+
+        if self.ping_interval > 0:
+            self.__heartbeat = asyncio.ensure_future(self.__ping_loop())
+
+        return self.framing
+
+    async def __read_frame(self) -> tuple[int, bool, bytes]:
+        try:
+            first, second = await self.reader.readexactly(2)
+
+            fin = bool(first & FIN)
+            opcode = first & 0x0F
+            length = second & 0x7F
+
+            # no extensions are negotiated, so RSV bits must be clear
+            if first & 0x70 or bool(second & MASKED) == self.client:
+                raise ProtocolError
+
+            if length == 126:
+                length, = U16.unpack(await self.reader.readexactly(2))
+            elif length == 127:
+                length, = U64.unpack(await self.reader.readexactly(8))
+
+            if opcode >= OP_CLOSE and (
+                not fin or length > MAX_CONTROL_PAYLOAD
+            ):
+                raise ProtocolError
+
+            if length > MAX_FRAME_SIZE:
+                await self.__fail(CLOSE_TOO_BIG)
+                raise ProtocolError
+
+            mask = None if self.client else await self.reader.readexactly(4)
+            payload = await self.reader.readexactly(length)
+        except IncompleteReadError:
+            raise ConnectionResetError
+
+        if mask is not None:
+            payload = apply_mask(payload, mask)
+
+        return opcode, fin, payload
+
+    async def __read_message(self) -> tuple[int, bytes]:
+        """
+        Reassembles fragmented messages, handles control frames that
+        arrive in between.
+        """
+        opcode: Optional[int] = None
+        fragments: list[bytes] = []
+        size = 0
+
+        while True:
+            frame_opcode, fin, payload = await self.__read_frame()
+
+            if frame_opcode >= OP_CLOSE:
+                await self.__control(frame_opcode, payload)
+                continue
+
+            if (frame_opcode == OP_CONTINUATION) == (opcode is None):
+                raise ProtocolError
+
+            if frame_opcode not in (OP_CONTINUATION, OP_TEXT, OP_BINARY):
+                raise ProtocolError
+
+            if opcode is None:
+                opcode = frame_opcode
+
+            size += len(payload)
+            if size > MAX_FRAME_SIZE:
+                await self.__fail(CLOSE_TOO_BIG)
+                raise ProtocolError
+
+            fragments.append(payload)
+
+            if fin:
+                if len(fragments) == 1:
+                    return opcode, payload
+
+                return opcode, b"".join(fragments)
+
+    async def __control(self, opcode: int, payload: bytes) -> None:
+        if opcode == OP_PING:
+            await self.__send_control(OP_PONG, payload)
+
+        elif opcode == OP_PONG:
+            self.__pong_received = True
+
+        elif opcode == OP_CLOSE:
+            code = CLOSE_NORMAL
+            if len(payload) >= CLOSE_CODE.size:
+                code, = CLOSE_CODE.unpack_from(payload)
+
+            logger.debug(f"Close frame received, code {code}.")
+            await self.__send_close(code)
+            raise ConnectionResetError
+
+        else:
+            raise ProtocolError
+
+    async def receive_frame(self) -> tuple[FrameType, bytes]:
+        try:
+            opcode, data = await self.__read_message()
+        except ProtocolError:
+            await self.__fail(CLOSE_PROTOCOL_ERROR)
+            raise
+
+        if opcode == OP_TEXT:
+            return FrameType.json, data
+
+        return FrameType.binary, data
+
+    def __encode(self, opcode: int, data: bytes, fin: bool = True) -> Frame:
+        header = frame_header(opcode, len(data), fin=fin)
+
+        if not self.client:
+            return (bytes(header), memoryview(data))
+
+        mask = os.urandom(4)
+        header[1] |= MASKED
+
+        return (bytes(header) + mask, apply_mask(data, mask))
+
+    def encode_frame(
+        self, data: bytes, frame_type: FrameType = FrameType.binary
+    ) -> Frame:
+        """
+        Messages over `fragment_size` are split into fragments; all of them
+        still go out with a single writelines call.
+        """
+        opcode = OP_TEXT if frame_type == FrameType.json else OP_BINARY
+
+        if len(data) <= self.fragment_size:
+            return self.__encode(opcode, data)
+
+        view = memoryview(data)
+        buffers: list[bytes] = []
+
+        for start in range(0, len(data), self.fragment_size):
+            end = start + self.fragment_size
+            buffers += self.__encode(
+                opcode if not start else OP_CONTINUATION,
+                view[start:end],
+                fin=end >= len(data),
+            )
+
+        return buffers
+
+    @property
+    def wire_format(self) -> tuple:
+        return super().wire_format + (self.client, self.fragment_size)
+
+    async def send_frame(
+        self, frame: Frame, priority: Priority = Priority.normal
+    ) -> bool:
+        # nothing may follow a close frame
+        if self.__close_sent:
+            return False
+
+        return await super().send_frame(frame, priority=priority)
+
+    async def ping(self, payload: bytes = b"") -> None:
+        self.__pong_received = False
+        await self.__send_control(OP_PING, payload)
+
+    async def __ping_loop(self) -> None:
+        try:
+            while True:
+                await asyncio.sleep(self.ping_interval)
+
+                if not self.__pong_received:
+                    logger.warning("No pong in time, dropping connection.")
+                    self.writer.transport.abort()
+                    return
+
+                await self.ping()
+        except ConnectionResetError:
+            pass
+
+    async def __send_control(self, opcode: int, payload: bytes) -> None:
+        if not self.__close_sent:
+            await self.outbound.put(self.__encode(opcode, payload))
+
+    async def __send_close(self, code: int) -> None:
+        if not self.__open or self.__close_sent:
+            return
+
+        await self.__send_control(OP_CLOSE, CLOSE_CODE.pack(code))
+        self.__close_sent = True
+
+    async def __fail(self, code: int) -> None:
+        try:
+            await self.__send_close(code)
+        except ConnectionResetError:
+            pass
+
+    async def close(self, code: int = CLOSE_NORMAL):
+        if self.__heartbeat is not None:
+            self.__heartbeat.cancel()
+
+        await self.__fail(code)
+        await super().close()
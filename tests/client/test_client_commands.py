@@ -1,10 +1,13 @@
 import aiounittest
-from unittest.mock import MagicMock
+from unittest.mock import ANY, MagicMock
 
 from chat.utils.async_mock import AsyncMock
 from chat.client.client_commands import (
     SendCommand,
     HistoryCommand,
+    SearchCommand,
+    UnreadCommand,
+    AckCommand,
     CreateRoomCommand,
     JoinRoomCommand,
     AddUserCommand,
@@ -23,6 +26,7 @@ from chat.command_types import CommandType
 from chat.requests_examples import (
     SendRequests,
     HistoryRequests,
+    UnreadRequests,
     CreateOpenRoomRequests,
     JoinOpenRequests,
     RestrictedRoomRequests,
@@ -93,6 +97,60 @@ class TestClientCommands(aiounittest.AsyncTestCase):
             HistoryRequests.USER_DEFAULT_JSON_REQ.value
         ))
 
+        await HistoryCommand().run(
+            ws=self.mock_ws,
+            command=CommandType.history,
+            content="2 Global before 10",
+        )
+        self.mock_ws.send_json.assert_called_with({
+            **HistoryRequests.JSON_REQ.value,
+            "notification_count": 2,
+            "before_id": 10,
+        })
+
+    async def test_unread(self):
+        await UnreadCommand().run(
+            ws=self.mock_ws,
+            command=CommandType.unread,
+            content=UnreadRequests.COMMAND.value
+        )
+        self.mock_ws.send_json.assert_called_with(
+            UnreadRequests.JSON_REQ.value
+        )
+
+        await UnreadCommand().run(
+            ws=self.mock_ws,
+            command=CommandType.unread,
+            content=UnreadRequests.ROOMS_COMMAND.value
+        )
+        self.mock_ws.send_json.assert_called_with(
+            UnreadRequests.ROOMS_JSON_REQ.value
+        )
+
+        await AckCommand().run(
+            ws=self.mock_ws,
+            command=CommandType.ack,
+            content=UnreadRequests.ACK_COMMAND.value
+        )
+        self.mock_ws.send_json.assert_called_with(
+            UnreadRequests.ACK_JSON_REQ.value
+        )
+
+    async def test_search(self):
+        await SearchCommand().run(
+            ws=self.mock_ws,
+            command=CommandType.search,
+            content='* "new release" notes',
+        )
+        self.mock_ws.send_json.assert_called_with({
+            "command": CommandType.search,
+            "room": "*",
+            "query": '"new release" notes',
+            "limit": 20,
+            "cursor": None,
+            "request_id": ANY,
+        })
+
     async def test_create_room(self):
 
         await CreateRoomCommand().run(
@@ -0,0 +1,100 @@
+import dataclasses
+import os
+import tempfile
+from unittest.mock import patch
+
+import aiounittest
+
+from chat import settings
+from chat.server.state.archive import AppendFiles, RoomArchive
+from chat.server.state.history import RoomLog
+
+
+@dataclasses.dataclass
+class Message:
+    seq: int = 0
+    text: str = ""
+
+
+class TestRoomArchive(aiounittest.AsyncTestCase):
+    def setUp(self) -> None:
+        self.tmp = tempfile.TemporaryDirectory()
+        self.files = AppendFiles(limit=2)
+
+    def tearDown(self) -> None:
+        self.files.close()
+        self.tmp.cleanup()
+
+    def archive(self) -> RoomArchive:
+        return RoomArchive(
+            self.tmp.name,
+            self.files,
+            dataclasses.asdict,
+            lambda data: Message(**data),
+            segment_size=256,
+        )
+
+    async def test_read(self):
+        archive = self.archive()
+
+        with patch.object(settings, "ARCHIVE_INDEX_INTERVAL", 64):
+            for seq in range(1, 101):
+                archive.append(Message(seq=seq, text=f"message {seq}"))
+            # archived already
+            archive.append(Message(seq=50))
+
+            self.assertGreater(len(archive.segments), 1)
+            self.assertEqual(
+                [m.seq for m in await archive.read(40, 45)],
+                [40, 41, 42, 43, 44],
+            )
+            last = (await archive.read(99, 200))[-1]
+            self.assertEqual(last.text, "message 100")
+            self.assertEqual(len(await archive.read(1, 101)), 100)
+            self.assertEqual(await archive.read(101, 110), [])
+
+    async def test_torn_tail(self):
+        archive = self.archive()
+        for seq in range(1, 21):
+            archive.append(Message(seq=seq))
+        self.files.close()
+
+        with open(archive.segments[-1].path, "ab") as f:
+            f.write(b"\x00\x00\x01")
+
+        archive = self.archive()
+        self.assertEqual(archive.last_seq, 20)
+
+        archive.append(Message(seq=21))
+        self.assertEqual(
+            [m.seq for m in await archive.read(19, 30)], [19, 20, 21]
+        )
+
+    async def test_room_log(self):
+        log = RoomLog(capacity=3, archive=self.archive())
+        for _ in range(10):
+            log.append(Message())
+
+        self.assertEqual(len(log), 3)
+        self.assertEqual(
+            [m.seq for m in await log.last(5)], [6, 7, 8, 9, 10]
+        )
+        self.assertEqual([m.seq for m in await log.after(2, 3)], [3, 4, 5])
+        self.assertEqual([m.seq for m in await log.after(6, 3)], [7, 8, 9])
+        self.assertEqual(len(os.listdir(self.tmp.name)), 1)
+
+    async def test_failed_write(self):
+        archive = self.archive()
+        archive.append(Message(seq=1))
+        await self.files.run(self.files.sync)
+
+        with patch(
+            "chat.server.state.archive.os.write",
+            side_effect=OSError("No space left on device"),
+        ):
+            archive.append(Message(seq=2))
+            # the message is lost, the snapshot dropping it must not go on
+            with self.assertRaises(OSError):
+                await self.files.run(self.files.sync)
+
+        self.assertEqual([m.seq for m in await archive.read(1, 3)], [1])
@@ -0,0 +1,28 @@
+import uuid
+
+import aiounittest
+
+from chat.server.state.cursor import ReadCursorStore
+from chat.singleton import singleton
+
+
+class TestReadCursorStore(aiounittest.AsyncTestCase):
+    def tearDown(self) -> None:
+        singleton.instances = {}
+
+    async def test_snapshot_restore(self):
+        room_key = uuid.uuid4()
+        ReadCursorStore().advance("user", room_key, 5)
+        ReadCursorStore().advance("user", room_key, 3)
+
+        segments = ReadCursorStore().snapshot()
+        self.assertEqual(len(segments), 1)
+        self.assertEqual(ReadCursorStore().snapshot(), {})
+
+        singleton.instances = {}
+        for name, data in segments.items():
+            ReadCursorStore().restore(name, data)
+
+        self.assertEqual(ReadCursorStore().get("user", room_key), 5)
+        self.assertEqual(ReadCursorStore().get("user", uuid.uuid4()), 0)
+        self.assertEqual(ReadCursorStore().get("other", room_key), 0)
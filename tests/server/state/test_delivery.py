@@ -0,0 +1,124 @@
+import aiounittest
+from unittest.mock import MagicMock
+
+from chat.server.state.room import Room, RoomStore, RoomType, DEFAULT_ROOM
+from chat.server.state.session import SessionRegistry
+from chat.server.state.user import UserStore
+from chat.server.state.message import (
+    NotificationStore,
+    get_message_notification
+)
+from chat.utils.async_mock import AsyncMock
+from chat.utils.codecs import DEFAULT_CODEC
+from chat.singleton import singleton
+
+
+def mock_ws(wire_format: tuple = ("json",)) -> MagicMock:
+    ws = MagicMock()
+    ws.send_json = AsyncMock(return_value=True)
+    ws.send_encoded = AsyncMock(return_value=True)
+    ws.wire_format = wire_format
+    ws.codec = DEFAULT_CODEC
+    ws.encode_frame = MagicMock(side_effect=lambda body, frame_type: (body,))
+    return ws
+
+
+def sent(ws: MagicMock) -> dict:
+    [body, _], _ = ws.send_encoded.call_args
+    return DEFAULT_CODEC.decode(body)
+
+
+class TestDeliveryEngine(aiounittest.AsyncTestCase):
+    def setUp(self) -> None:
+        self.users = [
+            UserStore().register(username=f"user{i}", password="123")
+            for i in range(3)
+        ]
+        self.sessions = {user.username: mock_ws() for user in self.users}
+
+        for user_name, ws in self.sessions.items():
+            SessionRegistry().add(user_name, ws)
+
+        self.room = RoomStore().add_room(
+            Room(
+                key=None,
+                name="room",
+                room_type=RoomType.open,
+                admins=["user0"],
+                allowed=[],
+                deleted=False,
+            )
+        )
+        RoomStore().join(user=self.users[1], room=self.room)
+
+    def tearDown(self) -> None:
+        singleton.instances = {}
+
+    async def send(self, room_name: str) -> None:
+        await NotificationStore().process(
+            ws=self.sessions["user0"],
+            notification=get_message_notification(
+                room_name=room_name,
+                user_name="user0",
+                success=True,
+                reason="",
+                private=False,
+                to="/all",
+                message="Hello, world!",
+            ),
+        )
+
+    async def test_room_members(self):
+        await self.send("room")
+
+        # the sender gets its own reply
+        self.sessions["user0"].send_json.assert_called_once()
+        self.sessions["user0"].send_encoded.assert_not_called()
+        self.sessions["user1"].send_encoded.assert_called_once()
+        self.sessions["user2"].send_encoded.assert_not_called()
+
+        message = sent(self.sessions["user1"])
+        self.assertEqual(message["payload"]["message"], "Hello, world!")
+        self.assertNotIn("request_id", message)
+
+    async def test_default_room(self):
+        await self.send(DEFAULT_ROOM)
+
+        self.sessions["user1"].send_encoded.assert_called_once()
+        self.sessions["user2"].send_encoded.assert_called_once()
+
+    async def test_encode_once(self):
+        other_format = mock_ws(wire_format=("msgpack",))
+        SessionRegistry().add("user2", other_format)
+        SessionRegistry().add("user2", mock_ws())
+
+        await self.send(DEFAULT_ROOM)
+
+        frames = {
+            id(ws.send_encoded.call_args[0][1])
+            for ws in SessionRegistry().sessions["user2"] | {
+                self.sessions["user1"]
+            }
+        }
+        # one frame for ("json",), another one for ("msgpack",)
+        self.assertEqual(len(frames), 2)
+        other_format.encode_frame.assert_called_once()
+
+    async def test_leave_and_disconnect(self):
+        RoomStore().leave(user=self.users[1], room=self.room)
+        SessionRegistry().remove("user2", self.sessions["user2"])
+
+        await self.send("room")
+        await self.send(DEFAULT_ROOM)
+
+        self.assertEqual(self.sessions["user1"].send_encoded.call_count, 1)
+        self.sessions["user2"].send_encoded.assert_not_called()
+        self.assertNotIn("user2", SessionRegistry().sessions)
+
+    async def test_rename(self):
+        ws = self.sessions["user1"]
+        SessionRegistry().rename(old="user1", new="anonymus_1", ws=ws)
+
+        await self.send("room")
+
+        ws.send_encoded.assert_not_called()
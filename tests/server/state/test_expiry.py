@@ -0,0 +1,94 @@
+from datetime import datetime
+from unittest.mock import MagicMock
+
+import aiounittest
+from freezegun import freeze_time
+
+from chat.requests_examples import test_dt_str
+from chat.server.state.expiry import ExpiryIndex
+from chat.server.state.message import (
+    NotificationStore,
+    get_message_notification,
+)
+from chat.server.state.record import WireCache
+from chat.server.state.room import Room, RoomStore, RoomType
+from chat.server.state.user import UserStore
+from chat.singleton import singleton
+from chat.utils.async_mock import AsyncMock
+from chat.utils.codecs import JsonCodec
+
+
+class TestExpiry(aiounittest.AsyncTestCase):
+    def setUp(self) -> None:
+        self.ws_response = MagicMock()
+        self.ws_response.send_json = AsyncMock()
+
+    def tearDown(self) -> None:
+        singleton.instances = {}
+
+    def test_index(self):
+        index = ExpiryIndex(width=10)
+        index.add("a", 1, 5)
+        index.add("a", 2, 9)
+        index.add("b", 1, 15)
+
+        self.assertEqual(len(index), 2)
+        self.assertEqual(list(index.pop(9)), [])
+        # the last seq of the room in the bucket
+        self.assertEqual(list(index.pop(10)), [("a", 2)])
+        self.assertEqual(list(index.pop(100)), [("b", 1)])
+        self.assertEqual(len(index), 0)
+
+    async def send(self, room: Room, message: str) -> None:
+        await NotificationStore().process(
+            ws=self.ws_response,
+            notification=get_message_notification(
+                room_name=room.name,
+                user_name="user",
+                success=True,
+                reason="",
+                private=False,
+                to="",
+                message=message,
+            ),
+        )
+
+    async def test_expire(self):
+        UserStore().register(username="user", password="123")
+        room = RoomStore().add_room(
+            Room(
+                key=None,
+                name="room",
+                room_type=RoomType.open,
+                admins=["user"],
+                allowed=["user"],
+                deleted=False,
+                ttl=60,
+            )
+        )
+        sent = datetime.fromisoformat(test_dt_str).timestamp()
+
+        with freeze_time(test_dt_str):
+            await self.send(room, "old")
+        with freeze_time("2030-01-01"):
+            await self.send(room, "new")
+
+        self.assertEqual(await NotificationStore().expire(sent), (0, 0))
+
+        # both encoded for a page
+        old, new = NotificationStore().store["rooms"][room.key]
+        for record in (old, new):
+            WireCache().encode(record, JsonCodec())
+
+        expired, reclaimed = await NotificationStore().expire(sent + 120)
+        self.assertEqual(expired, 1)
+        self.assertGreater(reclaimed, 0)
+        self.assertEqual(NotificationStore().reclaimed_bytes, reclaimed)
+        # the cache lets go of the expired one
+        self.assertIsNone(old.wire)
+        self.assertEqual(len(WireCache()), 1)
+        self.assertEqual(WireCache().size, len(new.wire))
+
+        messages = await NotificationStore().get_n_messages(room, 10)
+        self.assertEqual([m["payload"]["message"] for m in messages], ["new"])
+        self.assertEqual(messages[0]["seq"], 2)
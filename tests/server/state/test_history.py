@@ -0,0 +1,68 @@
+import aiounittest
+from dataclasses import dataclass
+
+from chat.server.state.history import RoomLog
+
+
+@dataclass
+class Message:
+    seq: int = 0
+
+
+class TestRoomLog(aiounittest.AsyncTestCase):
+    async def test_ring(self):
+        log = RoomLog(capacity=3)
+
+        for _ in range(5):
+            log.append(Message())
+
+        self.assertEqual(len(log), 3)
+        self.assertEqual((log.first_seq, log.last_seq), (3, 5))
+        self.assertEqual([m.seq for m in log], [3, 4, 5])
+
+        self.assertEqual([m.seq for m in await log.last(2)], [4, 5])
+        self.assertEqual([m.seq for m in await log.last(10)], [3, 4, 5])
+        self.assertEqual(await log.last(0), [])
+
+    async def test_before(self):
+        log = RoomLog(capacity=4)
+
+        for _ in range(6):
+            log.append(Message())
+
+        self.assertEqual([m.seq for m in await log.before(6, 2)], [4, 5])
+        self.assertEqual([m.seq for m in await log.before(10, 2)], [5, 6])
+        # older ones are gone
+        self.assertEqual([m.seq for m in await log.before(4, 2)], [3])
+        self.assertEqual(await log.before(3, 2), [])
+
+    async def test_after(self):
+        log = RoomLog(capacity=4)
+
+        for _ in range(6):
+            log.append(Message())
+
+        self.assertEqual([m.seq for m in await log.after(3, 2)], [4, 5])
+        # older ones are gone, the page starts at the oldest kept
+        self.assertEqual([m.seq for m in await log.after(0, 2)], [3, 4])
+        self.assertEqual(await log.after(6, 2), [])
+
+    def test_loaded_seq(self):
+        log = RoomLog(capacity=2)
+        log.append(Message(seq=7))
+        log.append(Message())
+
+        self.assertEqual([m.seq for m in log], [7, 8])
+
+    def test_drop(self):
+        log = RoomLog(capacity=4)
+
+        for _ in range(6):
+            log.append(Message())
+
+        self.assertEqual([m.seq for m in log.drop(4)], [3, 4])
+        self.assertEqual([m.seq for m in log], [5, 6])
+        self.assertEqual(log.drop(4), [])
+
+        log.append(Message())
+        self.assertEqual((log.first_seq, log.last_seq), (5, 7))
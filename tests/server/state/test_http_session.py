@@ -0,0 +1,40 @@
+import unittest
+from unittest.mock import patch
+
+from chat.server.state.http_session import HTTPSessionStore
+from chat.singleton import singleton
+
+
+class TestHTTPSessionStore(unittest.TestCase):
+    def tearDown(self) -> None:
+        singleton.instances = {}
+
+    @patch("chat.server.state.http_session.time.monotonic")
+    def test_timeout(self, monotonic):
+        store = HTTPSessionStore()
+        store.timeout = 10
+
+        monotonic.return_value = 100
+        token, meta = store.open()
+        monotonic.return_value = 105
+        self.assertIs(store.get(token), meta)
+
+        # the time it was last used counts
+        monotonic.return_value = 114
+        self.assertIs(store.get(token), meta)
+        monotonic.return_value = 125
+        self.assertIsNone(store.get(token))
+        self.assertEqual(len(store.store), 0)
+
+    def test_least_recently_used(self):
+        store = HTTPSessionStore()
+        store.max_sessions = 2
+
+        first, _ = store.open()
+        second, _ = store.open()
+        store.get(first)
+        store.open()
+
+        self.assertIsNotNone(store.get(first))
+        self.assertIsNone(store.get(second))
+        self.assertEqual(len(store.store), 2)
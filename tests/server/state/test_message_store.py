@@ -64,7 +64,7 @@ class TestMessageStore(aiounittest.AsyncTestCase):
             ),
         )
 
-        data = NotificationStore().get_n_messages(room=room, n=1)
+        data = await NotificationStore().get_n_messages(room=room, n=1)
         self.assertEqual(len(data), 1)
         self.assertDictEqual(
             data[0],
@@ -75,10 +75,11 @@ class TestMessageStore(aiounittest.AsyncTestCase):
                 "datetime": str(datetime.now()),
                 "user": "user",
                 "room_name": "room",
+                "seq": 2,
                 "payload": {
                     "private": False,
                     "to": "",
-                    "message": "Hello, world!"
+                    "message": "Hello, hello!"
                 }
             },
         )
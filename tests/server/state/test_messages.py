@@ -1,3 +1,4 @@
+import dataclasses
 import unittest
 from datetime import datetime
 from freezegun import freeze_time
@@ -5,7 +6,7 @@ from freezegun import freeze_time
 from chat.server.state.room import Room, RoomType
 from chat.server.state.user import User
 
-from chat.server.state.message import get_message_notification
+from chat.server.state.message import RoomAction, get_message_notification
 from chat.command_types import CommandType
 from chat.requests_examples import test_dt_str
 from chat.server.state.message import get_connected_notification
@@ -44,6 +45,7 @@ class TestMessageStore(unittest.TestCase):
                 "datetime": str(datetime.now()),
                 "user": "user",
                 "room_name": "room",
+                "seq": 0,
                 "payload": {
                     "private": False,
                     "to": "",
@@ -62,8 +64,25 @@ class TestMessageStore(unittest.TestCase):
             {
                 "action": CommandType.connected,
                 "datetime": str(datetime.now()),
-                "payload": {"user_name": "anonymus"},
+                "payload": {"user_name": "anonymus", "session": None},
                 "reason": "",
                 "success": True,
             },
         )
+
+    @freeze_time(test_dt_str)
+    def test_construct(self):
+        fields = dict(
+            action=CommandType.send,
+            datetime=str(datetime.now()),
+            success=True,
+            reason="",
+            payload={"private": False, "to": "", "message": "Hello"},
+            room_name="room",
+            user_name="user",
+        )
+
+        action = RoomAction.construct(**fields)
+        self.assertEqual(action, RoomAction(**fields))
+        self.assertEqual(action.seq, 0)
+        self.assertEqual(action.to_dict(), dataclasses.asdict(action))
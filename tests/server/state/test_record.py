@@ -0,0 +1,96 @@
+import dataclasses
+import unittest
+
+from freezegun import freeze_time
+
+from chat.requests_examples import test_dt_str
+from chat.server.state.message import get_message_notification
+from chat.server.state.record import MessageRecord, Names, WireCache
+from chat.singleton import singleton
+from chat.utils.codecs import JsonCodec, MsgpackCodec
+
+
+class TestMessageRecord(unittest.TestCase):
+    def tearDown(self) -> None:
+        singleton.instances = {}
+
+    @freeze_time(test_dt_str)
+    def test_round_trip(self):
+        action = get_message_notification(
+            room_name="room",
+            user_name="user",
+            success=True,
+            reason="",
+            private=False,
+            to="/all",
+            message="Hello, world!",
+        )
+        action.seq = 3
+        record = MessageRecord.from_action(action)
+
+        self.assertIsInstance(record.sent, int)
+        self.assertEqual(record.get_notification(), action.get_notification())
+        self.assertEqual(record.to_dict(), dataclasses.asdict(action))
+        self.assertEqual(
+            MessageRecord.from_dict(record.to_dict()).to_dict(),
+            record.to_dict(),
+        )
+
+        other = MessageRecord.from_action(action)
+        self.assertEqual(other.user, record.user)
+        self.assertEqual(len(Names().names), 5)
+
+    def test_unknown_datetime(self):
+        record = MessageRecord.from_dict({
+            "action": "/send",
+            "datetime": "yesterday",
+            "success": True,
+            "reason": "",
+            "payload": {"message": "hi", "edited": True},
+            "room_name": "room",
+            "user_name": "user",
+        })
+
+        self.assertEqual(record.datetime, "yesterday")
+        self.assertIsNone(record.timestamp())
+        self.assertEqual(record.payload, {
+            "private": False, "to": "", "message": "hi", "edited": True
+        })
+
+    def test_wire_cache(self):
+        records = [
+            MessageRecord.from_dict({
+                "action": "/send",
+                "datetime": "2024-01-01 00:00:00",
+                "success": True,
+                "reason": "",
+                "payload": {"message": str(i)},
+                "room_name": "room",
+                "user_name": "user",
+                "seq": i,
+            })
+            for i in range(1, 4)
+        ]
+        codec = JsonCodec()
+        body = codec.encode(records[0].get_notification())
+        cache = WireCache()
+        cache.limit = 2 * len(body)
+
+        self.assertEqual(cache.encode(records[0], codec), body)
+        self.assertIs(cache.encode(records[0], codec), records[0].wire)
+
+        # another codec is not kept, nor an archived record
+        cache.encode(records[0], MsgpackCodec())
+        cache.encode(records[1], codec, keep=False)
+        self.assertEqual((len(cache), cache.size), (1, len(body)))
+
+        cache.encode(records[1], codec)
+        cache.encode(records[2], codec)
+        self.assertEqual(len(cache), 2)
+        self.assertIsNone(records[0].wire)
+        self.assertEqual(cache.size, 2 * len(body))
+
+        cache.discard(records[1])
+        cache.discard(records[0])
+        self.assertIsNone(records[1].wire)
+        self.assertEqual((len(cache), cache.size), (1, len(body)))
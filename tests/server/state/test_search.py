@@ -0,0 +1,61 @@
+import unittest
+
+from chat.server.state.search import (
+    SearchIndex,
+    has_phrase,
+    parse_query,
+    tokenize,
+)
+
+
+class TestSearchIndex(unittest.TestCase):
+    def test_query(self):
+        self.assertEqual(tokenize("Hello, World! hello"), [
+            "hello", "world", "hello"
+        ])
+        self.assertEqual(
+            parse_query('deploy "new release" deploy'),
+            (["deploy", "new", "release"], [["new", "release"]]),
+        )
+        self.assertTrue(has_phrase(["a", "new", "release"], ["new", "release"]))
+        self.assertFalse(has_phrase(["release", "new"], ["new", "release"]))
+
+    def test_find(self):
+        index = SearchIndex()
+        for seq, text in enumerate([
+            "deploy the release",
+            "release notes",
+            "Deploy, deploy again",
+            "the new release is deployed",
+        ], 1):
+            index.add("room", seq, text)
+        index.add("other", 1, "release")
+
+        self.assertEqual(list(index.find("room", ["release"])), [4, 2, 1])
+        self.assertEqual(list(index.find("room", ["deploy", "release"])), [1])
+        self.assertEqual(list(index.find("room", ["missing"])), [])
+        self.assertEqual(list(index.find("other", ["release"])), [1])
+        # the next page
+        self.assertEqual(list(index.find("room", ["release"], 4)), [2, 1])
+
+        index.expire("room", 2)
+        self.assertEqual(list(index.find("room", ["release"])), [4])
+        self.assertEqual(list(index.find("other", ["release"])), [1])
+
+    def test_expire(self):
+        index = SearchIndex()
+        index.add("room", 1, "old news")
+        index.add("room", 2, "news")
+        index.add("room", 3, "fresh")
+        index.add("other", 1, "old")
+
+        # never queried, still cut and removed once empty
+        index.expire("room", 2)
+        self.assertEqual(set(index.postings), {"old", "fresh"})
+        self.assertEqual(list(index.postings["old"]), ["other"])
+        self.assertEqual(list(index.find("room", ["fresh"])), [3])
+
+        index.expire("room", 3)
+        index.expire("other", 1)
+        self.assertEqual(len(index), 0)
+        self.assertEqual(index.firsts, {})
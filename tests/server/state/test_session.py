@@ -0,0 +1,84 @@
+import aiounittest
+from unittest.mock import MagicMock
+
+from chat.command_types import CommandType
+from chat.server.room_actions import JoinRoomAction
+from chat.server.state.meta import Meta
+from chat.server.state.room import Room, RoomStore, RoomType
+from chat.server.state.session import SessionRegistry
+from chat.server.state.user import UserStore
+from chat.utils.async_mock import AsyncMock
+from chat.utils.codecs import DEFAULT_CODEC
+from chat.singleton import singleton
+
+
+def mock_ws() -> MagicMock:
+    ws = MagicMock()
+    ws.send_json = AsyncMock(return_value=True)
+    ws.send_encoded = AsyncMock(return_value=True)
+    ws.wire_format = ("json",)
+    ws.codec = DEFAULT_CODEC
+    ws.encode_frame = MagicMock(side_effect=lambda body, frame_type: (body,))
+    return ws
+
+
+class TestSessionRegistry(aiounittest.AsyncTestCase):
+    def setUp(self) -> None:
+        UserStore().register(username="user", password="123")
+        for name, room_type in (
+            ("room", RoomType.open), ("restricted", RoomType.restricted)
+        ):
+            RoomStore().add_room(
+                Room(
+                    key=None,
+                    name=name,
+                    room_type=room_type,
+                    admins=[],
+                    allowed=[],
+                    deleted=False,
+                )
+            )
+
+        self.device, self.other_device = mock_ws(), mock_ws()
+        SessionRegistry().add("user", self.device)
+        SessionRegistry().add("user", self.other_device)
+
+    def tearDown(self) -> None:
+        singleton.instances = {}
+
+    def test_registry(self):
+        registry = SessionRegistry()
+        self.assertEqual(registry.get("user"), {self.device, self.other_device})
+
+        registry.rename(old="user", new="anonymus_1", ws=self.device)
+        self.assertEqual(registry.get("user"), {self.other_device})
+
+        registry.remove("user", self.other_device)
+        self.assertNotIn("user", registry)
+        self.assertEqual(len(registry), 1)
+
+    async def join(self, room_name: str) -> None:
+        await JoinRoomAction.run(
+            ws_response=self.device,
+            meta=Meta(user_name="user", loggedin=True),
+            command=CommandType.join_room,
+            message_json={"room_name": room_name},
+        )
+
+    async def test_mirror(self):
+        await self.join("room")
+
+        self.device.send_json.assert_called_once()
+        self.device.send_encoded.assert_not_called()
+
+        [body, _], _ = self.other_device.send_encoded.call_args
+        mirrored = DEFAULT_CODEC.decode(body)
+
+        self.assertEqual(mirrored["action"], CommandType.join_room)
+        self.assertEqual(mirrored["payload"], {"room_name": "room"})
+
+    async def test_failure_not_mirrored(self):
+        await self.join("restricted")
+
+        self.device.send_json.assert_called_once()
+        self.other_device.send_encoded.assert_not_called()
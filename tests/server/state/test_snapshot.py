@@ -0,0 +1,299 @@
+import os
+import tempfile
+import time
+from unittest.mock import MagicMock, patch
+
+import aiounittest
+
+from chat import settings
+from chat.server.state.archive import Archives
+from chat.server.state.cursor import ReadCursorStore
+from chat.server.state.history import RoomLog
+from chat.server.state.message import (
+    NotificationStore,
+    get_connected_notification,
+    get_message_notification,
+)
+from chat.server.state.record import MessageRecord
+from chat.server.state.room import Room, RoomStore, RoomType, DEFAULT_ROOM
+from chat.server.state.snapshot import (
+    MemoryBackend,
+    Snapshots,
+    ARCHIVE_DIR,
+    SEGMENTS_DIR,
+)
+from chat.server.state.storage import Storage
+from chat.server.state.user import UserStore
+from chat.server.state.wal import WriteAheadLog
+from chat.singleton import singleton
+from chat.utils.async_mock import AsyncMock
+
+
+class TestSnapshots(aiounittest.AsyncTestCase):
+    def setUp(self) -> None:
+        self.tmp = tempfile.TemporaryDirectory()
+        Snapshots().dir = self.tmp.name
+
+        self.ws_response = MagicMock()
+        self.ws_response.send_json = AsyncMock()
+
+    def tearDown(self) -> None:
+        Archives().close()
+        singleton.instances = {}
+        self.tmp.cleanup()
+
+    async def restart(self) -> int:
+        Archives().close()
+        singleton.instances = {}
+        Snapshots().dir = self.tmp.name
+
+        return await Snapshots().recover()
+
+    async def send(self, user_name: str, room_name: str, message: str):
+        await NotificationStore().process(
+            ws=self.ws_response,
+            notification=get_message_notification(
+                room_name=room_name,
+                user_name=user_name,
+                success=True,
+                reason="",
+                private=False,
+                to="",
+                message=message,
+            ),
+        )
+
+    async def messages(self, room: Room) -> list:
+        return [
+            (m["payload"]["message"], m["seq"])
+            for m in await NotificationStore().get_n_messages(room, 100)
+        ]
+
+    async def test_restore(self):
+        alice = UserStore().register(username="alice", password="123")
+        bob = UserStore().register(username="bob", password="123")
+
+        room = RoomStore().add_room(
+            Room(
+                key=None,
+                name="room",
+                room_type=RoomType.open,
+                admins=[alice.username],
+                allowed=[],
+                deleted=False,
+            )
+        )
+        RoomStore().join(user=bob, room=room)
+        dialogue = RoomStore().add_room(
+            Room(
+                key=None,
+                name="",
+                room_type=RoomType.private,
+                admins=[alice.username, bob.username],
+                allowed=[],
+                deleted=False,
+            )
+        )
+        await self.send("bob", "room", "Hello")
+        await self.send("alice", DEFAULT_ROOM, "Hi all")
+        ReadCursorStore().advance("alice", room.key, 1)
+        default_key = RoomStore().default_room().key
+
+        await Snapshots().snapshot()
+        await self.restart()
+
+        self.assertTrue(UserStore().login("alice", "123"))
+        self.assertEqual(RoomStore().default_room().key, default_key)
+        self.assertEqual(len(RoomStore().store), 3)
+
+        room = RoomStore().get_room_by_name("room")
+        self.assertTrue(RoomStore().user_in_room("bob", room))
+        self.assertEqual(RoomStore().room_users[room.key], {"alice", "bob"})
+        self.assertEqual(
+            RoomStore().find_private_room(alice, bob).key, dialogue.key
+        )
+
+        self.assertEqual(await self.messages(room), [("Hello", 1)])
+        self.assertEqual(
+            await self.messages(RoomStore().default_room()), [("Hi all", 1)]
+        )
+        self.assertEqual(ReadCursorStore().get("alice", room.key), 1)
+
+    async def test_incremental(self):
+        for i in range(10):
+            UserStore().register(username=f"user{i}", password="123")
+            await self.send(f"user{i}", DEFAULT_ROOM, f"message {i}")
+
+        first = await Snapshots().snapshot()
+        self.assertGreater(first["written"], 2)
+
+        nothing = await Snapshots().snapshot()
+        self.assertEqual(nothing["written"], 0)
+
+        room = RoomStore().default_room()
+        ReadCursorStore().advance("user1", room.key, 5)
+        await self.send("user2", DEFAULT_ROOM, "one more")
+
+        # the cursor segment and the last chunk of the room
+        second = await Snapshots().snapshot()
+        self.assertEqual(second["written"], 2)
+
+        segments = os.listdir(os.path.join(self.tmp.name, SEGMENTS_DIR))
+        self.assertEqual(
+            len(segments),
+            sum(len(s) for s in Snapshots().manifest["segments"].values()),
+        )
+
+        await self.restart()
+        self.assertEqual(len(await self.messages(room)), 11)
+        self.assertEqual(ReadCursorStore().get("user1", room.key), 5)
+
+    async def test_evicted_chunks(self):
+        Archives().open(os.path.join(self.tmp.name, ARCHIVE_DIR))
+        UserStore().register(username="user", password="123")
+        key = RoomStore().default_room().key
+        NotificationStore().store["rooms"][key] = RoomLog(
+            capacity=4,
+            archive=Archives().room(
+                key, MessageRecord.to_dict, MessageRecord.from_dict
+            ),
+        )
+
+        with patch.object(settings, "SNAPSHOT_CHUNK_SIZE", 2):
+            for i in range(3):
+                await self.send("user", DEFAULT_ROOM, f"message {i}")
+            await Snapshots().snapshot()
+
+            for i in range(3, 8):
+                await self.send("user", DEFAULT_ROOM, f"message {i}")
+            stats = await Snapshots().snapshot()
+
+        # messages 1-4 are archived, chunks of 5-6 and 7-8 are written
+        self.assertEqual(stats["removed"], 2)
+        self.assertEqual(stats["written"], 2)
+
+        await self.restart()
+        self.assertEqual(
+            [
+                seq
+                for _, seq in await self.messages(RoomStore().default_room())
+            ],
+            [1, 2, 3, 4, 5, 6, 7, 8],
+        )
+
+    async def test_deferred_rooms(self):
+        UserStore().register(username="user", password="123")
+        for i in range(3):
+            await self.send("user", DEFAULT_ROOM, f"message {i}")
+        await Snapshots().snapshot()
+
+        await self.restart()
+        room = RoomStore().default_room()
+        # nothing is read until the room is, its last seq is known
+        self.assertEqual(NotificationStore().last_seq(room), 3)
+        self.assertEqual(NotificationStore().count_unread("user"), {
+            DEFAULT_ROOM: 3
+        })
+        self.assertEqual(NotificationStore().store["rooms"], {})
+        self.assertEqual(len(await self.messages(room)), 3)
+
+        await self.restart()
+        hits, _ = await NotificationStore().search(
+            [RoomStore().default_room()], "message"
+        )
+        self.assertEqual([m["seq"] for m in hits], [3, 2, 1])
+
+    async def test_unreadable_chunk(self):
+        UserStore().register(username="user", password="123")
+        with patch.object(settings, "SNAPSHOT_CHUNK_SIZE", 2):
+            for i in range(5):
+                await self.send("user", DEFAULT_ROOM, f"message {i}")
+            await Snapshots().snapshot()
+
+            key = RoomStore().default_room().key
+            segments = Snapshots().manifest["segments"]["messages"]
+            path = os.path.join(
+                self.tmp.name, SEGMENTS_DIR, segments[f"room-{key}-000001"]
+            )
+            with open(path, "w") as f:
+                f.write("{")
+
+            await self.restart()
+            await self.send("user", DEFAULT_ROOM, "after")
+
+        # the messages of the chunk and before are lost, no seq is reused
+        self.assertEqual(
+            await self.messages(RoomStore().default_room()),
+            [("message 4", 5), ("after", 6)],
+        )
+
+    async def test_deferred_expiry(self):
+        UserStore().register(username="user", password="123")
+        room = RoomStore().add_room(
+            Room(
+                key=None,
+                name="room",
+                room_type=RoomType.open,
+                admins=["user"],
+                allowed=["user"],
+                deleted=False,
+                ttl=60,
+            )
+        )
+        await self.send("user", "room", "soon gone")
+        await Snapshots().snapshot()
+        await self.restart()
+
+        # a room nobody reads is restored for its messages to expire
+        expired, _ = await NotificationStore().expire(time.time() + 3600)
+        self.assertEqual(expired, 1)
+        await Snapshots().snapshot()
+
+        await self.restart()
+        room = RoomStore().get_room_by_name("room")
+        self.assertEqual(await self.messages(room), [])
+        self.assertEqual(NotificationStore().last_seq(room), 1)
+
+    async def test_log_after_snapshot(self):
+        wal = WriteAheadLog()
+        wal.dir = self.tmp.name
+        wal.open()
+        Storage().backend = MemoryBackend()
+
+        UserStore().register(username="user", password="123")
+        await Snapshots().snapshot()
+        await self.send("user", DEFAULT_ROOM, "after the snapshot")
+        await wal.close()
+
+        self.assertEqual(await self.restart(), 1)
+        self.assertEqual(
+            await self.messages(RoomStore().default_room()),
+            [("after the snapshot", 1)],
+        )
+
+    async def test_session_token(self):
+        wal = WriteAheadLog()
+        wal.dir = self.tmp.name
+        wal.open()
+        Storage().backend = MemoryBackend()
+
+        await NotificationStore().process(
+            ws=self.ws_response,
+            notification=get_connected_notification("anonymus", "secret"),
+        )
+        await wal.sync()
+        await Snapshots().snapshot()
+        await wal.close()
+
+        for root, _, names in os.walk(self.tmp.name):
+            for name in names:
+                with open(os.path.join(root, name), "rb") as f:
+                    self.assertNotIn(b"secret", f.read())
+
+        # saved by older versions, saved again without it
+        NotificationStore().restore(
+            "other-000000",
+            [get_connected_notification("anonymus", "secret").to_dict()],
+        )
+        data = NotificationStore().snapshot()
+        self.assertEqual(data["other-000000"][0]["payload"]["session"], None)
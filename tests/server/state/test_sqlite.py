@@ -0,0 +1,160 @@
+import os
+import sqlite3
+import tempfile
+from unittest.mock import MagicMock, patch
+
+import aiounittest
+
+from chat.server.state.cursor import ReadCursorStore
+from chat.server.state.history import RoomLog
+from chat.server.state.message import (
+    NotificationStore,
+    get_message_notification,
+)
+from chat.server.state.room import Room, RoomStore, RoomType, DEFAULT_ROOM
+from chat.server.state.sqlite import SqliteBackend
+from chat.server.state.storage import Storage
+from chat.server.state.user import UserStore
+from chat.singleton import singleton
+from chat.utils.async_mock import AsyncMock
+
+
+class TestSqliteBackend(aiounittest.AsyncTestCase):
+    def setUp(self) -> None:
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "chat.sqlite3")
+
+        self.ws_response = MagicMock()
+        self.ws_response.send_json = AsyncMock()
+
+    def tearDown(self) -> None:
+        singleton.instances = {}
+        self.tmp.cleanup()
+
+    async def open(self) -> int:
+        singleton.instances = {}
+        Storage().backend = SqliteBackend(self.path)
+
+        return await Storage().backend.open()
+
+    async def send(self, user_name: str, room_name: str, message: str):
+        await NotificationStore().process(
+            ws=self.ws_response,
+            notification=get_message_notification(
+                room_name=room_name,
+                user_name=user_name,
+                success=True,
+                reason="",
+                private=False,
+                to="",
+                message=message,
+            ),
+        )
+
+    async def messages(self, room: Room, n: int = 10) -> list:
+        return [
+            m["payload"]["message"]
+            for m in await NotificationStore().get_n_messages(room, n)
+        ]
+
+    async def test_restore(self):
+        await self.open()
+
+        alice = UserStore().register(username="alice", password="123")
+        bob = UserStore().register(username="bob", password="123")
+        room = RoomStore().add_room(
+            Room(
+                key=None,
+                name="room",
+                room_type=RoomType.restricted,
+                admins=[alice.username],
+                allowed=[],
+                deleted=False,
+            )
+        )
+        RoomStore().add_user_to_room(room=room, admin=alice, new_user=bob)
+        RoomStore().join(user=bob, room=room)
+        dialogue = RoomStore().add_room(
+            Room(
+                key=None,
+                name="",
+                room_type=RoomType.private,
+                admins=[alice.username, bob.username],
+                allowed=[],
+                deleted=False,
+            )
+        )
+
+        await self.send("bob", DEFAULT_ROOM, "Hi all")
+        for message in ("one", "two", "three"):
+            await self.send("alice", "room", message)
+        ReadCursorStore().advance("bob", room.key, 2)
+        default_key = RoomStore().default_room().key
+
+        await Storage().backend.close()
+        self.assertGreater(await self.open(), 0)
+
+        self.assertTrue(UserStore().login("bob", "123"))
+        self.assertEqual(RoomStore().default_room().key, default_key)
+
+        restored = RoomStore().get_room_by_name("room")
+        self.assertEqual(restored.key, room.key)
+        self.assertIn("bob", restored.allowed)
+        self.assertTrue(RoomStore().user_in_room("bob", restored))
+        self.assertEqual(RoomStore().room_users[room.key], {"alice", "bob"})
+        self.assertEqual(
+            RoomStore().find_private_room(alice, bob).key, dialogue.key
+        )
+
+        self.assertEqual(await self.messages(restored), ["one", "two", "three"])
+        self.assertEqual(
+            await self.messages(RoomStore().default_room()), ["Hi all"]
+        )
+        self.assertEqual(ReadCursorStore().get("bob", room.key), 2)
+
+        await Storage().backend.close()
+
+    async def test_dropped_messages(self):
+        await self.open()
+        UserStore().register(username="user", password="123")
+        room = RoomStore().default_room()
+        NotificationStore().store["rooms"][room.key] = RoomLog(capacity=2)
+
+        for i in range(5):
+            await self.send("user", DEFAULT_ROOM, f"message {i}")
+
+        # three of them are read back from the database
+        self.assertEqual(
+            await self.messages(room),
+            [f"message {i}" for i in range(5)],
+        )
+        self.assertEqual(await self.messages(room, 3), [
+            "message 2", "message 3", "message 4"
+        ])
+
+        unread, more = await NotificationStore().get_unread(room, 1, 2)
+        self.assertEqual([m["seq"] for m in unread], [2, 3])
+        self.assertTrue(more)
+
+        await Storage().backend.close()
+
+    async def test_failed_batch(self):
+        await self.open()
+        backend = Storage().backend
+        UserStore().register(username="user", password="123")
+
+        with patch.object(
+            backend,
+            "_SqliteBackend__write",
+            side_effect=sqlite3.OperationalError("disk I/O error"),
+        ):
+            ReadCursorStore().advance("user", "room", 1)
+            with self.assertRaises(sqlite3.Error):
+                await backend.flush()
+
+        # later batches are committed on their own
+        ReadCursorStore().advance("user", "room", 2)
+        await backend.flush()
+        self.assertEqual(backend.committed, backend.appended)
+
+        await backend.close()
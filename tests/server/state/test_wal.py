@@ -0,0 +1,172 @@
+import os
+import tempfile
+from unittest.mock import MagicMock, patch
+
+import aiounittest
+
+from chat.server.state.cursor import ReadCursorStore
+from chat.server.state.message import (
+    NotificationStore,
+    get_message_notification,
+)
+from chat.server.state.room import Room, RoomStore, RoomType
+from chat.server.state.snapshot import MemoryBackend, Snapshots
+from chat.server.state.storage import Storage
+from chat.server.state.user import UserStore
+from chat.server.state.wal import WriteAheadLog
+from chat.singleton import singleton
+from chat.utils.async_mock import AsyncMock
+
+
+class TestWriteAheadLog(aiounittest.AsyncTestCase):
+    def setUp(self) -> None:
+        self.tmp = tempfile.TemporaryDirectory()
+
+        self.ws_response = MagicMock()
+        self.ws_response.send_json = AsyncMock()
+
+    def tearDown(self) -> None:
+        singleton.instances = {}
+        self.tmp.cleanup()
+
+    def open_log(self) -> WriteAheadLog:
+        wal = WriteAheadLog()
+        wal.dir = self.tmp.name
+        wal.fsync_interval = 0
+        wal.open()
+        Storage().backend = MemoryBackend()
+
+        return wal
+
+    async def recover(self) -> int:
+        Snapshots().dir = self.tmp.name
+        return await Snapshots().recover()
+
+    async def make_changes(self) -> Room:
+        alice = UserStore().register(username="alice", password="123")
+        bob = UserStore().register(username="bob", password="123")
+
+        room = RoomStore().add_room(
+            Room(
+                key=None,
+                name="room",
+                room_type=RoomType.restricted,
+                admins=[alice.username],
+                allowed=[],
+                deleted=False,
+            )
+        )
+        RoomStore().add_user_to_room(room=room, admin=alice, new_user=bob)
+        RoomStore().join(user=bob, room=room)
+
+        for message in ("Hello", "Hi"):
+            await NotificationStore().process(
+                ws=self.ws_response,
+                notification=get_message_notification(
+                    room_name=room.name,
+                    user_name=bob.username,
+                    success=True,
+                    reason="",
+                    private=False,
+                    to="",
+                    message=message,
+                ),
+            )
+
+        ReadCursorStore().advance("alice", room.key, 2)
+        return room
+
+    async def assert_restored(self, room: Room) -> None:
+        self.assertEqual(
+            set(UserStore().get_user_list()), {"alice", "bob"}
+        )
+        self.assertTrue(UserStore().login("bob", "123"))
+
+        restored = RoomStore().get_room_by_name("room")
+        self.assertEqual(restored.key, room.key)
+        self.assertIn("bob", restored.allowed)
+        self.assertTrue(RoomStore().user_in_room("bob", restored))
+
+        messages = await NotificationStore().get_n_messages(restored)
+        self.assertEqual(
+            [(m["payload"]["message"], m["seq"]) for m in messages],
+            [("Hello", 1), ("Hi", 2)],
+        )
+        self.assertEqual(ReadCursorStore().get("alice", room.key), 2)
+
+    async def test_replay(self):
+        wal = self.open_log()
+
+        room = await self.make_changes()
+        await wal.sync()
+        self.assertEqual(wal.synced_lsn, wal.lsn)
+        await wal.close()
+
+        singleton.instances = {}
+        self.assertEqual(await self.recover(), wal.lsn)
+
+        await self.assert_restored(room)
+
+    async def test_torn_tail(self):
+        wal = self.open_log()
+        await self.make_changes()
+        await wal.close()
+        lsn = wal.lsn
+
+        with open(wal.segments()[-1][1], "ab") as f:
+            f.write(b"\x00\x00\x01\x00torn")
+
+        singleton.instances = {}
+        self.assertEqual(await self.recover(), lsn)
+
+        wal = self.open_log()
+        wal.append("cursors", "advance", "bob", "room", 1)
+        await wal.close()
+
+        self.assertEqual(
+            [record[0] for record in wal.replay()],
+            list(range(1, lsn + 2)),
+        )
+
+    async def test_rotate(self):
+        wal = self.open_log()
+        wal.append("cursors", "advance", "bob", "room", 1)
+        wal.append("cursors", "advance", "bob", "room", 2)
+
+        await wal.rotate()
+        wal.append("cursors", "advance", "bob", "room", 3)
+        await wal.sync()
+
+        self.assertEqual([start for start, _ in wal.segments()], [1, 3])
+
+        wal.remove(1)
+        self.assertEqual(len(wal.segments()), 2)
+        wal.remove(2)
+        self.assertEqual([start for start, _ in wal.segments()], [3])
+
+        await wal.close()
+        self.assertEqual([record[0] for record in wal.replay()], [3])
+        self.assertEqual([record[0] for record in wal.replay(3)], [])
+
+    async def test_failed_write(self):
+        wal = self.open_log()
+        wal.append("cursors", "advance", "bob", "room", 1)
+
+        with patch("chat.server.state.wal.os.fsync", side_effect=OSError):
+            with self.assertRaises(OSError):
+                await wal.sync()
+
+        # record 1 may be lost, so record 2 is not acknowledged either
+        wal.append("cursors", "advance", "bob", "room", 2)
+        with self.assertRaises(OSError):
+            await wal.sync()
+        self.assertEqual(wal.synced_lsn, 0)
+
+        # until a snapshot includes both
+        wal.remove(2)
+        await wal.sync()
+        wal.append("cursors", "advance", "bob", "room", 3)
+        await wal.sync()
+        self.assertEqual(wal.synced_lsn, 3)
+
+        await wal.close()
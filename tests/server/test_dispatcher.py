@@ -0,0 +1,131 @@
+import asyncio
+
+import aiounittest
+from unittest.mock import MagicMock
+from freezegun import freeze_time
+
+from chat.utils.async_mock import AsyncMock
+from chat.server.command import Command
+from chat.server.dispatcher import Dispatcher, BAD_REQUEST
+from chat.server.get_commands import init_commands
+from chat.server.state.meta import Meta
+from chat.command_types import CommandType
+from chat.requests_examples import test_dt_str, SendRequests
+from chat.singleton import singleton
+
+events = []
+
+
+class SlowCommand(Command):
+    @classmethod
+    async def run(cls, ws_response, meta, command=None, message_json=None):
+        events.append(("start", message_json["request_id"]))
+        await asyncio.sleep(message_json["delay"])
+        events.append(("end", message_json["request_id"]))
+        return meta
+
+
+class ExclusiveCommand(SlowCommand):
+    exclusive = True
+
+
+class TestDispatcher(aiounittest.AsyncTestCase):
+    def setUp(self) -> None:
+        events.clear()
+
+        self.mock_ws = MagicMock()
+        self.mock_ws.send_json = AsyncMock()
+
+        self.meta = Meta(user_name="anonymus_12314", loggedin=False)
+        self.dispatcher = Dispatcher(
+            ws=self.mock_ws,
+            meta=self.meta,
+            commands={
+                CommandType.send: SlowCommand,
+                CommandType.logout: ExclusiveCommand,
+            },
+        )
+
+    def tearDown(self) -> None:
+        singleton.instances = {}
+
+    async def test_concurrent(self):
+        await self.dispatcher.submit(
+            {"command": "/send", "request_id": "1", "delay": 0.05}
+        )
+        await self.dispatcher.submit(
+            {"command": "/send", "request_id": "2", "delay": 0}
+        )
+        await self.dispatcher.drain()
+
+        self.assertListEqual(
+            events,
+            [("start", "1"), ("start", "2"), ("end", "2"), ("end", "1")],
+        )
+
+    async def test_lane_order(self):
+        await self.dispatcher.submit({
+            "command": "/send", "request_id": "1", "delay": 0.05,
+            "room": "Global",
+        })
+        await self.dispatcher.submit({
+            "command": "/send", "request_id": "2", "delay": 0,
+            "room": "Global",
+        })
+        await self.dispatcher.drain()
+
+        self.assertListEqual(
+            events,
+            [("start", "1"), ("end", "1"), ("start", "2"), ("end", "2")],
+        )
+
+    async def test_exclusive(self):
+        await self.dispatcher.submit(
+            {"command": "/send", "request_id": "1", "delay": 0.05}
+        )
+        await self.dispatcher.submit(
+            {"command": "/logout", "request_id": "2", "delay": 0}
+        )
+
+        self.assertListEqual(
+            events,
+            [("start", "1"), ("end", "1"), ("start", "2"), ("end", "2")],
+        )
+
+    @freeze_time(test_dt_str)
+    async def test_unknown_command(self):
+        await self.dispatcher.submit({"command": "/nope", "request_id": "1"})
+
+        args, _ = self.mock_ws.send_json.call_args
+        self.assertEqual(args[0]["action"], CommandType.error)
+        self.assertEqual(args[0]["reason"], BAD_REQUEST)
+        self.assertEqual(args[0]["request_id"], "1")
+
+    @freeze_time(test_dt_str)
+    async def test_request_id_echo(self):
+        dispatcher = Dispatcher(
+            ws=self.mock_ws,
+            meta=Meta(user_name="andre", loggedin=True),
+            commands=init_commands(),
+        )
+
+        await dispatcher.submit(
+            dict(SendRequests.SEND_JSON_REQ.value, request_id="42")
+        )
+        await dispatcher.drain()
+
+        self.assertIsNone(self.mock_ws.send_json.assert_called_with(
+            dict(SendRequests.SEND_JSON_RESP.value, request_id="42")
+        ))
+
+    @freeze_time(test_dt_str)
+    async def test_invalid_field(self):
+        await self.dispatcher.submit(
+            {"command": "/send", "request_id": "1", "room": ["Global"]}
+        )
+        await self.dispatcher.drain()
+
+        self.assertEqual(events, [])
+        args, _ = self.mock_ws.send_json.call_args
+        self.assertEqual(args[0]["reason"], BAD_REQUEST)
+        self.assertEqual(args[0]["request_id"], "1")
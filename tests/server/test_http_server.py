@@ -0,0 +1,168 @@
+import asyncio
+import json
+
+import aiounittest
+from freezegun import freeze_time
+
+from chat.command_types import CommandType
+from chat.server.get_commands import init_commands
+from chat.server.http_server import (
+    NO_SESSION,
+    get_message,
+    handle_http,
+    handle_request,
+)
+from chat.server.state.http_session import HTTPSessionStore
+from chat.utils.http_protocol import HTTPRequest
+from chat.utils.websocket import WebSocketResponse
+from chat.requests_examples import test_dt_str
+from chat.singleton import singleton
+
+
+class TestHTTPServer(aiounittest.AsyncTestCase):
+    def setUp(self) -> None:
+        self.commands = init_commands()
+
+    def tearDown(self) -> None:
+        singleton.instances = {}
+
+    async def request(
+        self, method: str, path: str, body: dict = None, token: str = None
+    ):
+        headers = {"x-session": token} if token else {}
+
+        return await handle_request(
+            HTTPRequest(
+                method=method,
+                path=path,
+                version="HTTP/1.1",
+                headers=headers,
+                body=json.dumps(body).encode() if body else b"",
+            ),
+            self.commands,
+        )
+
+    async def connect(self) -> str:
+        response = await self.request("POST", "/connect")
+        self.assertEqual(response.status, 200)
+
+        return response.headers[b"X-Session"].decode()
+
+    @freeze_time(test_dt_str)
+    async def test_connect_status(self):
+        token = await self.connect()
+        response = await self.request("GET", "/status", token=token)
+
+        self.assertEqual(response.status, 200)
+        self.assertTrue(response.keep_alive)
+
+        [status] = json.loads(response.body)
+        self.assertEqual(status["action"], CommandType.status)
+        self.assertEqual(
+            status["user"], HTTPSessionStore().get(token).user_name
+        )
+        self.assertEqual(status["payload"]["rooms"], ["Global"])
+
+    @freeze_time(test_dt_str)
+    async def test_send(self):
+        token = await self.connect()
+        response = await self.request(
+            "POST",
+            "/send",
+            body={
+                "message": "hello",
+                "room": "Global",
+                "private": False,
+                "to_user": "/all",
+                "request_id": "42",
+            },
+            token=token,
+        )
+
+        [sent] = json.loads(response.body)
+        self.assertEqual(sent["action"], CommandType.send)
+        self.assertEqual(sent["payload"]["message"], "hello")
+        self.assertEqual(sent["request_id"], "42")
+
+    async def test_bad_body(self):
+        token = await self.connect()
+        response = await self.request(
+            "POST", "/send", body={"message": "hello"}, token=token
+        )
+
+        self.assertEqual(response.status, 400)
+
+    async def test_field_types(self):
+        token = await self.connect()
+        response = await self.request(
+            "POST",
+            "/send",
+            body={
+                "message": {"text": "hello"},
+                "room": "Global",
+                "private": False,
+                "to_user": "/all",
+            },
+            token=token,
+        )
+        self.assertEqual(response.status, 400)
+
+        # digits stay a string where one is expected
+        message = get_message(
+            HTTPRequest(
+                method="GET",
+                path="/search",
+                version="HTTP/1.1",
+                query={"room": "Global", "query": "2024", "limit": "5"},
+            ),
+            self.commands[CommandType.search],
+        )
+        self.assertEqual(
+            message, {"room": "Global", "query": "2024", "limit": 5}
+        )
+
+    async def test_no_session(self):
+        response = await self.request("GET", "/status")
+
+        self.assertEqual(response.status, 401)
+        self.assertEqual(json.loads(response.body)[0]["reason"], NO_SESSION)
+
+    async def test_routes(self):
+        token = await self.connect()
+
+        response = await self.request("GET", "/nothing", token=token)
+        self.assertEqual(response.status, 404)
+
+        response = await self.request("GET", "/send", token=token)
+        self.assertEqual(response.status, 405)
+        self.assertEqual(response.headers[b"Allow"], b"POST")
+
+    async def test_quit(self):
+        token = await self.connect()
+        await self.request("POST", "/quit", token=token)
+
+        self.assertIsNone(HTTPSessionStore().get(token))
+
+    async def test_websocket_upgrade(self):
+        server = await asyncio.start_server(handle_http, "127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        websocket = WebSocketResponse(reader=reader, writer=writer)
+        await websocket.handshake()
+
+        connected = await websocket.receive_json()
+        self.assertEqual(connected["action"], CommandType.connected)
+
+        await websocket.send_json({"command": "/status", "request_id": "1"})
+        status = await websocket.receive_json()
+        self.assertEqual(status["action"], CommandType.status)
+        self.assertEqual(status["user"], connected["payload"]["user_name"])
+
+        await websocket.send_json({"command": "/quit"})
+        logout = await websocket.receive_json()
+        self.assertEqual(logout["action"], CommandType.logout)
+
+        await websocket.close()
+        server.close()
+        await server.wait_closed()
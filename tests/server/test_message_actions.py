@@ -3,15 +3,22 @@ from unittest.mock import MagicMock
 from freezegun import freeze_time
 
 from chat.utils.async_mock import AsyncMock
+from chat.utils.codecs import available_codecs
+from chat.utils.my_response import WSResponse
 from chat.server.state.user import UserStore
 from chat.server.message_actions import (
     SendAction,
     HistoryAction,
+    UnreadAction,
+    AckAction,
+    SearchAction,
 )
 from chat.server.room_actions import CreateRoomAction
 
 from chat.command_types import CommandType
+from chat.exceptions import BadRequest
 from chat.server.state.meta import Meta
+from chat.server.state.record import WireCache
 from chat.requests_examples import (
     test_dt_str,
     SendRequests,
@@ -86,3 +93,176 @@ class TestServerActions(aiounittest.AsyncTestCase):
                 HistoryRequests.HISTORY_USER_DEFAULT_USER_JSON_RESP.value
             )
         )
+
+    async def history(self, **kwargs) -> dict:
+        await HistoryAction().run(
+            ws_response=self.mock_ws,
+            meta=self.meta,
+            command=CommandType.history,
+            message_json={"room": "Global", **kwargs},
+        )
+        return self.mock_ws.send_json.call_args[0][0]["payload"]
+
+    async def test_history_pages(self):
+        for _ in range(5):
+            await SendAction().run(
+                ws_response=self.mock_ws,
+                meta=self.meta,
+                command=CommandType.send,
+                message_json=SendRequests.SEND_JSON_REQ.value,
+            )
+
+        page = await self.history(limit=2)
+        self.assertEqual([m["seq"] for m in page["history"]], [4, 5])
+
+        pages = []
+        while page["next_cursor"] is not None:
+            page = await self.history(limit=2, before_id=page["next_cursor"])
+            pages.append([m["seq"] for m in page["history"]])
+        self.assertEqual(pages, [[2, 3], [1]])
+
+        page = await self.history(limit=3, after_id=1)
+        self.assertEqual([m["seq"] for m in page["history"]], [2, 3, 4])
+        page = await self.history(limit=3, after_id=page["next_cursor"])
+        self.assertEqual([m["seq"] for m in page["history"]], [5])
+        self.assertIsNone(page["next_cursor"])
+
+        with self.assertRaises(BadRequest):
+            await self.history(limit=2, before_id=3, after_id=1)
+
+    @freeze_time(test_dt_str)
+    async def test_history_encoded(self):
+        for _ in range(3):
+            await SendAction().run(
+                ws_response=self.mock_ws,
+                meta=self.meta,
+                command=CommandType.send,
+                message_json=SendRequests.SEND_JSON_REQ.value,
+            )
+        expected = await self.history(limit=2)
+
+        for codec in available_codecs():
+            ws = MagicMock(spec=WSResponse)
+            ws.codec = codec
+            ws.send_encoded = AsyncMock()
+
+            for _ in range(2):
+                await HistoryAction().run(
+                    ws_response=ws,
+                    meta=self.meta,
+                    command=CommandType.history,
+                    message_json={"room": "Global", "limit": 2},
+                )
+                body = ws.send_encoded.call_args[0][0]
+                self.assertDictEqual(codec.decode(body)["payload"], expected)
+
+        # each message keeps the encoding asked for first
+        self.assertEqual(len(WireCache()), 2)
+
+    async def unread(self, room: str, n: int = 2, **kwargs) -> dict:
+        await UnreadAction().run(
+            ws_response=self.mock_ws,
+            meta=self.meta,
+            command=CommandType.unread,
+            message_json={"room": room, "notification_count": n, **kwargs},
+        )
+        return self.mock_ws.send_json.call_args[0][0]["payload"]
+
+    async def ack(self, room: str, seq: int) -> dict:
+        await AckAction().run(
+            ws_response=self.mock_ws,
+            meta=self.meta,
+            command=CommandType.ack,
+            message_json={"room": room, "seq": seq},
+        )
+        return self.mock_ws.send_json.call_args[0][0]["payload"]
+
+    async def test_unread(self):
+        for _ in range(3):
+            await SendAction().run(
+                ws_response=self.mock_ws,
+                meta=self.meta,
+                command=CommandType.send,
+                message_json=SendRequests.SEND_JSON_REQ.value,
+            )
+
+        self.assertEqual(await self.unread(""), {"rooms": {"Global": 3}})
+
+        page = await self.unread("Global")
+        self.assertEqual([m["seq"] for m in page["unread"]], [1, 2])
+        self.assertTrue(page["more"])
+
+        page = await self.unread("Global", after=2)
+        self.assertEqual([m["seq"] for m in page["unread"]], [3])
+        self.assertFalse(page["more"])
+
+        self.assertEqual((await self.ack("Global", 2))["seq"], 2)
+        # cursors do not move backwards nor past the last message
+        self.assertEqual((await self.ack("Global", 1))["seq"], 2)
+
+        page = await self.unread("Global")
+        self.assertEqual(page["cursor"], 2)
+        self.assertEqual([m["seq"] for m in page["unread"]], [3])
+
+        self.assertEqual((await self.ack("Global", 10))["seq"], 3)
+        self.assertEqual(await self.unread(""), {"rooms": {}})
+        self.assertEqual((await self.unread("Global"))["unread"], [])
+
+    async def test_unread_bad_after(self):
+        with self.assertRaises(BadRequest):
+            await self.unread("Global", after="two")
+
+    async def test_unread_not_member(self):
+        self.mock_ws.send_json.reset_mock()
+        await self.unread("no such room")
+
+        reply = self.mock_ws.send_json.call_args[0][0]
+        self.assertFalse(reply["success"])
+
+    async def search(self, room: str, query: str, **kwargs) -> dict:
+        await SearchAction().run(
+            ws_response=self.mock_ws,
+            meta=self.meta,
+            command=CommandType.search,
+            message_json={"room": room, "query": query, **kwargs},
+        )
+        return self.mock_ws.send_json.call_args[0][0]
+
+    async def test_search(self):
+        for message in ("deploy the release", "release notes", "a new release"):
+            await SendAction().run(
+                ws_response=self.mock_ws,
+                meta=self.meta,
+                command=CommandType.send,
+                message_json={
+                    **SendRequests.SEND_JSON_REQ.value, "message": message
+                },
+            )
+
+        payload = (await self.search("Global", "release", limit=2))["payload"]
+        self.assertEqual([m["seq"] for m in payload["hits"]], [3, 2])
+        self.assertEqual(payload["next_cursor"], [0, 2])
+
+        payload = (
+            await self.search("*", "release", limit=2, cursor=[0, 2])
+        )["payload"]
+        self.assertEqual([m["seq"] for m in payload["hits"]], [1])
+        self.assertIsNone(payload["next_cursor"])
+
+        payload = (await self.search("*", '"new release"'))["payload"]
+        self.assertEqual(
+            [m["payload"]["message"] for m in payload["hits"]],
+            ["a new release"],
+        )
+        payload = (await self.search("*", '"release new"'))["payload"]
+        self.assertEqual(payload["hits"], [])
+
+        reply = await self.search("no such room", "release")
+        self.assertFalse(reply["success"])
+
+        for limit in (0, -1):
+            with self.assertRaises(BadRequest):
+                await self.search("Global", "release", limit=limit)
+        for cursor in (2, ["a", 1], [0]):
+            with self.assertRaises(BadRequest):
+                await self.search("Global", "release", cursor=cursor)
@@ -14,7 +14,7 @@ from chat.server.room_actions import (
     OpenDialogueAction,
     DeleteDialogueAction,
 )
-from chat.server.state.room import RoomStore
+from chat.server.state.room import Room, RoomStore, RoomType, MAX_TTL
 from chat.command_types import CommandType
 from chat.server.state.meta import Meta
 from chat.requests_examples import (
@@ -25,7 +25,7 @@ from chat.requests_examples import (
     OpenDialogueRequests,
 )
 from chat.singleton import singleton
-from chat.exceptions import NoRegistredUserFound
+from chat.exceptions import BadRequest, NoRegistredUserFound
 from chat.utils.async_mock import AsyncMock
 
 
@@ -120,6 +120,31 @@ class TestServerActions(aiounittest.AsyncTestCase):
             )
         )
 
+    async def test_room_ttl(self):
+        for ttl in ("inf", 1e309, float("nan"), -1, MAX_TTL + 1, "soon"):
+            with self.assertRaises(BadRequest):
+                await CreateRoomAction().run(
+                    ws_response=self.mock_ws,
+                    meta=self.meta_user1,
+                    command=CommandType.create_room,
+                    message_json={
+                        **CreateOpenRoomRequests.CREATE_JSON_REQ.value,
+                        "ttl": ttl,
+                    },
+                )
+
+        # saved before ttls were bounded: kept forever
+        room = Room(
+            key=None,
+            name="room",
+            room_type=RoomType.open,
+            admins=[],
+            allowed=[],
+            deleted=False,
+            ttl=float("inf"),
+        )
+        self.assertEqual(room.message_ttl, 0)
+
     @freeze_time(test_dt_str)
     async def test_restricted_room(self):
         await CreateRoomAction().run(
@@ -0,0 +1,132 @@
+import asyncio
+
+import aiounittest
+
+from chat.command_types import CommandType
+from chat.utils.my_response import WSResponse
+from chat.server.dispatcher import BAD_REQUEST
+from chat.server.session import serve
+from chat.server.state.delivery import DeliveryEngine
+from chat.server.state.resume import ResumeStore
+from chat.server.state.room import RoomStore
+from chat.singleton import singleton
+
+
+async def handle_client(reader, writer):
+    await serve(WSResponse(reader=reader, writer=writer))
+
+
+class TestResume(aiounittest.AsyncTestCase):
+    def tearDown(self) -> None:
+        singleton.instances = {}
+
+    async def connect(self, port: int) -> tuple[WSResponse, dict]:
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        ws = WSResponse(reader=reader, writer=writer)
+        await ws.handshake()
+
+        connected = await ws.receive_json()
+        self.assertEqual(connected["action"], CommandType.connected)
+
+        return ws, connected["payload"]
+
+    async def send(self, ws: WSResponse, message: str) -> dict:
+        await ws.send_json({
+            "command": "/send",
+            "message": message,
+            "room": "Global",
+            "private": False,
+            "to_user": "/all",
+        })
+        return await ws.receive_json()
+
+    async def quit(self, ws: WSResponse) -> None:
+        await ws.send_json({"command": "/quit"})
+        self.assertEqual(
+            (await ws.receive_json())["action"], CommandType.logout
+        )
+        await ws.close()
+
+    async def parked(self, token: str) -> None:
+        while ResumeStore().sessions[token].parked is None:
+            await asyncio.sleep(0.01)
+
+    async def test_resume(self):
+        server = await asyncio.start_server(handle_client, "127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+
+        ws, payload = await self.connect(port)
+        token = payload["session"]
+        await self.send(ws, "one")
+        await self.send(ws, "two")
+
+        # the connection drops, the client has only got the first reply
+        ws.writer.transport.abort()
+        ws.outbound.close()
+        await asyncio.wait_for(self.parked(token), 1)
+
+        await DeliveryEngine().deliver(
+            room=RoomStore().default_room(),
+            notification={"action": CommandType.send, "message": "three"},
+        )
+
+        ws, _ = await self.connect(port)
+        await ws.send_json({"command": "/resume", "session": token, "seq": 1})
+
+        reply = await ws.receive_json()
+        self.assertTrue(reply["success"])
+        self.assertEqual(
+            reply["payload"],
+            {"session": token, "seq": 1, "replayed": 2, "complete": True},
+        )
+
+        self.assertEqual((await ws.receive_json())["payload"]["message"], "two")
+        self.assertEqual((await ws.receive_json())["message"], "three")
+
+        # numbering goes on within the resumed session
+        await self.send(ws, "four")
+        self.assertEqual(ResumeStore().sessions[token].journal.seq, 4)
+
+        await self.quit(ws)
+        server.close()
+        await server.wait_closed()
+
+    async def test_unknown_session(self):
+        server = await asyncio.start_server(handle_client, "127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+
+        ws, payload = await self.connect(port)
+        await self.send(ws, "one")
+
+        await ws.send_json({"command": "/resume", "session": "?", "seq": 0})
+        reply = await ws.receive_json()
+
+        self.assertFalse(reply["success"])
+        # the connection's own session goes on
+        self.assertEqual(reply["payload"]["session"], payload["session"])
+        self.assertEqual(reply["payload"]["seq"], 1)
+
+        await self.quit(ws)
+        server.close()
+        await server.wait_closed()
+
+    async def test_not_an_object(self):
+        server = await asyncio.start_server(handle_client, "127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+
+        ws, _ = await self.connect(port)
+
+        for message in ("hello", [1], None):
+            await ws.send_json(message)
+            reply = await ws.receive_json()
+            self.assertEqual(
+                (reply["action"], reply["reason"]),
+                (CommandType.error, BAD_REQUEST),
+            )
+
+        # the session goes on
+        self.assertTrue((await self.send(ws, "one"))["success"])
+
+        await self.quit(ws)
+        server.close()
+        await server.wait_closed()
@@ -0,0 +1,58 @@
+import unittest
+
+from chat.command_types import CommandType
+from chat.exceptions import BadRequest
+from chat.utils.codecs import (
+    JsonCodec,
+    OrjsonCodec,
+    MsgpackCodec,
+    PLACEHOLDER,
+    available_codecs,
+    choose_codec,
+    orjson,
+    msgpack,
+)
+
+MESSAGE = {
+    "action": CommandType.send,
+    "success": True,
+    "payload": {"to": "/all", "message": "привет"},
+}
+
+
+class TestCodecs(unittest.TestCase):
+    def assert_round_trip(self, codec):
+        self.assertDictEqual(codec.decode(codec.encode(MESSAGE)), MESSAGE)
+        self.assertRaises(BadRequest, codec.decode, b"\xc1\xff{")
+
+        spliced = codec.splice(
+            {"history": PLACEHOLDER, "next_cursor": None},
+            [codec.encode(MESSAGE), codec.encode(MESSAGE)],
+        )
+        self.assertDictEqual(
+            codec.decode(spliced),
+            {"history": [MESSAGE, MESSAGE], "next_cursor": None},
+        )
+        self.assertEqual(codec.decode(codec.splice(PLACEHOLDER, [])), [])
+
+    def test_json(self):
+        self.assert_round_trip(JsonCodec())
+
+    @unittest.skipIf(orjson is None, "orjson is not installed")
+    def test_orjson(self):
+        self.assert_round_trip(OrjsonCodec())
+        self.assertDictEqual(
+            JsonCodec().decode(OrjsonCodec().encode(MESSAGE)), MESSAGE
+        )
+
+    @unittest.skipIf(msgpack is None, "msgpack is not installed")
+    def test_msgpack(self):
+        self.assert_round_trip(MsgpackCodec())
+
+    def test_choose(self):
+        self.assertEqual(choose_codec(["json"]).name, "json")
+        self.assertIsNone(choose_codec(["xml"]))
+        self.assertEqual(
+            choose_codec([codec.name for codec in available_codecs()]).name,
+            available_codecs()[0].name,
+        )
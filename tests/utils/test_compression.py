@@ -0,0 +1,27 @@
+import unittest
+
+from chat.exceptions import ProtocolError
+from chat.utils.compression import Deflate, choose_compression
+
+
+class TestDeflate(unittest.TestCase):
+    def test_threshold(self):
+        deflate = Deflate(level=6, threshold=64)
+
+        self.assertIsNone(deflate.compress(b"a" * 63))
+        self.assertIsNone(deflate.compress(bytes(range(256))))
+
+        compressed = deflate.compress(b"a" * 4096)
+        self.assertLess(len(compressed), 4096)
+        self.assertEqual(deflate.decompress(compressed, 4096), b"a" * 4096)
+
+    def test_max_size(self):
+        deflate = Deflate(level=6, threshold=0)
+        compressed = deflate.compress(b"a" * 4096)
+
+        self.assertRaises(ProtocolError, deflate.decompress, compressed, 1024)
+        self.assertRaises(ProtocolError, deflate.decompress, b"junk", 1024)
+
+    def test_choose(self):
+        self.assertEqual(choose_compression(["deflate"]).name, "deflate")
+        self.assertIsNone(choose_compression(["br"]))
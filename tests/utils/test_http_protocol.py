@@ -0,0 +1,139 @@
+import asyncio
+import socket
+
+import aiounittest
+
+from chat.exceptions import HTTPError
+from chat.utils.http_protocol import HTTPConnection, HTTPResponse
+
+
+async def open_pair() -> tuple[
+    asyncio.StreamReader, asyncio.StreamWriter, HTTPConnection
+]:
+    left, right = socket.socketpair()
+
+    client_reader, client_writer = await asyncio.open_connection(sock=left)
+
+    reader, writer = await asyncio.open_connection(sock=right)
+    server = HTTPConnection(reader=reader, writer=writer, chunk_size=4)
+
+    return client_reader, client_writer, server
+
+
+class TestHTTPConnection(aiounittest.AsyncTestCase):
+    async def test_pipelined(self):
+        _, client, server = await open_pair()
+
+        client.write(
+            b"GET /status?room=Global&n=5 HTTP/1.1\r\nHost: x\r\n\r\n"
+            b"POST /send HTTP/1.1\r\nContent-Length: 4\r\n"
+            b"Connection: close\r\n\r\nbody"
+        )
+        await client.drain()
+
+        first = await server.read_request()
+        self.assertEqual(first.method, "GET")
+        self.assertEqual(first.path, "/status")
+        self.assertDictEqual(first.query, {"room": "Global", "n": "5"})
+        self.assertEqual(first.headers["host"], "x")
+        self.assertTrue(first.keep_alive)
+
+        second = await server.read_request()
+        self.assertEqual(second.method, "POST")
+        self.assertEqual(second.body, b"body")
+        self.assertFalse(second.keep_alive)
+
+        client.close()
+        self.assertIsNone(await server.read_request())
+        await server.close()
+
+    async def test_chunked_request(self):
+        _, client, server = await open_pair()
+
+        client.write(
+            b"POST /send HTTP/1.1\r\nTransfer-Encoding: chunked\r\n\r\n"
+            b"3\r\nabc\r\na;ext=1\r\n0123456789\r\n0\r\n\r\n"
+        )
+        await client.drain()
+
+        request = await server.read_request()
+        self.assertEqual(request.body, b"abc0123456789")
+
+        client.close()
+        await server.close()
+
+    async def test_bad_request(self):
+        _, client, server = await open_pair()
+
+        client.write(b"GARBAGE\r\n\r\n")
+        await client.drain()
+
+        with self.assertRaises(HTTPError) as ex:
+            await server.read_request()
+        self.assertEqual(ex.exception.status, 400)
+
+        client.close()
+        await server.close()
+
+    async def test_bad_lengths(self):
+        for request in (
+            b"POST / HTTP/1.1\r\nContent-Length: -4\r\n\r\nbody",
+            b"POST / HTTP/1.1\r\nContent-Length: +4\r\n\r\nbody",
+            b"POST / HTTP/1.1\r\nTransfer-Encoding: chunked\r\n\r\n"
+            b"-3\r\nabc\r\n0\r\n\r\n",
+            b"POST / HTTP/1.1\r\nTransfer-Encoding: chunked\r\n\r\n"
+            b"0x3\r\nabc\r\n0\r\n\r\n",
+        ):
+            _, client, server = await open_pair()
+            client.write(request)
+            await client.drain()
+
+            with self.assertRaises(HTTPError) as ex:
+                await server.read_request()
+            self.assertEqual(ex.exception.status, 400)
+
+            client.close()
+            await server.close()
+
+    async def test_http10_keep_alive(self):
+        _, client, server = await open_pair()
+
+        client.write(b"GET / HTTP/1.0\r\n\r\n")
+        await client.drain()
+        self.assertFalse((await server.read_request()).keep_alive)
+
+        client.write(b"GET / HTTP/1.0\r\nConnection: keep-alive\r\n\r\n")
+        await client.drain()
+        self.assertTrue((await server.read_request()).keep_alive)
+
+        client.close()
+        await server.close()
+
+    async def test_response(self):
+        reader, client, server = await open_pair()
+
+        await server.write_response(HTTPResponse(body=b"[]"))
+        head = await reader.readuntil(b"\r\n\r\n")
+
+        self.assertTrue(head.startswith(b"HTTP/1.1 200 OK\r\n"))
+        self.assertIn(b"Content-Length: 2\r\n", head)
+        self.assertEqual(await reader.readexactly(2), b"[]")
+
+        client.close()
+        await server.close()
+
+    async def test_chunked_response(self):
+        reader, client, server = await open_pair()
+
+        await server.write_response(HTTPResponse(body=b"0123456789"))
+        head = await reader.readuntil(b"\r\n\r\n")
+
+        self.assertIn(b"Transfer-Encoding: chunked\r\n", head)
+        self.assertNotIn(b"Content-Length", head)
+        self.assertEqual(
+            await reader.readexactly(30),
+            b"4\r\n0123\r\n4\r\n4567\r\n2\r\n89\r\n0\r\n\r\n",
+        )
+
+        client.close()
+        await server.close()
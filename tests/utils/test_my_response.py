@@ -0,0 +1,176 @@
+import asyncio
+import socket
+import unittest
+
+import aiounittest
+
+from chat.utils.my_response import (
+    WSResponse,
+    Framing,
+    FrameType,
+    FRAME_HEADER,
+    FLAG_DEFLATE,
+    END_SIGNAL,
+)
+from chat.utils.codecs import MsgpackCodec, msgpack
+from chat.command_types import CommandType
+
+
+async def open_pair() -> tuple[WSResponse, WSResponse]:
+    left, right = socket.socketpair()
+
+    reader, writer = await asyncio.open_connection(sock=left)
+    client = WSResponse(reader=reader, writer=writer)
+
+    reader, writer = await asyncio.open_connection(sock=right)
+    server = WSResponse(reader=reader, writer=writer)
+
+    return client, server
+
+
+class TestWSResponse(aiounittest.AsyncTestCase):
+    async def test_handshake(self):
+        client, server = await open_pair()
+
+        accepted = asyncio.ensure_future(server.accept())
+        self.assertEqual(await client.handshake(), Framing.length_prefixed)
+        self.assertEqual(await accepted, Framing.length_prefixed)
+
+        await client.send_json({"command": CommandType.send})
+        self.assertDictEqual(
+            await server.receive_json(), {"command": CommandType.send}
+        )
+
+        await client.close()
+        await server.close()
+
+    async def test_handshake_legacy(self):
+        client, server = await open_pair()
+
+        accepted = asyncio.ensure_future(server.accept())
+        self.assertEqual(
+            await client.handshake(framings=[Framing.sentinel]),
+            Framing.sentinel
+        )
+        self.assertEqual(await accepted, Framing.sentinel)
+
+        await client.close()
+        await server.close()
+
+    async def test_legacy_peer(self):
+        client, server = await open_pair()
+
+        await client.send_json({"command": CommandType.logout})
+
+        self.assertEqual(await server.accept(), Framing.sentinel)
+        self.assertDictEqual(
+            await server.receive_json(), {"command": CommandType.logout}
+        )
+
+        await client.close()
+        await server.close()
+
+    async def test_payload_with_end_signal(self):
+        client, server = await open_pair()
+        client.framing = server.framing = Framing.length_prefixed
+
+        payload = b"head" + END_SIGNAL + b"tail"
+        await client.send_bytes(payload)
+        await client.send_json({"message": END_SIGNAL.decode()})
+
+        self.assertEqual(
+            await server.receive_frame(), (FrameType.binary, payload)
+        )
+        self.assertDictEqual(
+            await server.receive_json(), {"message": END_SIGNAL.decode()}
+        )
+
+        await client.close()
+        await server.close()
+
+    async def test_frames_in_one_read(self):
+        client, server = await open_pair()
+        client.framing = server.framing = Framing.length_prefixed
+
+        client.writer.write(
+            FRAME_HEADER.pack(Framing.length_prefixed, FrameType.json, 0, 2)
+            + b"{}"
+            + FRAME_HEADER.pack(Framing.length_prefixed, FrameType.json, 0, 2)
+            + b"[]"
+        )
+        await client.writer.drain()
+
+        self.assertDictEqual(await server.receive_json(), {})
+        self.assertListEqual(await server.receive_json(), [])
+
+        await client.close()
+        await server.close()
+
+    async def test_sentinel_frames_in_one_read(self):
+        client, server = await open_pair()
+
+        client.writer.write(b"{}" + END_SIGNAL + b"[]" + END_SIGNAL)
+        await client.writer.drain()
+
+        self.assertDictEqual(await server.receive_json(), {})
+        self.assertListEqual(await server.receive_json(), [])
+
+        await client.close()
+        await server.close()
+
+    async def test_closed_peer(self):
+        client, server = await open_pair()
+        client.framing = server.framing = Framing.length_prefixed
+
+        await client.close()
+
+        with self.assertRaises(ConnectionResetError):
+            await server.receive_json()
+
+        await server.close()
+
+    @unittest.skipIf(msgpack is None, "msgpack is not installed")
+    async def test_handshake_codec(self):
+        client, server = await open_pair()
+
+        accepted = asyncio.ensure_future(server.accept())
+        await client.handshake(codecs=[MsgpackCodec()])
+        await accepted
+
+        self.assertEqual(client.codec.name, "msgpack")
+        self.assertEqual(server.codec.name, "msgpack")
+
+        await client.send_json({"command": CommandType.send})
+        self.assertDictEqual(
+            await server.receive_json(), {"command": CommandType.send}
+        )
+
+        await client.close()
+        await server.close()
+
+    async def test_compression(self):
+        client, server = await open_pair()
+
+        accepted = asyncio.ensure_future(server.accept())
+        await client.handshake()
+        await accepted
+
+        self.assertEqual(server.compression.name, "deflate")
+        self.assertEqual(client.compression.name, "deflate")
+
+        history = {"history": [{"message": "hello"}] * 1000}
+        header, payload = server.encode_frame(
+            server.codec.encode(history), frame_type=FrameType.json
+        )
+        self.assertEqual(FRAME_HEADER.unpack(header)[2], FLAG_DEFLATE)
+
+        await server.send_json(history)
+        await server.send_json({"message": "hello"})
+
+        self.assertDictEqual(await client.receive_json(), history)
+        self.assertDictEqual(
+            await client.receive_json(), {"message": "hello"}
+        )
+
+        await client.close()
+        await server.close()
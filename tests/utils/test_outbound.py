@@ -0,0 +1,82 @@
+import asyncio
+
+import aiounittest
+
+from chat.utils.outbound import OutboundQueue, OverflowPolicy, Priority
+
+
+class TestOutboundQueue(aiounittest.AsyncTestCase):
+    def setUp(self) -> None:
+        self.written = []
+        self.evicted = False
+        self.blocked = asyncio.Event()
+
+    def write(self, frame):
+        self.written.append(frame)
+
+    async def drain(self):
+        await self.blocked.wait()
+
+    def evict(self):
+        self.evicted = True
+
+    def get_queue(self, **kwargs) -> OutboundQueue:
+        return OutboundQueue(
+            write=self.write,
+            drain=self.drain,
+            evict=self.evict,
+            size=8,
+            high_water=4,
+            low_water=1,
+            **kwargs
+        )
+
+    async def test_order(self):
+        self.blocked.set()
+        queue = self.get_queue()
+
+        for i in range(3):
+            await queue.put((bytes([i]),))
+        await queue.flush()
+
+        self.assertListEqual(
+            self.written, [(b"\x00",), (b"\x01",), (b"\x02",)]
+        )
+        self.assertEqual(queue.stats.sent, 3)
+        self.assertEqual(queue.stats.depth, 0)
+        queue.close()
+
+    async def test_drop_low_priority(self):
+        queue = self.get_queue(policy=OverflowPolicy.drop)
+
+        # the first frame is taken by the writer, which then blocks
+        for _ in range(6):
+            await queue.put((b"n",))
+        await asyncio.sleep(0)
+
+        self.assertTrue(queue.stats.congested)
+        self.assertFalse(await queue.put((b"l",), priority=Priority.low))
+        self.assertTrue(await queue.put((b"n",)))
+        self.assertEqual(queue.stats.dropped, 1)
+
+        self.blocked.set()
+        await queue.flush()
+
+        self.assertFalse(queue.stats.congested)
+        self.assertTrue(await queue.put((b"l",), priority=Priority.low))
+        queue.close()
+
+    async def test_evict_slow_consumer(self):
+        queue = self.get_queue(
+            policy=OverflowPolicy.disconnect, slow_consumer_timeout=0.01
+        )
+
+        for _ in range(6):
+            await queue.put((b"n",))
+        await asyncio.sleep(0.05)
+
+        self.assertTrue(self.evicted)
+        self.assertTrue(queue.stats.evicted)
+
+        with self.assertRaises(ConnectionResetError):
+            await queue.put((b"n",))
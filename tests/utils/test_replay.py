@@ -0,0 +1,43 @@
+import unittest
+
+from chat.utils.replay import ReplayBuffer
+
+
+class TestReplayBuffer(unittest.TestCase):
+    def test_since(self):
+        journal = ReplayBuffer(budget=10)
+
+        for body in (b"aaaa", b"bbbb", b"cccc"):
+            journal.append(body)
+
+        # the first one is over the budget
+        self.assertEqual(journal.seq, 3)
+        self.assertEqual(journal.size, 8)
+        self.assertEqual(journal.since(1), [b"bbbb", b"cccc"])
+        self.assertEqual(journal.since(3), [])
+        self.assertIsNone(journal.since(0))
+        self.assertIsNone(journal.since(4))
+
+    def test_ack(self):
+        journal = ReplayBuffer(budget=100)
+
+        for body in (b"a", b"bb", b"ccc"):
+            journal.append(body)
+
+        journal.ack(2)
+        self.assertEqual((len(journal), journal.size), (1, 3))
+        self.assertEqual(journal.since(2), [b"ccc"])
+
+        journal.ack(1)
+        journal.ack(10)
+        self.assertEqual((len(journal), journal.size), (0, 0))
+        self.assertEqual(journal.since(3), [])
+
+    def test_recode(self):
+        journal = ReplayBuffer(budget=6)
+        journal.append(b"ab")
+        journal.append(b"cd")
+
+        journal.recode(lambda body: body * 2)
+        self.assertEqual(journal.since(1), [b"cdcd"])
+        self.assertEqual(journal.size, 4)
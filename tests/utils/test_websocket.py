@@ -0,0 +1,108 @@
+import asyncio
+import os
+import socket
+
+import aiounittest
+
+from chat.exceptions import ProtocolError
+from chat.utils.my_response import FrameType
+from chat.utils.websocket import (
+    WebSocketResponse,
+    apply_mask,
+    accept_key,
+    frame_header,
+    OP_TEXT,
+)
+
+
+async def open_pair() -> tuple[WebSocketResponse, WebSocketResponse]:
+    left, right = socket.socketpair()
+
+    reader, writer = await asyncio.open_connection(sock=left)
+    client = WebSocketResponse(reader=reader, writer=writer, client=True)
+
+    reader, writer = await asyncio.open_connection(sock=right)
+    server = WebSocketResponse(
+        reader=reader, writer=writer, fragment_size=4, ping_interval=0
+    )
+
+    return client, server
+
+
+def xor(data: bytes, mask: bytes) -> bytes:
+    return bytes(b ^ mask[i % 4] for i, b in enumerate(data))
+
+
+class TestWebSocket(aiounittest.AsyncTestCase):
+    def test_apply_mask(self):
+        mask = b"\x01\x80\xff\x37"
+
+        for size in (0, 1, 5, 511, 512, 4099):
+            data = os.urandom(size)
+
+            self.assertEqual(apply_mask(data, mask), xor(data, mask))
+            self.assertEqual(apply_mask(apply_mask(data, mask), mask), data)
+
+    def test_accept_key(self):
+        # RFC 6455, section 1.3
+        self.assertEqual(
+            accept_key("dGhlIHNhbXBsZSBub25jZQ=="),
+            "s3pPLMBiTxaQ9kYGzzhZRbK+xOo=",
+        )
+
+    async def test_messages(self):
+        client, server = await open_pair()
+
+        accepted = asyncio.ensure_future(server.accept())
+        await client.handshake()
+        await accepted
+
+        await client.send_json({"command": "/status"})
+        self.assertDictEqual(await server.receive_json(), {"command": "/status"})
+
+        # fragments of 4 bytes on the server side
+        await server.send_json({"action": "/status"})
+        self.assertDictEqual(await client.receive_json(), {"action": "/status"})
+
+        await server.send_bytes(b"file contents")
+        self.assertEqual(
+            await client.receive_frame(), (FrameType.binary, b"file contents")
+        )
+
+        await client.close()
+        await server.close()
+
+    async def test_ping_close(self):
+        client, server = await open_pair()
+
+        accepted = asyncio.ensure_future(server.accept())
+        await client.handshake()
+        await accepted
+
+        await client.ping(b"hi")
+        await client.send_json({"command": "/quit"})
+
+        # the ping is answered while reading the next message
+        self.assertDictEqual(await server.receive_json(), {"command": "/quit"})
+
+        closing = asyncio.ensure_future(client.close())
+        with self.assertRaises(ConnectionResetError):
+            await server.receive_frame()
+
+        await closing
+        await server.close()
+
+    async def test_unmasked_client_frame(self):
+        client, server = await open_pair()
+
+        accepted = asyncio.ensure_future(server.accept())
+        await client.handshake()
+        await accepted
+
+        client.writer.write(bytes(frame_header(OP_TEXT, 2)) + b"{}")
+
+        with self.assertRaises(ProtocolError):
+            await server.receive_json()
+
+        await client.close()
+        await server.close()